@@ -0,0 +1,91 @@
+"""
+End-to-end AEIDW benchmark on synthetic lakes of increasing size.
+
+For each lake length a SyntheticLake is written to a temporary directory and
+interpolated with aeidw in a fresh process (so that peak memory is measured
+per size), under a Profiler. The throughput, the wall time and peak RSS of
+each stage, and the errors against the analytic surface are reported.
+
+    python benchmarks/benchmark_aeidw.py --lengths 2000 8000 32000 --output bench.json
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+from hydrosurvey.interpolate import aeidw
+from hydrosurvey.profiling import Profiler, profile_table
+from hydrosurvey.synthetic import SyntheticLake
+
+
+def run(length: float, gridspace: float, method: str, workers: int):
+    # one interpolation polygon per 500 map units of channel
+    lake = SyntheticLake(
+        length=length,
+        gridspace=gridspace,
+        method=method,
+        n_polygons=max(1, int(length // 500)),
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        config = lake.write(directory)
+        config["interpolation_polygons"]["workers"] = workers
+        start = time.perf_counter()
+        with Profiler("aeidw") as profiler:
+            points = aeidw(config)
+        elapsed = time.perf_counter() - start
+
+    n_targets = int((points["type"] == "interpolated").sum())
+    return {
+        "length": length,
+        "survey_points": int((points["type"] == "survey").sum()),
+        "target_points": n_targets,
+        "seconds": elapsed,
+        "targets_per_second": n_targets / elapsed,
+        "errors": lake.errors(points).to_dict(orient="index"),
+        "profile": profiler.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", type=float, nargs="+", default=[2000, 8000, 32000])
+    parser.add_argument("--gridspace", type=float, default=10.0)
+    parser.add_argument("--method", default="AEIDW", help="AEIDW or LINEAR")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for length in args.lengths:
+        # a new process per size so that peak RSS is not carried over
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(
+                run, length, args.gridspace, args.method, args.workers
+            )
+            results.append(result.result())
+
+        result = results[-1]
+        print(
+            f"\nlength {length:.0f}: {result['survey_points']} survey points, "
+            f"{result['target_points']} targets in {result['seconds']:.2f} s "
+            f"({result['targets_per_second']:.0f} targets/s)"
+        )
+        print(pd.DataFrame(result["errors"]).T.to_string(float_format="{:.3f}".format))
+        print(
+            profile_table(result["profile"])[
+                ["calls", "wall (s)", "peak rss (MB)", "items"]
+            ].to_string(float_format="{:.3f}".format)
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
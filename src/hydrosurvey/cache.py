@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from . import __version__
+from .sn import Coord_SN
+
+
+class SNCache(object):
+    """
+    On-disk cache of SN coordinates, stored as one .npy file per transformed
+    point set in `directory`. Entries are keyed by the package version, the
+    centerline geometry and the exact point coordinates, so a cached
+    transform is only reused when the centerline, polygon, grid spacing,
+    buffer and survey data it was computed from are all unchanged, and never
+    by another version of the SN transform. With directory=None nothing is
+    cached.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, centerline: gpd.GeoDataFrame, x: np.ndarray, y: np.ndarray):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(__version__.encode())
+        digest.update(shapely.to_wkb(centerline.iloc[0]["geometry"]))
+        digest.update(np.ascontiguousarray(x, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def xy_to_sn(self, centerline: gpd.GeoDataFrame, x: np.ndarray, y: np.ndarray):
+        """
+        Transform coordinate arrays to SN coordinates along `centerline`,
+        reading the result from the cache if it has been computed before.
+
+        Returns:
+            tuple: (s, n) arrays of SN coordinates
+        """
+        if self.directory is None:
+            return Coord_SN(centerline).xy_to_sn(x, y)
+
+        path = self.directory / f"sn-{self.key(centerline, x, y)}.npy"
+        if path.exists():
+            s, n = np.load(path)
+            return s, n
+
+        s, n = Coord_SN(centerline).xy_to_sn(x, y)
+        _save(path, np.vstack([s, n]))
+        return s, n
+
+
+class ResultCache(object):
+    """
+    On-disk cache of the interpolated values of each polygon, stored as one
+    .npy file per polygon in `directory`. Entries are keyed by all inputs of
+    interpolate_polygon: the centerline, the survey points and values within
+    the polygon's buffer, the target points (which cover the polygon
+    geometry, grid spacing, higher priority polygons and boundary) and the
+    interpolation parameters, as well as the hydrosurvey version. Editing one
+    polygon or centerline therefore only invalidates the polygons whose
+    inputs changed. With directory=None nothing is cached.
+    """
+
+    # arguments that do not change the result, or are computed from the others
+    ignore = ("cache_dir", "query_workers", "source_sn", "source_tree")
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, task: dict):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(__version__.encode())
+        for name in sorted(task):
+            if name in self.ignore:
+                continue
+            value = task[name]
+            digest.update(name.encode())
+            if isinstance(value, gpd.GeoDataFrame):
+                digest.update(shapely.to_wkb(value.iloc[0]["geometry"]))
+            elif isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                digest.update(f"{value.dtype}{value.shape}".encode())
+                digest.update(value.tobytes())
+            else:
+                digest.update(repr(value).encode())
+        return digest.hexdigest()
+
+    def path(self, key: str):
+        return self.directory / f"result-{key}.npy"
+
+    def load(self, key: str):
+        """
+        Returns the cached values for `key`, or None if there are none.
+        """
+        if self.directory is None or not self.path(key).exists():
+            return None
+        return np.load(self.path(key))
+
+    def save(self, key: str, values: np.ndarray):
+        if self.directory is not None:
+            _save(self.path(key), values)
+
+
+def _save(path: Path, array: np.ndarray):
+    # write to a temporary file first so readers never see partial files
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
@@ -1,3 +1,4 @@
+import io
 import os
 import tomllib
 from pathlib import Path
@@ -17,7 +18,13 @@ import xarray as xr
 from rich import print
 
 from . import __version__, sdi
-from .interpolate import aeidw
+from .crossings import line_crossings as find_line_crossings
+from .interpolate import aeidw_tiles, export_chunks, lake_points
+from .profiling import Profiler, profile_table, span
+from .raster import lake_raster
+from .thin import thin_along_track, thin_points, thinning_report
+from .tuning import best_parameters, tune_polygons
+from .xyz import merge_xyz_files
 
 app = typer.Typer(
     help=f"Hydrosurvey Tools v{__version__}",
@@ -40,6 +47,7 @@ def version_callback(value: bool):
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: Optional[bool] = typer.Option(
         None,
         "-v",
@@ -48,11 +56,47 @@ def main(
         is_eager=True,
         help="Show the version and exit.",
     ),
+    profile: Optional[Path] = typer.Option(
+        None,
+        help="Write the time and memory used by each stage of the command to "
+        "this JSON file.",
+    ),
+    cprofile: Optional[Path] = typer.Option(
+        None, help="Write cProfile statistics of the command to this file."
+    ),
+    trace_memory: bool = typer.Option(
+        False,
+        help="Also record the peak memory of each stage with tracemalloc (slower).",
+    ),
 ):
     """
     Hydrosurvey Tools
+
+    With --profile the wall time, cpu time, peak memory and number of items of
+    each stage of the command (file reads, grid generation, SN transform, IDW,
+    output writers...) are written to a JSON report and printed at the end.
     """
-    return
+    if profile is None and cprofile is None:
+        return
+
+    profiler = Profiler(
+        ctx.invoked_subcommand or "total",
+        trace_memory=trace_memory,
+        cprofile=cprofile is not None,
+    ).start()
+
+    def write_profile():
+        profiler.stop()
+        if profile is not None:
+            profiler.write(profile)
+            table = profile_table(profiler.report())
+            print(table.to_string(float_format=lambda v: f"{v:.3f}"))
+            print(f"Profile written to {profile}")
+        if cprofile is not None:
+            profiler.dump_stats(cprofile)
+            print(f"cProfile statistics written to {cprofile}")
+
+    ctx.call_on_close(write_profile)
 
 
 @app.command()
@@ -60,9 +104,18 @@ def sdi2csv(
     path: Path, 
     output_file: str,
     tide_file: Optional[str] = None,
-    usgs_parameter: Optional[str] = None
+    usgs_parameter: Optional[str] = None,
+    thin_cell_size: Optional[float] = None,
+    thin_spacing: Optional[float] = None,
+    thin_method: str = "median",
 ):  # usgs_site, usgs_parameter):
-    """Reads SDI binary and pick files and writes to CSV file."""
+    """Reads SDI binary and pick files and writes to CSV file.
+
+    Dense along-track soundings can optionally be thinned to one point per
+    grid cell (--thin-cell-size) or per along-track distance (--thin-spacing).
+    Thinning is applied after the tide corrections, so that soundings taken
+    at different lake levels are combined as elevations.
+    """
     path = Path(path)
     output_file = Path(output_file)
     data = []
@@ -72,7 +125,8 @@ def sdi2csv(
         print("_" * 40)
         print(f"... Reading bin file")
         try:
-            s = sdi.binary.read(sdi_file, as_dataframe=True)
+            with span("read_bin", items=1):
+                s = sdi.binary.read(sdi_file, as_dataframe=True)
         except:
             print(f"... ERROR: Could not read {sdi_file.stem}")
             continue
@@ -85,10 +139,11 @@ def sdi2csv(
 
         try:
             for pic_file in path.rglob(f"{sdi_file.stem}*.pic"):
-                p = sdi.pickfile.read(pic_file, as_dataframe=True)
-                s = pd.merge(
-                    s, p, how="left", left_index=True, right_index=True
-                ).reset_index()
+                with span("read_pic", items=1):
+                    p = sdi.pickfile.read(pic_file, as_dataframe=True)
+                    s = pd.merge(
+                        s, p, how="left", left_index=True, right_index=True
+                    ).reset_index()
         except:
             print(f"... ERROR: Could not read pic files for {sdi_file.stem}")
             continue
@@ -97,7 +152,8 @@ def sdi2csv(
         print(f"... Done processing {sdi_file.stem} \n\n")
 
     print(f"Merging files \n\n")
-    data = pd.concat(data)
+    with span("merge", items=len(data)):
+        data = pd.concat(data)
 
     cols = [
         "datetime",
@@ -147,8 +203,18 @@ def sdi2csv(
         # tide = tide.tz_convert("US/Central")
 
         print("Interpolating tide data to match survey data")
-        merged = data.merge(tide, on="datetime", how="outer").sort_values("datetime")
-        merged = merged.interpolate(method="index").dropna()
+        with span("tide_correction", items=len(data)):
+            # interpolate the lake elevation to the time of each sounding
+            tide = tide.sort_index()
+            merged = data.copy()
+            merged["lake_elevation"] = np.interp(
+                data.index.values.astype("datetime64[ns]").astype(np.int64),
+                tide.index.values.astype("datetime64[ns]").astype(np.int64),
+                tide["lake_elevation"].to_numpy(),
+                left=np.nan,
+                right=np.nan,
+            )
+            merged = merged.dropna()
         print("Calculating surface elevations")
         merged["current_surface"] = merged["lake_elevation"] - merged["depth_surface_1"]
         if "depth_surface_2" in merged.columns:
@@ -161,44 +227,140 @@ def sdi2csv(
     else:
         print("No tide corrections applied - outputting raw depth data")
         merged = data.reset_index()
-        
-    merged.to_csv(output_file)
+
+    # thin after the tide correction, so that soundings taken at different
+    # water levels are only combined as elevations, not as raw depths
+    if thin_cell_size or thin_spacing:
+        n_points = len(merged)
+        if "datetime" not in merged.columns:
+            merged = merged.reset_index()
+        with span("thin", items=n_points):
+            if thin_cell_size:
+                merged = thin_points(
+                    merged, thin_cell_size, "easting", "northing", method=thin_method
+                )
+            else:
+                merged = thin_along_track(
+                    merged,
+                    thin_spacing,
+                    "easting",
+                    "northing",
+                    line_col="survey_line_number",
+                    method=thin_method,
+                )
+        merged = merged.sort_values(by="datetime").reset_index(drop=True)
+        print(f"Survey points {thinning_report(n_points, len(merged))}")
+
+    with span("write_csv", items=len(merged)):
+        merged.to_csv(output_file)
     print(f"Done! Saved to {output_file}")
 
 
 @app.command()
-def merge_xyz(input_folder: Path, output_file: str, folder_prefix: str = "Srf"):
+def sdi_qc(
+    path: Path,
+    output_file: Optional[Path] = None,
+    gap_threshold: float = 5.0,
+):
+    """
+    Summarizes QC statistics for all SDI binary files in a folder.
+
+    Only trace metadata is decoded so this is fast enough to run after each
+    survey day. Optionally writes the per-line table to a CSV file.
+    """
+    lines, survey = sdi.qc.summarize_survey(path, gap_threshold=gap_threshold)
+    if lines.empty:
+        print(f"No SDI binary files found in {path}")
+        raise typer.Exit(code=1)
+
+    print(lines.to_string(float_format=lambda v: f"{v:.3f}"))
+    print("_" * 40)
+    print("Survey totals")
+    print(survey.to_string())
+
+    if output_file:
+        lines.to_csv(output_file)
+        print(f"QC summary saved to {output_file}")
+
+
+@app.command()
+def sdi_watch(path: Path, output_dir: Path, interval: float = 5.0):
+    """
+    Watches a folder of SDI binary files during acquisition.
+
+    Newly appended records of each growing file are decoded and written to a
+    Parquet dataset in OUTPUT_DIR, partitioned by survey line.
+    """
+
+    def write_batch(filepath, start_offset, df):
+        part_file = sdi.watch.write_parquet_batch(
+            output_dir, filepath, start_offset, df
+        )
+        print(f"... {filepath.stem}: {len(df)} new traces written to {part_file}")
+
+    print(f"Watching {path} for SDI binary files, press Ctrl+C to stop")
+    try:
+        sdi.watch.FolderWatcher(path).watch(write_batch, interval=interval)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+@app.command()
+def line_crossings(
+    survey_file: Path,
+    output_file: Optional[Path] = None,
+    radius: float = 1.0,
+):
+    """
+    Compares surface elevations where survey lines cross or overlap.
+
+    Reads the CSV written by sdi2csv and reports misfit statistics of the
+    current and pre-impoundment surfaces for each pair of crossing lines.
+    """
+    data = pd.read_csv(survey_file)
+    if "current_surface" in data.columns:
+        columns = ["current_surface", "pre_impoundment_surface"]
+    else:
+        columns = ["depth_surface_1", "depth_surface_2"]
+    columns = [c for c in columns if c in data.columns]
+
+    matches, stats = find_line_crossings(data, columns, radius=radius)
+    print(f"Found {len(matches)} matched points on {len(stats)} line pairs")
+    print(stats.to_string(float_format=lambda v: f"{v:.3f}"))
+
+    if output_file:
+        stats.to_csv(output_file)
+        print(f"Line crossing statistics saved to {output_file}")
+
+
+@app.command()
+def merge_xyz(
+    input_folder: Path,
+    output_file: str,
+    folder_prefix: str = "Srf",
+    decimals: int = 2,
+    workers: Optional[int] = None,
+):
     """
     Merge current and preimpoundment surface xyz files into a single csv file.
 
+    The current (*_1.xyz) and preimpoundment (*_2.xyz) surfaces of each line
+    are joined on x/y coordinates rounded to --decimals places.
+
     Note: Does not do tidal corrections.
     """
     all_files = [x for x in input_folder.rglob("*.xyz") if folder_prefix in str(x)]
 
-    current_surface = pd.concat(
-        [
-            pd.read_csv(
-                f, names=["x_coord", "y_coord", "current_surface_z"], sep=r"\s+"
-            )
-            for f in all_files
-            if str(f).endswith("_1.xyz")
-        ],
-        ignore_index=True,
+    n_points, orphans = merge_xyz_files(
+        all_files, output_file, decimals=decimals, workers=workers
     )
+    for f in orphans:
+        print(f"... WARNING: No current surface file found for {f}")
+    if n_points == 0:
+        print(f"No current surface xyz points found in {input_folder}")
+        raise typer.Exit(code=1)
 
-    preimpoundment_surface = pd.concat(
-        [
-            pd.read_csv(f, names=["x_coord", "y_coord", "preimpoundment_z"], sep=r"\s+")
-            for f in all_files
-            if str(f).endswith("_2.xyz")
-        ],
-        ignore_index=True,
-    )
-
-    current_surface["preimpoundment_z"] = preimpoundment_surface["preimpoundment_z"]
-
-    current_surface.to_csv(output_file, index=False)
-    print(f"Merged file saved to {output_file}")
+    print(f"Merged {n_points} points, file saved to {output_file}")
 
 
 # @app.command()
@@ -378,18 +540,134 @@ def new_config(configfile: Optional[Path]):
 
 
 @app.command()
-def interpolate_lake(configfile: Optional[Path]):
+def interpolate_lake(
+    configfile: Optional[Path],
+    workers: Optional[int] = None,
+    tile_size: Optional[float] = None,
+    raster_resolution: Optional[float] = None,
+):
     """
     Interpolate lake elevations using the AEIDW method.
+
+    Polygons are interpolated in --workers parallel processes (default: the
+    `workers` setting of the config file, or 1).
+
+    With --tile-size (or a `tile_size` setting in the config file) the lake
+    is interpolated in square tiles of this size, in map units, and each tile
+    is written out before the next one is started, so that peak memory
+    depends on the tile size rather than the size of the lake.
+
+    With --raster-resolution (or a `raster_resolution` setting in the output
+    section of the config file) the current surface, pre-impoundment surface
+    and sediment thickness are also written as Cloud-Optimized GeoTIFFs at
+    this resolution. Set `points = false` in the output section to only write
+    the rasters.
     """
     with open(configfile, "rb") as f:
         config = tomllib.load(f)
+    if workers is not None:
+        config["interpolation_polygons"]["workers"] = workers
+    if tile_size is not None:
+        config["interpolation_polygons"]["tile_size"] = tile_size
+    if raster_resolution is not None:
+        config["output"]["raster_resolution"] = raster_resolution
     print(config)
-    interpolated_points = aeidw(config)
 
-    # write out the interpolated elevations
-    print(f"Writing interpolated elevations to file:")
-    points_to_file(interpolated_points, config["output"]["filepath"])
+    write_points = config["output"].get("points", True)
+    raster = None
+    if config["output"].get("raster_resolution"):
+        raster = lake_raster(config, config["output"]["raster_resolution"])
+
+    # interpolate and write out the elevations, one tile or chunk of points
+    # at a time
+    tile_size = config["interpolation_polygons"].get("tile_size")
+    if tile_size:
+        chunks = aeidw_tiles(
+            config, tile_size, config["interpolation_polygons"].get("tile_overlap")
+        )
+        print(f"Writing interpolated elevations to file:")
+        for part, points in enumerate(chunks):
+            if write_points:
+                points_to_file(points, config["output"]["filepath"], part=part)
+            if raster is not None:
+                raster.add(points)
+    else:
+        points, columns = lake_points(config)
+        print(f"Writing interpolated elevations to file:")
+        point_set_to_file(
+            points,
+            columns,
+            config["output"]["filepath"],
+            raster=raster,
+            write_points=write_points,
+        )
+
+    if raster is not None:
+        for path in raster.write(config["output"]["filepath"]):
+            print(f"\t raster written to {path}")
+        raster.close()
+
+
+def parse_list(text: Optional[str], dtype=float):
+    """
+    Parse a comma separated list of values, e.g. "1,5,10", or return None.
+    """
+    if text is None:
+        return None
+    return [dtype(value) for value in text.split(",") if value.strip()]
+
+
+@app.command()
+def tune_polygon(
+    configfile: Path,
+    polygons: Optional[str] = None,
+    ellipsivity: Optional[str] = None,
+    nearest_neighbors: Optional[str] = None,
+    power: Optional[str] = None,
+    holdout: Optional[float] = None,
+    workers: Optional[int] = None,
+    output_file: Optional[Path] = None,
+):
+    """
+    Cross-validate the AEIDW parameters of the interpolation polygons.
+
+    The survey points in each AEIDW polygon are predicted from their
+    neighbors, leaving each point out in turn (or with --holdout, a random
+    fraction of the points), for every combination of the comma separated
+    --ellipsivity, --nearest-neighbors and --power values, e.g.
+    --ellipsivity 1,5,10,20 --nearest-neighbors 8,16,32 --power 1,2,3. The
+    current parameters of each polygon are always included.
+
+    Only the polygon ids in --polygons (comma separated, default all AEIDW
+    polygons) are tuned, in --workers parallel processes. The lake-wide
+    nearest neighbors and power with the lowest current surface RMSE over
+    all polygons are printed, with the best ellipsivity of each polygon for
+    them, and the errors of every combination are written to --output-file
+    as CSV.
+    """
+    with open(configfile, "rb") as f:
+        config = tomllib.load(f)
+
+    results = tune_polygons(
+        config,
+        polygon_ids=parse_list(polygons, str),
+        ellipsivity=parse_list(ellipsivity),
+        nearest_neighbors=parse_list(nearest_neighbors, int),
+        power=parse_list(power),
+        holdout=holdout,
+        workers=workers,
+    )
+    best = best_parameters(results)
+    if not best.empty:
+        print(
+            f"Best nearest_neighbors = {best['nearest_neighbors'].iloc[0]} and "
+            f"power = {best['power'].iloc[0]}, with the ellipsivity of each polygon:"
+        )
+    print(best.to_string(float_format=lambda v: f"{v:.3f}"))
+
+    if output_file:
+        results.to_csv(output_file, index=False)
+        print(f"Cross-validation errors saved to {output_file}")
 
 
 @app.command()
@@ -517,18 +795,49 @@ def plot_eac_curve(eac, output_file):
     plt.savefig(output_file)
 
 
-def points_to_file(gdf: gpd.GeoDataFrame, output_file: str):
+# columns of the CSV output, sorted by coordinates
+CSV_COLUMNS = [
+    "x_coordinate",
+    "y_coordinate",
+    "current_surface_elevation",
+    "preimpoundment_elevation",
+    "type",
+    "source",
+]
+
 
+def points_to_file(gdf: gpd.GeoDataFrame, output_file: str, part: Optional[int] = None):
+    """
+    Write points to GeoPackage, GeoParquet and CSV files. With `part`, gdf is
+    one part of a tiled output: part 0 creates the files and later parts are
+    appended to the GeoPackage and CSV and written as part-<part>.parquet
+    files of a GeoParquet dataset directory.
+    """
     output_file = Path(output_file)
-    gdf = gdf.drop(columns=["id"])
+    gdf = gdf.drop(columns=["id"], errors="ignore")
+    append = bool(part)
+    if not append:
+        print(f"\t geopackage written to {output_file.with_suffix('.gpkg')}")
+        print(f"\t geoparquet written to {output_file.with_suffix('.parquet')}")
+        print(f"\t csv written to {output_file.with_suffix('.csv')}")
 
     # Write to GeoPackage
-    print(f"\t geopackage written to {output_file.with_suffix('.gpkg')}")
-    gdf.to_file(output_file.with_suffix(".gpkg"), driver="GPKG")
+    with span("write_geopackage", items=len(gdf)):
+        gdf.to_file(
+            output_file.with_suffix(".gpkg"), driver="GPKG", mode="a" if append else "w"
+        )
 
     # write to Parquet
-    print(f"\t geoparquet written to {output_file.with_suffix('.parquet')}")
-    gdf.to_parquet(output_file.with_suffix(".parquet"))
+    with span("write_geoparquet", items=len(gdf)):
+        if part is None:
+            gdf.to_parquet(output_file.with_suffix(".parquet"))
+        else:
+            parquet_dir = output_file.with_suffix(".parquet")
+            if part == 0 and parquet_dir.is_dir():
+                for stale in parquet_dir.glob("part-*.parquet"):
+                    stale.unlink()
+            parquet_dir.mkdir(parents=True, exist_ok=True)
+            gdf.to_parquet(parquet_dir / f"part-{part:05d}.parquet")
 
     # write to CSV
 
@@ -540,17 +849,109 @@ def points_to_file(gdf: gpd.GeoDataFrame, output_file: str):
     gdf = gdf.drop(columns=["geometry"])
     gdf = gdf.sort_values(by=["x_coordinate", "y_coordinate"])
 
-    column_order = [
-        "x_coordinate",
-        "y_coordinate",
-        "current_surface_elevation",
-        "preimpoundment_elevation",
-        "type",
-        "source",
-    ]
-
-    print(f"\t csv written to {output_file.with_suffix('.csv')}")
-    gdf.to_csv(output_file.with_suffix(".csv"), columns=column_order, index=False)
+    with span("write_csv", items=len(gdf)):
+        gdf.to_csv(
+            output_file.with_suffix(".csv"),
+            columns=[col for col in CSV_COLUMNS if col in gdf],
+            index=False,
+            mode="a" if append else "w",
+            header=not append,
+        )
+
+
+def point_set_to_file(
+    points,
+    columns: list,
+    output_file: str,
+    raster=None,
+    write_points=True,
+    chunk_size: int = 250_000,
+):
+    """
+    Write the PointSet returned by lake_points to the same GeoPackage,
+    GeoParquet and CSV files as points_to_file. Only `chunk_size` points at
+    a time are converted to a GeoDataFrame, and each chunk is also added to
+    `raster` if given. The CSV is written in chunks straight from the
+    coordinate and value arrays, sorted by coordinates as in points_to_file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    output_file = Path(output_file)
+    if write_points:
+        print(f"\t geopackage written to {output_file.with_suffix('.gpkg')}")
+        print(f"\t geoparquet written to {output_file.with_suffix('.parquet')}")
+        print(f"\t csv written to {output_file.with_suffix('.csv')}")
+
+    parquet_writer = None
+    try:
+        for part, gdf in enumerate(export_chunks(points, columns, chunk_size)):
+            if raster is not None:
+                raster.add(gdf)
+            if not write_points:
+                continue
+            gdf = gdf.drop(columns=["id"], errors="ignore")
+            with span("write_geopackage", items=len(gdf)):
+                gdf.to_file(
+                    output_file.with_suffix(".gpkg"),
+                    driver="GPKG",
+                    mode="a" if part else "w",
+                )
+            with span("write_geoparquet", items=len(gdf)):
+                if parquet_writer is None:
+                    schema = geoparquet_schema(gdf, points)
+                    parquet_writer = pq.ParquetWriter(
+                        output_file.with_suffix(".parquet"), schema
+                    )
+                parquet_writer.write_table(
+                    pa.Table.from_pandas(
+                        gdf.to_wkb(), schema=schema, preserve_index=False
+                    )
+                )
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    if not write_points:
+        return
+
+    order = np.lexsort((points.y, points.x))
+    # the same columns as points_to_file of the exported points
+    values = [col for col in CSV_COLUMNS[2:] if col in columns + ["type", "source"]]
+    with span("write_csv", items=len(points)):
+        for start in range(0, len(points), chunk_size):
+            chunk = points.take(order[start : start + chunk_size])
+            csv = pd.DataFrame(
+                {"x_coordinate": chunk.x, "y_coordinate": chunk.y}
+                | {col: chunk[col] for col in values}
+            )
+            csv.to_csv(
+                output_file.with_suffix(".csv"),
+                index=False,
+                mode="a" if start else "w",
+                header=not start,
+            )
+
+
+def geoparquet_schema(gdf: gpd.GeoDataFrame, points):
+    """
+    Arrow schema of a GeoParquet file of all `points`, written one chunk
+    `gdf` at a time. It is read back from geopandas' own GeoParquet output
+    of two points at the corners of the points' bounds, so that the
+    metadata has the bbox of all chunks instead of the first one.
+    """
+    import pyarrow.parquet as pq
+
+    corners = gdf.iloc[[0, 0]].set_geometry(
+        gpd.points_from_xy(
+            [points.x.min(), points.x.max()],
+            [points.y.min(), points.y.max()],
+            crs=gdf.crs,
+        )
+    )
+    buffer = io.BytesIO()
+    corners.to_parquet(buffer, index=False)
+    buffer.seek(0)
+    return pq.read_schema(buffer)
 
 
 def is_python_file(path: str) -> bool:
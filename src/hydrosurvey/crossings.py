@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# (x, y) offsets of a grid cell and its eight neighbors
+NEIGHBOR_CELLS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def _unique(keys: np.ndarray, return_counts=False):
+    """Sort based unique of an integer key array (faster than np.unique for
+    millions of keys)."""
+    keys = np.sort(keys)
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    if return_counts:
+        return keys[first], np.diff(np.r_[first, len(keys)])
+    return keys[first]
+
+
+def _crossing_cells(point_cells: np.ndarray, lines: np.ndarray, ny: int):
+    """
+    Find the grid cells that more than one survey line passes through or next
+    to. `point_cells` holds the cell key (ix * ny + iy) of each point and
+    `lines` the integer line code. Returns the sorted array of cell keys.
+    """
+    n_lines = lines.max() + 1
+
+    # unique (cell, line) occupancy, dilated by one cell in every direction so
+    # that points closer than the cell size in neighboring cells are paired
+    occupied = _unique(point_cells * n_lines + lines)
+    dilated = _unique(
+        np.concatenate(
+            [occupied + (dx * ny + dy) * n_lines for dx, dy in NEIGHBOR_CELLS]
+        )
+    )
+    cell_key, count = _unique(dilated // n_lines, return_counts=True)
+    return cell_key[count > 1]
+
+
+def line_crossings(
+    df: pd.DataFrame,
+    columns: list,
+    radius: float = 1.0,
+    x_col: str = "easting",
+    y_col: str = "northing",
+    line_col: str = "survey_line_number",
+):
+    """
+    Find where survey lines cross or overlap and compare surface values there.
+
+    Points are binned into grid cells of size `radius` to find the cells that
+    several lines pass through. A single KD-tree over the points in those
+    cells finds all pairs from different lines within `radius`, and every
+    point of the first line is matched to the nearest point of the second.
+
+    Parameters:
+        df (pd.DataFrame): survey points, e.g. the output of sdi2csv
+        columns (list): surface columns to compare at the crossings
+        radius (float): maximum distance between matched points
+        x_col, y_col, line_col (str): names of the coordinate and line columns
+
+    Returns:
+        tuple: (matches, stats) where `matches` has one row per matched point
+            pair with the difference (line_a - line_b) of each column and
+            `stats` has the number of matches and the mean, std, rmse and
+            max absolute misfit of each column per line pair.
+    """
+    xy = df[[x_col, y_col]].to_numpy(dtype=np.float64)
+    values = df[columns].to_numpy(dtype=np.float64)
+    codes, names = pd.factorize(df[line_col], sort=True)
+    # cells are offset by one so that neighbor keys never wrap around
+    cells = np.floor((xy - xy.min(axis=0)) / radius).astype(np.int64) + 1
+    ny = cells[:, 1].max() + 2
+    point_cells = cells[:, 0] * ny + cells[:, 1]
+
+    # only points near cells shared by several lines can be part of a crossing
+    candidates = np.flatnonzero(
+        np.isin(point_cells, _crossing_cells(point_cells, codes, ny))
+    )
+    candidate_xy = xy[candidates]
+
+    # all point pairs within radius, keeping pairs from different lines
+    # oriented so that line_a sorts before line_b
+    pairs = cKDTree(candidate_xy).query_pairs(radius, output_type="ndarray")
+    ia = candidates[pairs[:, 0]]
+    ib = candidates[pairs[:, 1]]
+    swap = codes[ia] > codes[ib]
+    ia[swap], ib[swap] = ib[swap], ia[swap]
+    keep = codes[ia] != codes[ib]
+    ia, ib = ia[keep], ib[keep]
+
+    # match each point of line_a to its nearest point on each line_b
+    distance = np.hypot(*(xy[ia] - xy[ib]).T)
+    order = np.lexsort((distance, codes[ib], ia))
+    ia, ib, distance = ia[order], ib[order], distance[order]
+    first = np.ones(len(ia), dtype=bool)
+    first[1:] = (ia[1:] != ia[:-1]) | (codes[ib[1:]] != codes[ib[:-1]])
+    ia, ib, distance = ia[first], ib[first], distance[first]
+
+    matches = pd.DataFrame(
+        values[ia] - values[ib], columns=[f"{c}_misfit" for c in columns]
+    )
+    matches.insert(0, "distance", distance)
+    matches.insert(0, "index_b", df.index[ib])
+    matches.insert(0, "index_a", df.index[ia])
+    matches.insert(0, "line_b", names[codes[ib]])
+    matches.insert(0, "line_a", names[codes[ia]])
+
+    misfits = matches[[f"{c}_misfit" for c in columns]]
+    keys = [matches["line_a"], matches["line_b"]]
+    grouped = misfits.groupby(keys)
+    stats = {"count": grouped.count().iloc[:, 0]}
+    for col in misfits.columns:
+        stats[f"{col}_mean"] = grouped[col].mean()
+        stats[f"{col}_std"] = grouped[col].std()
+        stats[f"{col}_rmse"] = np.sqrt((misfits[col] ** 2).groupby(keys).mean())
+        stats[f"{col}_max_abs"] = misfits[col].abs().groupby(keys).max()
+    stats = pd.DataFrame(stats)
+
+    return matches, stats
@@ -1,16 +1,105 @@
+import os
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
 import geopandas as gpd
 import numpy as np
 import pandas as pd
-from shapely.geometry import Point
+import pyproj
+import shapely
+from scipy.spatial import cKDTree
 from tqdm import tqdm
 
-from .methods import idw
-from .sn import Coord_SN
+from .cache import ResultCache, SNCache
+from .methods import _idw, idw, linear
+from .points import PointSet
+from .profiling import span
+from .thin import thin_points, thinning_report
 
 
-def polygon_to_mesh(polygon: gpd.GeoDataFrame, resolution: float):
+def _grid_cells(geometry, x: np.ndarray, y: np.ndarray, band_rows: int = 256):
     """
-    Convert a polygon to a mesh.
+    Generate the (row, col) indices of the grid cells whose points intersect
+    a polygon, one band of `band_rows` grid rows at a time.
+
+    Each grid row is intersected with the polygon as a horizontal scanline to
+    find the spans of the row that lie inside it. Only the points in those
+    spans (padded by one cell to allow for rounding) are tested against the
+    prepared polygon, so the work and memory per band scale with the number
+    of interior points rather than with the size of the bounding box.
+    """
+    if len(x) == 0 or len(y) == 0:
+        return
+    shapely.prepare(geometry)
+    nx = len(x)
+    for start in range(0, len(y), band_rows):
+        rows = np.arange(start, min(start + band_rows, len(y)))
+        band = shapely.clip_by_rect(
+            geometry, x[0] - 1, y[rows[0]] - 1, x[-1] + 1, y[rows[-1]] + 1
+        )
+        if band.is_empty:
+            continue
+        coords = np.empty((len(rows), 2, 2))
+        coords[:, 0, 0] = x[0] - 1
+        coords[:, 1, 0] = x[-1] + 1
+        coords[:, :, 1] = y[rows, np.newaxis]
+        scanlines = shapely.intersection(shapely.linestrings(coords), band)
+
+        spans, span_rows = shapely.get_parts(scanlines, return_index=True)
+        if len(spans) == 0:
+            continue
+        bounds = shapely.bounds(spans)
+        lo = np.clip(np.searchsorted(x, bounds[:, 0]) - 1, 0, nx)
+        hi = np.clip(np.searchsorted(x, bounds[:, 2], side="right") + 1, 0, nx)
+        keep = hi > lo
+        span_rows, lo, lengths = span_rows[keep], lo[keep], (hi - lo)[keep]
+
+        # expand each span into the flat grid indices it covers
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        cells = np.unique(
+            rows[np.repeat(span_rows, lengths)] * nx + np.repeat(lo, lengths) + offsets
+        )
+        row, col = np.divmod(cells, nx)
+        inside = shapely.intersects_xy(geometry, x[col], y[row])
+        yield row[inside], col[inside]
+
+
+def grid_points(geometry, resolution: float, band_rows: int = 256, bounds=None):
+    """
+    Generate the coordinates of the points of a regular grid with spacing
+    `resolution` that fall inside (or on the boundary of) a polygon. The grid
+    starts at the lower left corner of the polygon's bounding box.
+
+    Parameters:
+        geometry (shapely.Polygon): polygon or multipolygon to fill
+        resolution (float): grid spacing
+        band_rows (int): number of grid rows processed per chunk
+        bounds (tuple): only generate the points with minx <= x < maxx and
+            miny <= y < maxy (see polygon_to_mesh)
+
+    Yields:
+        tuple: (x, y) arrays of the grid points in each band, in row major order
+    """
+    minx, miny, maxx, maxy = geometry.bounds
+    x = np.arange(minx, maxx, resolution)
+    y = np.arange(miny, maxy, resolution)
+    if bounds is not None:
+        x = x[slice(*np.searchsorted(x, [bounds[0], bounds[2]]))]
+        y = y[slice(*np.searchsorted(y, [bounds[1], bounds[3]]))]
+    for row, col in _grid_cells(geometry, x, y, band_rows=band_rows):
+        yield x[col], y[row]
+
+
+def _mesh_cells(polygon: gpd.GeoDataFrame, resolution: float, bounds=None):
+    """
+    Find the grid points of polygon_to_mesh. Returns the x and y coordinates
+    of the grid, the sorted positions of the points in the flattened meshgrid
+    and the polygon id of each point.
     """
     # Get the bounding box of the polygon
     minx, miny, maxx, maxy = polygon.total_bounds
@@ -18,129 +107,924 @@ def polygon_to_mesh(polygon: gpd.GeoDataFrame, resolution: float):
     # Create the x and y coordinates of the grid
     x = np.arange(minx, maxx, resolution)
     y = np.arange(miny, maxy, resolution)
+    x0, x1, y0, y1 = 0, len(x), 0, len(y)
+    if bounds is not None:
+        x0, x1 = np.searchsorted(x, [bounds[0], bounds[2]])
+        y0, y1 = np.searchsorted(y, [bounds[1], bounds[3]])
+
+    # Find the grid points inside each polygon, indexed by their position in
+    # the flattened meshgrid
+    index = []
+    polygon_ids = []
+    for polygon_id, geometry in zip(polygon.index, polygon.geometry):
+        for row, col in _grid_cells(geometry, x[x0:x1], y[y0:y1]):
+            index.append((row + y0) * len(x) + col + x0)
+            polygon_ids.append(np.full(len(row), polygon_id, dtype=polygon.index.dtype))
+    index = np.concatenate(index) if index else np.array([], dtype=np.int64)
+    polygon_ids = np.concatenate(polygon_ids) if polygon_ids else polygon.index[:0]
+    order = np.argsort(index, kind="stable")
+    return x, y, index[order], np.asarray(polygon_ids)[order]
+
+
+def refine_grid(
+    row: np.ndarray,
+    col: np.ndarray,
+    origin: tuple,
+    resolution: float,
+    levels: int,
+    survey_tree: cKDTree,
+    survey_values: np.ndarray,
+    max_gradient: Optional[float] = None,
+    max_points: Optional[int] = None,
+    nnear: int = 8,
+):
+    """
+    Select the grid points of an adaptive quadtree target grid from the
+    points of a uniform grid.
+
+    The coarsest level keeps every 2**levels-th row and column of the grid.
+    Each of its cells is split into four where the survey points show detail
+    worth resolving, i.e. where the cell holds more than `max_points` survey
+    points, or where the elevation range at its corners, estimated with a
+    quick IDW of the nnear nearest survey points, divided by the cell size
+    exceeds `max_gradient`. Split cells are refined the same way down to the
+    spacing of the uniform grid, so fully refined areas keep all their points.
+
+    Parameters:
+        row, col (np.ndarray): grid rows and columns of the uniform grid points
+        origin (tuple): x and y coordinates of row 0, column 0
+        resolution (float): spacing of the uniform grid
+        levels (int): number of refinement levels
+        survey_tree (cKDTree): KD-tree of the survey point coordinates
+        survey_values (np.ndarray): survey values (shape: N, C)
+        max_gradient (float): elevation change per map unit above which a
+            cell is refined
+        max_points (int): number of survey points above which a cell is
+            refined
+        nnear (int): number of neighbors of the gradient estimate
+
+    Returns:
+        np.ndarray: boolean mask of the grid points to keep
+    """
+    # coarsest level whose lattice contains each point
+    level = np.full(len(row), levels)
+    for lev in range(levels - 1, -1, -1):
+        step = 2 ** (levels - lev)
+        level[(row % step == 0) & (col % step == 0)] = lev
+    keep = level == 0
+    if len(row) == 0:
+        return keep
+
+    nrows, ncols = int(row.max()) + 1, int(col.max()) + 1
+
+    def cell_ids(cell_row, cell_col, step):
+        # padded so that cells in row and column -1 (touched by points on
+        # their edges) do not wrap to another row
+        return (cell_row + 1) * (ncols // step + 3) + cell_col + 1
+
+    def touching(points, step):
+        # cells of the given size that contain each point, including the
+        # cells below and to the left of points on their edges
+        on_row_edge = row[points] % step == 0
+        on_col_edge = col[points] % step == 0
+        for drow, dcol in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+            touches = (on_row_edge | (drow == 0)) & (on_col_edge | (dcol == 0))
+            cells = cell_ids(
+                row[points] // step - drow, col[points] // step - dcol, step
+            )
+            yield points[touches], cells[touches]
+
+    if max_points is not None:
+        # grid rows and columns of the survey points within a coarsest cell
+        # of the grid
+        margin = 2**levels
+        survey_row = np.floor((survey_tree.data[:, 1] - origin[1]) / resolution)
+        survey_col = np.floor((survey_tree.data[:, 0] - origin[0]) / resolution)
+        on_grid = (survey_row >= -margin) & (survey_row < nrows + margin)
+        on_grid &= (survey_col >= -margin) & (survey_col < ncols + margin)
+        survey_row = survey_row[on_grid].astype(np.int64)
+        survey_col = survey_col[on_grid].astype(np.int64)
 
-    # Create the meshgrid
-    xx, yy = np.meshgrid(x, y)
+    refined = None
+    for lev in range(levels):
+        step = 2 ** (levels - lev)
+        size = step * resolution
 
-    points = gpd.points_from_xy(x=xx.flatten(), y=yy.flatten())
-    grid = gpd.GeoDataFrame(gpd.GeoSeries(points, crs=polygon.crs, name="geometry"))
+        # cells of this level touching grid points, within refined parents.
+        # Cells are the same whatever part of the grid is given, so tiles
+        # are refined like the whole polygon.
+        everywhere = np.arange(len(row))
+        cells = np.unique(np.concatenate([c for _, c in touching(everywhere, step)]))
+        cell_row, cell_col = np.divmod(cells, ncols // step + 3)
+        cell_row, cell_col = cell_row - 1, cell_col - 1
+        if refined is not None:
+            parent = cell_ids(cell_row // 2, cell_col // 2, 2 * step)
+            inside = np.isin(parent, refined)
+            cell_row, cell_col = cell_row[inside], cell_col[inside]
+        cells = cell_ids(cell_row, cell_col, step)
 
-    return gpd.sjoin(grid, polygon[["geometry"]], how="inner").rename(
-        columns={"index_right": "polygon_id"}
+        split = np.zeros(len(cells), dtype=bool)
+        if max_points is not None:
+            in_cells = (survey_row // step >= -1) & (survey_col // step >= -1)
+            in_cells &= survey_col // step <= ncols // step
+            survey_cells = np.sort(
+                cell_ids(
+                    survey_row[in_cells] // step, survey_col[in_cells] // step, step
+                )
+            )
+            counts = np.searchsorted(survey_cells, cells, side="right")
+            counts -= np.searchsorted(survey_cells, cells, side="left")
+            split |= counts > max_points
+        if max_gradient is not None and len(cells):
+            corner_x = origin[0] + (cell_col[:, np.newaxis] + [0, 1, 0, 1]) * size
+            corner_y = origin[1] + (cell_row[:, np.newaxis] + [0, 0, 1, 1]) * size
+            corner_values, _ = _idw(
+                survey_tree,
+                survey_values,
+                np.column_stack([corner_x.ravel(), corner_y.ravel()]),
+                nnear=nnear,
+                power=2,
+                chunk_size=100_000,
+                workers=-1,
+                max_distance=None,
+                sectors=None,
+            )
+            corner_values = corner_values.reshape(len(cells), 4, -1)
+            with warnings.catch_warnings():
+                # columns that are NaN at all corners never split a cell
+                warnings.simplefilter("ignore", RuntimeWarning)
+                elevation_range = np.nanmax(
+                    np.nanmax(corner_values, axis=1) - np.nanmin(corner_values, axis=1),
+                    axis=1,
+                )
+            split |= elevation_range / size > max_gradient
+        refined = cells[split]
+
+        # keep the points of the next level inside or on the edge of a
+        # refined cell
+        for points, cell in touching(np.flatnonzero(level == lev + 1), step):
+            keep[points[np.isin(cell, refined)]] = True
+    return keep
+
+
+def polygon_to_mesh(polygon: gpd.GeoDataFrame, resolution: float, bounds=None):
+    """
+    Convert a polygon to a mesh.
+
+    With `bounds` (minx, miny, maxx, maxy) only the part of the mesh with
+    minx <= x < maxx and miny <= y < maxy is generated. The grid still starts
+    at the corner of the polygon's bounding box, so the meshes of adjacent
+    bounds fit together without gaps or duplicate points.
+    """
+    x, y, index, polygon_ids = _mesh_cells(polygon, resolution, bounds)
+    id_column = polygon.index.name or "polygon_id"
+    row, col = np.divmod(index, len(x))
+    grid = gpd.GeoDataFrame(
+        {id_column: polygon_ids},
+        geometry=gpd.points_from_xy(x[col], y[row]),
+        crs=polygon.crs,
+        index=pd.Index(index),
     )
+    return grid[["geometry", id_column]]
 
 
-def mask_higher_priority_polygons(
-    points: gpd.GeoDataFrame, higher_priority: gpd.GeoDataFrame
+def resolve_priorities(
+    x: np.ndarray, y: np.ndarray, owner: np.ndarray, polygons: gpd.GeoDataFrame
 ):
     """
-    Mask the higher priority polygon with the lower priority polygon.
+    Find the grid points that belong to the highest priority polygon covering
+    them, i.e. points that do not intersect any polygon with a lower priority
+    value than the polygon they were generated for. The points are sorted by
+    x once, so each polygon only tests the points within its bounding box.
+
+    Parameters:
+        x, y (np.ndarray): point coordinates
+        owner (np.ndarray): position in `polygons` of the polygon each point
+            was generated for
+        polygons (gpd.GeoDataFrame): polygons with a "priority" column
+
+    Returns:
+        np.ndarray: boolean mask of the points to keep
     """
-    return gpd.overlay(points, higher_priority, how="difference")
+    priority = polygons["priority"].to_numpy(dtype=np.float64)
+    owner_priority = priority[owner]
+    keep = np.ones(len(x), dtype=bool)
+
+    order = np.argsort(x, kind="stable")
+    sorted_x = x[order]
+    for i, (geometry, bounds) in enumerate(
+        zip(polygons.geometry.values, polygons.geometry.bounds.to_numpy())
+    ):
+        lo = np.searchsorted(sorted_x, bounds[0], side="left")
+        hi = np.searchsorted(sorted_x, bounds[2], side="right")
+        candidates = order[lo:hi]
+        candidates = candidates[
+            (y[candidates] >= bounds[1])
+            & (y[candidates] <= bounds[3])
+            & (owner_priority[candidates] > priority[i])
+        ]
+        if len(candidates):
+            hit = shapely.intersects_xy(geometry, x[candidates], y[candidates])
+            keep[candidates[hit]] = False
+    return keep
 
 
-def generate_target_points(polygons: gpd.GeoDataFrame):
+def target_point_set(
+    polygons: gpd.GeoDataFrame, bounds=None, refinement: Optional[dict] = None
+):
     """
-    Generate target interpolation points.
+    Generate target interpolation points as a PointSet with the id of the
+    polygon each point belongs to, optionally only those within `bounds`
+    (see polygon_to_mesh). Points covered by a higher priority polygon are
+    dropped.
+
+    The grid of each polygon is generated in bands of rows by grid_points
+    and the points of other polygons are dropped from each band before the
+    next one, so only the target points themselves are kept in memory. With
+    `refinement` (the keyword arguments of refine_grid other than the grid
+    points, see adaptive_refinement) each polygon gets an adaptive quadtree
+    grid instead of a uniform grid at its gridspace, refined from the
+    uniform grid of the whole polygon.
     """
-    masked = {}
-    for idx, _ in tqdm(
-        polygons.iterrows(),
-        total=polygons.shape[0],
-        desc="Generating target interpolation points for each polygon",
-    ):
-        priority = polygons["priority"].loc[idx]
-        resolution = polygons["gridspace"].loc[idx]
-        grid = polygon_to_mesh(polygons.loc[[idx]], resolution)
-        higher_priority = polygons.loc[polygons["priority"] < priority]
-        masked[idx] = mask_higher_priority_polygons(grid, higher_priority)
-
-    return gpd.GeoDataFrame(
-        pd.concat(masked, ignore_index=True), crs=masked[next(iter(masked))].crs
+    id_column = polygons.index.name or "polygon_id"
+    xs, ys, ids = [], [], []
+    with span("grid_generation") as grid_span:
+        for owner, (idx, geometry) in enumerate(
+            tqdm(
+                polygons.geometry.items(),
+                total=polygons.shape[0],
+                desc="Generating target interpolation points for each polygon",
+                disable=bounds is not None,
+            )
+        ):
+            resolution = polygons["gridspace"].loc[idx]
+            bands = grid_points(geometry, resolution, bounds=bounds)
+            if refinement is not None:
+                bands = list(bands)
+                x = np.concatenate([x for x, _ in bands]) if bands else np.empty(0)
+                y = np.concatenate([y for _, y in bands]) if bands else np.empty(0)
+                # grid_points yields x = minx + col * resolution exactly
+                minx, miny = geometry.bounds[:2]
+                row = np.rint((y - miny) / resolution).astype(np.intp)
+                col = np.rint((x - minx) / resolution).astype(np.intp)
+                keep = refine_grid(row, col, (minx, miny), resolution, **refinement)
+                bands = [(x[keep], y[keep])]
+            for x, y in bands:
+                # drop points covered by a higher priority (lower value) polygon
+                with span("priority_masking", items=len(x)):
+                    keep = resolve_priorities(x, y, np.full(len(x), owner), polygons)
+                xs.append(x[keep])
+                ys.append(y[keep])
+                ids.append(np.full(keep.sum(), idx, dtype=polygons.index.dtype))
+        grid_span.items = sum(len(x) for x in xs)
+
+    return PointSet(
+        np.concatenate(xs) if xs else np.empty(0),
+        np.concatenate(ys) if ys else np.empty(0),
+        crs=polygons.crs,
+        attributes={
+            id_column: np.concatenate(ids) if ids else polygons.index[:0].to_numpy()
+        },
+    )
+
+
+def adaptive_refinement(config: dict, survey_points: PointSet):
+    """
+    Returns the refinement options of target_point_set for the adaptive
+    target grid settings in the configuration, or None for uniform grids.
+    """
+    levels = config["interpolation_polygons"].get("adaptive_levels", 0)
+    if not levels:
+        return None
+    columns = value_columns(survey_points)
+    return {
+        "levels": int(levels),
+        "survey_tree": cKDTree(np.column_stack([survey_points.x, survey_points.y])),
+        "survey_values": np.column_stack([survey_points[col] for col in columns]),
+        "max_gradient": config["interpolation_polygons"].get("adaptive_max_gradient"),
+        "max_points": config["interpolation_polygons"].get("adaptive_max_points"),
+    }
+
+
+def generate_target_points(polygons: gpd.GeoDataFrame, bounds=None):
+    """
+    Generate target interpolation points, optionally only those within
+    `bounds` (see polygon_to_mesh).
+    """
+    id_column = polygons.index.name or "polygon_id"
+    return target_point_set(polygons, bounds).to_geodataframe(
+        columns=["geometry", id_column]
     )
 
 
+def points_in_polygon(
+    x: np.ndarray, y: np.ndarray, geometry, chunk_size=1_000_000, workers=None
+):
+    """
+    Find the points that fall inside (or on the boundary of) a polygon,
+    excluding points in its holes. Equivalent to the selection made by
+    GeoDataFrame.clip for points, but works directly on coordinate arrays
+    using a vectorized test against the prepared polygon. Large inputs are
+    split into chunks that are tested in parallel threads.
+
+    Parameters:
+        x, y (np.ndarray): point coordinates
+        geometry (shapely.Polygon): polygon or multipolygon
+        chunk_size (int): number of points tested per chunk
+        workers (int): number of threads, defaults to the number of cpus (max 8)
+
+    Returns:
+        np.ndarray: boolean mask of the points inside the polygon
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    shapely.prepare(geometry)
+    chunks = [slice(i, i + chunk_size) for i in range(0, len(x), chunk_size)]
+    if len(chunks) <= 1:
+        return shapely.intersects_xy(geometry, x, y)
+
+    # test the first chunk in this thread so that the lazily built indexes of
+    # the prepared geometry exist before it is shared between threads
+    inside = np.empty(len(x), dtype=bool)
+    inside[chunks[0]] = shapely.intersects_xy(geometry, x[chunks[0]], y[chunks[0]])
+
+    def test_chunk(chunk):
+        inside[chunk] = shapely.intersects_xy(geometry, x[chunk], y[chunk])
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(test_chunk, chunks[1:]))
+    return inside
+
+
+def interpolate_polygon(
+    centerline: gpd.GeoDataFrame,
+    source_x: np.ndarray,
+    source_y: np.ndarray,
+    source_values: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+    ellipsivity: float,
+    nnear: int = 16,
+    power: float = 2,
+    cache_dir=None,
+    query_workers: int = 1,
+    max_distance: Optional[float] = None,
+    fill="nan",
+    sectors: Optional[int] = None,
+    nan_fallback: bool = False,
+    method: str = "aeidw",
+    source_sn: Optional[tuple] = None,
+    source_tree: Optional[cKDTree] = None,
+):
+    """
+    Interpolate survey values to the target points of one polygon with AEIDW,
+    or with method="linear" by linear interpolation on a Delaunay
+    triangulation of the survey points in the same anisotropic SN
+    coordinates.
+
+    Parameters:
+        centerline (gpd.GeoDataFrame): centerline of the polygon
+        source_x, source_y (np.ndarray): coordinates of the survey points
+        source_values (np.ndarray): survey values (shape: N, C)
+        target_x, target_y (np.ndarray): coordinates of the target points
+        ellipsivity (float): factor applied to the n coordinates
+        nnear (int): number of nearest neighbors used by idw
+        power (float): exponent of the inverse distance weights
+        cache_dir (str): optional SN transform cache directory
+        query_workers (int): number of threads used by the idw neighbor search
+        max_distance, fill, sectors, nan_fallback: idw options, distances are
+            measured in SN coordinates after the ellipsivity is applied. With
+            method="linear" max_distance, fill and sectors apply to the idw
+            outside the triangulation, which always falls back to valid
+            values for NaNs
+        method (str): "aeidw" or "linear". Linear interpolation falls back to
+            idw of the nnear nearest survey points outside the triangulation
+        source_sn (tuple): SN coordinates (s, n) of the survey points, if they
+            have already been transformed
+        source_tree (cKDTree): KD-tree of the survey points in SN coordinates
+            with the ellipsivity applied, reused by idw if given
+
+    Returns:
+        np.ndarray: interpolated values at the target points (shape: M, C)
+    """
+    # transform the survey_points and target points to SN coordinates
+    sn_cache = SNCache(cache_dir)
+    with span("sn_transform", items=len(target_x)):
+        if source_sn is None:
+            source_sn = sn_cache.xy_to_sn(centerline, source_x, source_y)
+        source_s, source_n = source_sn
+        target_s, target_n = sn_cache.xy_to_sn(centerline, target_x, target_y)
+
+    # apply ellipsivity factor and interpolate the elevations
+    coords = np.column_stack([source_s, source_n * ellipsivity])
+    query_points = np.column_stack([target_s, target_n * ellipsivity])
+    if method == "linear":
+        with span("linear", items=len(target_x)):
+            return linear(
+                coords,
+                source_values,
+                query_points,
+                max_distance_fill=fill,
+                nnear=nnear,
+                power=power,
+                workers=query_workers,
+                max_distance=max_distance,
+                sectors=sectors,
+            )
+
+    with span("idw", items=len(target_x)):
+        return idw(
+            coords=coords,
+            values=source_values,
+            query_points=query_points,
+            nnear=nnear,
+            power=power,
+            workers=query_workers,
+            max_distance=max_distance,
+            fill=fill,
+            sectors=sectors,
+            nan_fallback=nan_fallback,
+            tree=source_tree,
+        )
+
+
+def _interpolate_task(task: dict):
+    return interpolate_polygon(**task)
+
+
+def map_polygons(tasks, workers: int = 1):
+    """
+    Run interpolate_polygon for each dict of arguments in `tasks` and yield
+    the results in the same order. With workers > 1 the polygons are
+    interpolated in a pool of worker processes. `tasks` can be a generator,
+    it is only advanced while fewer than 2 * workers tasks are running or
+    waiting, so that only a few polygons' inputs are in memory at a time.
+    """
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_interpolate_task, task))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    else:
+        yield from map(_interpolate_task, tasks)
+
+
 def densify_geometry(gdf: gpd.GeoDataFrame, max_segment_length=10):
     dense_gdf = gdf.copy()
     dense_gdf["geometry"] = dense_gdf.segmentize(max_segment_length)
     return dense_gdf
 
 
-def read_lake_data(config: dict):
+def _survey_batches(
+    filepath, columns: list, chunk_size: int, block_size: int = 64 << 20
+):
     """
-    Read the data from the configuration file.
+    Read the `columns` of a survey points file in batches of up to
+    `chunk_size` rows. Parquet files and, if pyarrow is installed, CSV files
+    are read with pyarrow (in blocks of `block_size` bytes), other files with
+    pandas. CSV columns are always read as float64, as their type would
+    otherwise be inferred from the first block only.
+
+    Yields:
+        pd.DataFrame: the next batch of rows
     """
-    boundary = gpd.read_file(config["boundary"]["filepath"]).rename(
-        columns={config["boundary"]["elevation_column"]: "elevation"}
-    )[["elevation", "geometry"]]
-    boundary["source"] = config["boundary"]["filepath"]
-    boundary["type"] = "boundary"
-
-    lines = gpd.read_file(config["interpolation_centerlines"]["filepath"]).set_index(
-        config["interpolation_centerlines"]["polygon_id_column"]
-    )[["geometry"]]
-
-    polygons = (
-        gpd.read_file(config["interpolation_polygons"]["filepath"]).rename(
-            columns={
-                config["interpolation_polygons"]["polygon_id_column"]: "id",
-                config["interpolation_polygons"]["grid_spacing_column"]: "gridspace",
-                config["interpolation_polygons"]["priority_column"]: "priority",
-                config["interpolation_polygons"][
-                    "interpolation_method_column"
-                ]: "method",
-                config["interpolation_polygons"][
-                    "interpolation_params_column"
-                ]: "params",
-            }
+    suffix = Path(filepath).suffix.lower()
+    if suffix in (".parquet", ".geoparquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(filepath)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    try:
+        import pyarrow.csv as pv
+    except ImportError:
+        yield from pd.read_csv(
+            filepath,
+            usecols=columns,
+            dtype={col: np.float64 for col in columns},
+            chunksize=chunk_size,
         )
-    )[["id", "priority", "gridspace", "method", "params", "geometry"]].set_index("id")
+        return
+
+    import pyarrow as pa
+
+    reader = pv.open_csv(
+        filepath,
+        read_options=pv.ReadOptions(block_size=block_size),
+        convert_options=pv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.float64() for col in columns},
+        ),
+    )
+    for batch in reader:
+        for start in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(start, chunk_size).to_pandas()
+
+
+def _geoparquet_crs(filepath):
+    """
+    Returns the crs of the primary geometry column of a GeoParquet file, or
+    None if the file has no GeoParquet metadata.
+    """
+    import json
 
-    # Read the survey points CSV file
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(filepath).metadata or {}
+    if b"geo" not in metadata:
+        return None
+    geo = json.loads(metadata[b"geo"])
+    crs = geo["columns"][geo["primary_column"]].get("crs", "OGC:CRS84")
+    return pyproj.CRS.from_user_input(crs) if crs else None
+
+
+def read_survey_points(survey_config: dict, crs):
+    """
+    Read survey points from a CSV, Parquet or GeoParquet file, in batches of
+    `chunk_size` rows (default 1,000,000). Only the configured columns are
+    read, elevations are stored as `dtype` (float64 by default, float32
+    halves their memory) and coordinates are reprojected batch by batch from
+    the survey crs (the `crs` setting, or the GeoParquet crs) to `crs`.
+
+    A GeoParquet file without the configured x and y columns is read from
+    its geometry column.
+
+    Parameters:
+        survey_config (dict): survey_points section of the lake configuration
+        crs: crs of the lake boundary
+
+    Returns:
+        pd.DataFrame: x_coord, y_coord and elevation columns
+    """
+    filepath = survey_config["filepath"]
     columns = {
-        config["survey_points"]["x_coord_column"]: "x_coord",
-        config["survey_points"]["y_coord_column"]: "y_coord",
-        config["survey_points"][
-            "current_surface_elevation_column"
-        ]: "current_surface_elevation",
+        survey_config["x_coord_column"]: "x_coord",
+        survey_config["y_coord_column"]: "y_coord",
+        survey_config["current_surface_elevation_column"]: "current_surface_elevation",
     }
+    if survey_config.get("preimpoundment_elevation_column"):
+        columns[survey_config["preimpoundment_elevation_column"]] = (
+            "preimpoundment_elevation"
+        )
+    dtype = np.dtype(survey_config.get("dtype", "float64"))
+    chunk_size = int(survey_config.get("chunk_size", 1_000_000))
+
+    survey_crs = survey_config.get("crs", "") or None
+    geometry_column = None
+    if Path(filepath).suffix.lower() in (".parquet", ".geoparquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        names = pq.read_schema(filepath).names
+        if survey_config["x_coord_column"] not in names and "geometry" in names:
+            geometry_column = "geometry"
+            columns.pop(survey_config["x_coord_column"])
+            columns.pop(survey_config["y_coord_column"])
+            columns["geometry"] = "geometry"
+        survey_crs = survey_crs or _geoparquet_crs(filepath)
+
+    transformer = None
+    if survey_crs is not None and not pyproj.CRS(survey_crs).equals(crs):
+        transformer = pyproj.Transformer.from_crs(survey_crs, crs, always_xy=True)
 
-    if config["survey_points"].get("preimpoundment_elevation_column"):
-        columns.update(
-            {
-                config["survey_points"][
-                    "preimpoundment_elevation_column"
-                ]: "preimpoundment_elevation"
-            }
+    batches = []
+    for batch in _survey_batches(filepath, list(columns), chunk_size):
+        batch = batch.rename(columns=columns)
+        if geometry_column:
+            x, y = shapely.get_coordinates(
+                shapely.from_wkb(batch.pop(geometry_column).to_numpy())
+            ).T
+        else:
+            x = batch.pop("x_coord").to_numpy(dtype=np.float64)
+            y = batch.pop("y_coord").to_numpy(dtype=np.float64)
+        if transformer is not None:
+            x, y = transformer.transform(x, y)
+        batch = batch.astype(dtype)
+        batch.insert(0, "x_coord", x)
+        batch.insert(1, "y_coord", y)
+        batches.append(batch)
+
+    elevation_columns = [col for col in columns.values() if col.endswith("elevation")]
+    if not batches:
+        return pd.DataFrame(
+            columns=["x_coord", "y_coord"] + elevation_columns, dtype=np.float64
         )
+    return pd.concat(batches, ignore_index=True)
+
 
-    # Read the CSV file into a pandas DataFrame
-    df = pd.read_csv(
-        config["survey_points"]["filepath"], usecols=columns.keys()
-    ).rename(columns=columns)
-
-    # return df
-    # Create a geometry column from the longitude and latitude columns
-    geometry = [Point(xy) for xy in zip(df["x_coord"], df["y_coord"])]
-
-    # Create a GeoDataFrame
-    survey_crs = config["survey_points"].get("crs", "")
-    if survey_crs == "":
-        survey_crs = boundary.crs.to_string()
-    survey_points = gpd.GeoDataFrame(
-        df,
-        geometry=geometry,
-        crs=survey_crs,
-    ).drop(columns=["x_coord", "y_coord"])
+def read_lake_points(config: dict):
+    """
+    Read the data from the configuration file, with the survey points as a
+    PointSet in the crs of the boundary.
+    """
+    with span("read_shapefiles") as read_span:
+        boundary = gpd.read_file(config["boundary"]["filepath"]).rename(
+            columns={config["boundary"]["elevation_column"]: "elevation"}
+        )[["elevation", "geometry"]]
+        boundary["source"] = config["boundary"]["filepath"]
+        boundary["type"] = "boundary"
+
+        lines = gpd.read_file(
+            config["interpolation_centerlines"]["filepath"]
+        ).set_index(config["interpolation_centerlines"]["polygon_id_column"])[
+            ["geometry"]
+        ]
+
+        polygons = (
+            gpd.read_file(config["interpolation_polygons"]["filepath"]).rename(
+                columns={
+                    config["interpolation_polygons"]["polygon_id_column"]: "id",
+                    config["interpolation_polygons"][
+                        "grid_spacing_column"
+                    ]: "gridspace",
+                    config["interpolation_polygons"]["priority_column"]: "priority",
+                    config["interpolation_polygons"][
+                        "interpolation_method_column"
+                    ]: "method",
+                    config["interpolation_polygons"][
+                        "interpolation_params_column"
+                    ]: "params",
+                }
+            )
+        )[["id", "priority", "gridspace", "method", "params", "geometry"]].set_index(
+            "id"
+        )
+        read_span.items = len(boundary) + len(lines) + len(polygons)
+
+    # read the survey points in the boundary crs
+    with span("read_survey_points") as read_span:
+        df = read_survey_points(config["survey_points"], boundary.crs)
+        read_span.items = len(df)
+
+    # optionally thin dense along-track survey points to one point per cell
+    thin_cell_size = config["survey_points"].get("thin_cell_size")
+    if thin_cell_size:
+        n_points = len(df)
+        with span("thin_survey_points", items=n_points):
+            df = thin_points(
+                df,
+                thin_cell_size,
+                method=config["survey_points"].get("thin_method", "median"),
+            )
+        print(f"Survey points {thinning_report(n_points, len(df))}")
+
+    survey_points = PointSet(
+        df["x_coord"].to_numpy(),
+        df["y_coord"].to_numpy(),
+        crs=boundary.crs,
+        attributes={
+            col: df[col].to_numpy() for col in df.columns.drop(["x_coord", "y_coord"])
+        },
+    )
     survey_points["source"] = config["survey_points"]["filepath"]
     survey_points["type"] = "survey"
 
     return boundary, lines, polygons, survey_points
 
 
+def read_lake_data(config: dict):
+    """
+    Read the data from the configuration file.
+    """
+    boundary, lines, polygons, survey_points = read_lake_points(config)
+    survey_points = export_points(survey_points, value_columns(survey_points))
+    return boundary, lines, polygons, survey_points
+
+
+def add_boundary_points(
+    survey_points: PointSet, boundary: gpd.GeoDataFrame, max_segment_length
+):
+    """
+    Add the vertices of the densified lake boundary (including islands) to
+    the survey points, with the elevation of the boundary.
+    """
+    with span("densify_boundary") as densify_span:
+        dense_boundary = densify_geometry(
+            boundary, max_segment_length=max_segment_length
+        )
+
+        # add lake boundary elevations to survey_points
+        boundary_x = []
+        boundary_y = []
+        x, y = dense_boundary.iloc[0]["geometry"].exterior.coords.xy
+        boundary_x.append(x)
+        boundary_y.append(y)
+        for interior in dense_boundary.iloc[0]["geometry"].interiors:
+            x, y = interior.coords.xy
+            boundary_x.append(x)
+            boundary_y.append(y)
+
+        boundary_points = PointSet(
+            np.concatenate(boundary_x), np.concatenate(boundary_y), crs=boundary.crs
+        )
+        densify_span.items = len(boundary_points)
+    for column in value_columns(survey_points):
+        boundary_points[column] = float(boundary.iloc[0]["elevation"])
+    boundary_points["source"] = boundary["source"].iloc[0]
+    boundary_points["type"] = "boundary"
+    return PointSet.concat([survey_points, boundary_points])
+
+
+def interpolate_target_points(
+    config: dict,
+    polygons: gpd.GeoDataFrame,
+    lines: gpd.GeoDataFrame,
+    target_points: PointSet,
+    survey_points: PointSet,
+    columns: list,
+    progress: bool = True,
+    polygon_sources: Optional[dict] = None,
+):
+    """
+    Interpolate the target points of each polygon with the polygon's method
+    and add the interpolated `columns` and a categorical "source" column to
+    `target_points`.
+
+    Parameters:
+        config (dict): lake configuration
+        polygons (gpd.GeoDataFrame): interpolation polygons
+        lines (gpd.GeoDataFrame): centerline of each polygon
+        target_points (PointSet): target points with an "id" attribute
+        survey_points (PointSet): survey points with the `columns` attributes
+        columns (list): names of the value columns
+        progress (bool): show a progress bar
+        polygon_sources (dict): if given, the survey points of each polygon,
+            their SN coordinates and KD-tree are stored in this dict by
+            polygon id and reused by later calls with the same survey points
+
+    Returns:
+        PointSet: target_points with the interpolated values
+    """
+    target_x = target_points.x
+    target_y = target_points.y
+    survey_x = survey_points.x
+    survey_y = survey_points.y
+    survey_values = np.column_stack([survey_points[col] for col in columns])
+
+    # group the target points by polygon once, the rows of the i-th polygon
+    # are order[starts[i]:stops[i]]
+    target_ids = target_points["id"]
+    order = np.argsort(target_ids, kind="stable")
+    starts = np.searchsorted(target_ids[order], polygons.index, side="left")
+    stops = np.searchsorted(target_ids[order], polygons.index, side="right")
+
+    # results are written into preallocated arrays, the source of each target
+    # point is stored as a code into a list of per polygon source strings
+    target_values = np.full((len(target_points), len(columns)), np.nan)
+    sources = [""]
+    source_codes = np.zeros(len(target_points), dtype=np.int32)
+
+    # the neighbor search of each polygon uses all cpus unless the polygons
+    # themselves are interpolated in parallel processes
+    workers = config["interpolation_polygons"].get("workers", 1)
+    query_workers = -1 if workers <= 1 else 1
+
+    # apply the other methods here and record the AEIDW and linear polygons,
+    # whose inputs are only gathered when they are interpolated
+    interpolated = []
+    for i, idx in enumerate(polygons.index):
+        method = polygons["method"].loc[idx]
+        params = polygons["params"].loc[idx]
+
+        rows = order[starts[i] : stops[i]]
+        if len(rows) == 0:
+            if progress:
+                print(f"Polygon id {idx} not found in target_points")
+            continue
+
+        if method.lower() in ("aeidw", "linear"):
+            interpolated.append((idx, rows, method.lower(), params))
+        elif method.lower() == "constant":
+            # set the elevations to a constant value
+            target_values[rows] = float(params)
+        else:
+            print(f"Interpolation method {method} not recognized for polygon id {idx}")
+            continue
+
+        # add source infor
+        source_codes[rows] = len(sources)
+        sources.append(f"polygon: {idx},: method {method}, params: {params}")
+
+    def polygon_source(idx, method, params):
+        if polygon_sources is not None and idx in polygon_sources:
+            return polygon_sources[idx]
+        buffered = polygons.loc[[idx]].buffer(
+            config["interpolation_polygons"]["buffer"]
+        )
+        inside = points_in_polygon(survey_x, survey_y, buffered.union_all())
+        source = {
+            "source_x": survey_x[inside],
+            "source_y": survey_y[inside],
+            "source_values": survey_values[inside],
+        }
+        if polygon_sources is not None:
+            sn_cache = SNCache(config.get("cache", {}).get("directory"))
+            with span("sn_transform", items=inside.sum()):
+                source_s, source_n = sn_cache.xy_to_sn(
+                    lines.loc[[idx]], source["source_x"], source["source_y"]
+                )
+            source["source_sn"] = (source_s, source_n)
+            if method == "aeidw" and len(source_s):
+                source["source_tree"] = cKDTree(
+                    np.column_stack([source_s, source_n * params])
+                )
+            polygon_sources[idx] = source
+        return source
+
+    def polygon_task(idx, rows, method, params):
+        return {
+            "centerline": lines.loc[[idx]],
+            **polygon_source(idx, method, params),
+            "target_x": target_x[rows],
+            "target_y": target_y[rows],
+            "ellipsivity": params,
+            "nnear": config["interpolation_polygons"].get("nearest_neighbors", 16),
+            "power": config["interpolation_polygons"].get("power", 2),
+            "cache_dir": config.get("cache", {}).get("directory"),
+            "query_workers": query_workers,
+            "max_distance": config["interpolation_polygons"].get("max_distance"),
+            "fill": config["interpolation_polygons"].get("max_distance_fill", "nan"),
+            "sectors": config["interpolation_polygons"].get("sectors"),
+            "nan_fallback": config["interpolation_polygons"].get("nan_fallback", False),
+            "method": method,
+        }
+
+    # build the inputs of each polygon only when it is interpolated, reusing
+    # the results of polygons whose inputs have not changed. The rows and
+    # cache key of each yielded task are queued for its result.
+    result_cache = ResultCache(config.get("cache", {}).get("directory"))
+    queued = deque()
+    n_cached = 0
+
+    def polygon_tasks(progress_bar):
+        nonlocal n_cached
+        for idx, rows, method, params in interpolated:
+            task = polygon_task(idx, rows, method, params)
+            key = result_cache.key(task)
+            cached = result_cache.load(key)
+            if cached is not None:
+                target_values[rows] = cached
+                n_cached += 1
+                progress_bar.update()
+                continue
+            queued.append((rows, key))
+            yield task
+
+    # interpolate the polygons, in parallel processes if workers > 1
+    with span("interpolate_polygons", items=len(target_points)):
+        with tqdm(
+            total=len(interpolated),
+            desc="Interpolating each polygon",
+            disable=not progress,
+        ) as progress_bar:
+            for new_elevs in map_polygons(polygon_tasks(progress_bar), workers):
+                rows, key = queued.popleft()
+                target_values[rows] = new_elevs
+                result_cache.save(key, new_elevs)
+                progress_bar.update()
+    if progress and n_cached:
+        print(f"Using cached results for {n_cached} polygons")
+
+    # add the interpolated elevations and sources to the target_points
+    for i, col in enumerate(columns):
+        target_points[col] = target_values[:, i]
+    target_points["source"] = pd.Categorical.from_codes(source_codes, sources)
+    return target_points
+
+
+def value_columns(survey_points):
+    """
+    Names of the elevation columns that are interpolated.
+    """
+    if "preimpoundment_elevation" in survey_points:
+        return ["current_surface_elevation", "preimpoundment_elevation"]
+    return ["current_surface_elevation"]
+
+
 def aeidw(config: dict):
     """
     Interpolate the survey points.
+
+    Returns:
+        gpd.GeoDataFrame: survey, boundary and interpolated target points
+    """
+    return export_points(*lake_points(config))
+
+
+def lake_points(config: dict):
+    """
+    Interpolate the survey points like aeidw, but return the points as a
+    PointSet, e.g. to export them in chunks with export_chunks.
+
+    Returns:
+        tuple: (PointSet of the survey, boundary and target points, list of
+            the value columns)
     """
 
     # densify boundary, and centerlines - done
@@ -154,127 +1038,172 @@ def aeidw(config: dict):
     # .. interpolate the elevations with idw
     # write out files
 
-    # read files
-    boundary, lines, polygons, survey_points = read_lake_data(config)
-
-    dense_boundary = densify_geometry(
-        boundary, max_segment_length=config["boundary"]["max_segment_length"]
+    # read files, the points are kept in PointSets until they are exported
+    boundary, lines, polygons, survey_points = read_lake_points(config)
+    survey_points = add_boundary_points(
+        survey_points, boundary, config["boundary"]["max_segment_length"]
     )
 
-    # add lake boundary elevations to survey_points
-    boundary_x = []
-    boundary_y = []
-    x, y = dense_boundary.iloc[0]["geometry"].exterior.coords.xy
-    boundary_x.append(x)
-    boundary_y.append(y)
-    for interior in dense_boundary.iloc[0]["geometry"].interiors:
-        x, y = interior.coords.xy
-        boundary_x.append(x)
-        boundary_y.append(y)
+    # generate target interpolation points, on adaptive grids if configured
+    target_points = target_point_set(
+        polygons, refinement=adaptive_refinement(config, survey_points)
+    )
 
-    boundary_points = gpd.GeoDataFrame(
-        gpd.GeoSeries(
-            gpd.points_from_xy(
-                x=np.concatenate(boundary_x), y=np.concatenate(boundary_y)
-            ),
-            crs=boundary.crs,
-            name="geometry",
+    # remove points outside the boundary or within islands, then optionally
+    # store the coordinates as float32
+    with span("clip", items=len(target_points)):
+        inside = points_in_polygon(
+            target_points.x, target_points.y, boundary.geometry.union_all()
         )
-    )
-    boundary_points["current_surface_elevation"] = boundary.iloc[0]["elevation"]
-    if "preimpoundment_elevation" in survey_points.columns:
-        boundary_points["preimpoundment_elevation"] = boundary.iloc[0]["elevation"]
-    boundary_points["source"] = boundary["source"].iloc[0]
-    boundary_points["type"] = "boundary"
-    survey_points = gpd.GeoDataFrame(
-        pd.concat(
-            [survey_points, boundary_points],
-            ignore_index=True,
-        ),
-        crs=survey_points.crs,
+        target_points = target_points.take(inside).astype(
+            config["interpolation_polygons"].get("coordinate_dtype", "float64")
+        )
+
+    target_points["type"] = "interpolated"
+
+    columns = value_columns(survey_points)
+    target_points = interpolate_target_points(
+        config, polygons, lines, target_points, survey_points, columns
     )
 
-    # generate target interpolation points
-    target_points = generate_target_points(polygons)
+    # concatenate the survey points and target points
+    return PointSet.concat([survey_points, target_points]), columns
 
-    # remove points outside the boundary or within islands
-    target_points = target_points.clip(boundary)
 
-    target_points["source"] = ""
-    target_points["type"] = "interpolated"
+def export_points(points: PointSet, columns: list):
+    """
+    Build the GeoDataFrame of survey or target points returned by aeidw,
+    with the value `columns` followed by the geometry, a categorical source
+    and the point type.
+    """
+    output = ["geometry", "source", "type"] + (["id"] if "id" in points else [])
+    with span("export_points", items=len(points)):
+        gdf = points.to_geodataframe(columns=columns + output)
+        gdf["type"] = gdf["type"].astype(str)
+    return gdf
 
-    for idx, _ in tqdm(
-        polygons.iterrows(),
-        total=polygons.shape[0],
-        desc="Interpolating each polygon",
-    ):
-        method = polygons["method"].loc[idx]
-        params = polygons["params"].loc[idx]
 
-        target_idx = target_points["id"] == idx
-        if target_idx.empty:
-            print(f"Polygon id {idx} not found in target_points")
-            continue
+def export_chunks(points: PointSet, columns: list, chunk_size: int = 250_000):
+    """
+    Export the points like export_points, `chunk_size` points at a time, so
+    that only one chunk of shapely Points is in memory at once.
 
-        # interpolate the elevations
-        if method.lower() == "aeidw":
-            # get the centerline for the polygon
-            centerline = lines.loc[[idx]]
-            source_points = survey_points.clip(
-                polygons.loc[[idx]].buffer(config["interpolation_polygons"]["buffer"])
-            )
+    Yields:
+        gpd.GeoDataFrame: the next chunk of points
+    """
+    for start in range(0, len(points), chunk_size):
+        yield export_points(points.take(slice(start, start + chunk_size)), columns)
 
-            # transform the survey_points and target points to SN coordinates
-            sn_transform = Coord_SN(centerline)
-            source_points_sn = sn_transform.transform_xy_to_sn(source_points)
-            target_points_sn = sn_transform.transform_xy_to_sn(
-                target_points[target_idx]
-            )
 
-            # apply ellipsivity factor
-            source_points_sn["n_coord"] = source_points_sn["n_coord"] * params
-            target_points_sn["n_coord"] = target_points_sn["n_coord"] * params
-
-            # interpolate the elevations
-            if "preimpoundment_elevation" in source_points_sn.columns:
-                columns = ["current_surface_elevation", "preimpoundment_elevation"]
-            else:
-                columns = ["current_surface_elevation"]
-
-            new_elevs = idw(
-                coords=source_points_sn[["s_coord", "n_coord"]].to_numpy(),
-                values=source_points_sn[columns].to_numpy(),
-                query_points=target_points_sn[["s_coord", "n_coord"]].to_numpy(),
-                nnear=config["interpolation_polygons"].get("nearest_neighbors", 16),
+def tile_bounds(bounds, tile_size: float):
+    """
+    Split bounds (minx, miny, maxx, maxy) into square tiles of `tile_size`,
+    starting at the lower left corner. The last row and column of tiles
+    extend past maxx and maxy.
+
+    Yields:
+        tuple: (minx, miny, maxx, maxy) of each tile, in row major order
+    """
+    minx, miny, maxx, maxy = bounds
+    nx = int((maxx - minx) // tile_size) + 1
+    ny = int((maxy - miny) // tile_size) + 1
+    for row in range(ny):
+        for col in range(nx):
+            yield (
+                minx + col * tile_size,
+                miny + row * tile_size,
+                minx + (col + 1) * tile_size,
+                miny + (row + 1) * tile_size,
             )
 
-            # add the interpolated elevations to the target_points
-            target_points.loc[target_idx, "current_surface_elevation"] = new_elevs[:, 0]
-            if "preimpoundment_elevation" in source_points_sn.columns:
-                target_points.loc[target_idx, "preimpoundment_elevation"] = new_elevs[
-                    :, 1
-                ]
 
-            # add source and type infor to dataframe
-            target_points.loc[target_idx, "source"] = (
-                f"polygon: {idx},: method {method}, params: {params}"
-            )
-        elif method.lower() == "constant":
-            # set the elevations to a constant value
-            elev = float(params)
-            target_points.loc[target_idx, "current_surface_elevation"] = elev
-            if "preimpoundment_elevation" in source_points.columns:
-                target_points.loc[target_idx, "preimpoundment_elevation"] = elev
+def aeidw_tiles(config: dict, tile_size: float, overlap: Optional[float] = None):
+    """
+    Interpolate the survey points one spatial tile at a time, so that peak
+    memory depends on the tile size rather than the size of the lake.
 
-            target_points.loc[target_idx, "source"] = (
-                f"polygon: {idx},: method {method}, params: {params}"
-            )
-        else:
-            print(f"Interpolation method {method} not recognized for polygon id {idx}")
+    The first GeoDataFrame yielded holds the survey and boundary points, each
+    one after that the interpolated target points of one tile. Together they
+    contain the same points and values as the output of aeidw. The target
+    grids of all tiles share the origin of their polygon's grid.
 
-    # concatenate the survey points and target points
-    all_points = gpd.GeoDataFrame(
-        pd.concat([survey_points, target_points], ignore_index=True),
-        crs=survey_points.crs,
+    By default each polygon's survey points are selected, transformed to SN
+    coordinates and indexed in a KD-tree once, and reused by every tile the
+    polygon overlaps until its last tile, so the results are identical to
+    aeidw. With `overlap` the survey points are selected for each tile
+    instead: a target point near a tile edge then differs from aeidw when
+    some of its nearest neighbors in SN coordinates (with the ellipsivity
+    applied) lie more than `overlap` outside the tile, which is most likely
+    across the survey lines of polygons with a large ellipsivity, or in
+    sparsely surveyed areas.
+
+    Parameters:
+        config (dict): lake configuration
+        tile_size (float): tile width and height in map units
+        overlap (float): if given, only survey points within this distance of
+            a tile are used to interpolate it. By default the survey points
+            of each polygon are used for all of its tiles.
+
+    Yields:
+        gpd.GeoDataFrame: survey points, then the target points of each tile
+    """
+    boundary, lines, polygons, survey_points = read_lake_points(config)
+    survey_points = add_boundary_points(
+        survey_points, boundary, config["boundary"]["max_segment_length"]
     )
-    return all_points
+
+    columns = value_columns(survey_points)
+    yield export_points(survey_points, columns)
+
+    boundary_geometry = boundary.geometry.union_all()
+    refinement = adaptive_refinement(config, survey_points)
+    tiles = list(tile_bounds(polygons.total_bounds, tile_size))
+
+    # only polygons that overlap a tile have target points in it, the survey
+    # points of a polygon are kept until the last tile it overlaps
+    tile_indexes = [
+        polygons.cx[bounds[0] : bounds[2], bounds[1] : bounds[3]].index
+        for bounds in tiles
+    ]
+    last_tile = {idx: i for i, index in enumerate(tile_indexes) for idx in index}
+    polygon_sources = {} if overlap is None else None
+
+    for i, bounds in enumerate(tqdm(tiles, desc="Interpolating each tile")):
+        if polygon_sources:
+            for idx in [idx for idx in polygon_sources if last_tile[idx] < i]:
+                del polygon_sources[idx]
+        tile_polygons = polygons.loc[tile_indexes[i]]
+        if len(tile_polygons) == 0:
+            continue
+        target_points = target_point_set(tile_polygons, bounds, refinement)
+        with span("clip", items=len(target_points)):
+            inside = points_in_polygon(
+                target_points.x, target_points.y, boundary_geometry
+            )
+            target_points = target_points.take(inside).astype(
+                config["interpolation_polygons"].get("coordinate_dtype", "float64")
+            )
+        if len(target_points) == 0:
+            continue
+        target_points["type"] = "interpolated"
+
+        near = slice(None)
+        if overlap is not None:
+            survey_x, survey_y = survey_points.x, survey_points.y
+            near = (
+                (survey_x >= bounds[0] - overlap)
+                & (survey_x < bounds[2] + overlap)
+                & (survey_y >= bounds[1] - overlap)
+                & (survey_y < bounds[3] + overlap)
+            )
+        target_points = interpolate_target_points(
+            config,
+            tile_polygons,
+            lines,
+            target_points,
+            survey_points.take(near),
+            columns,
+            progress=False,
+            polygon_sources=polygon_sources,
+        )
+        yield export_points(target_points, columns)
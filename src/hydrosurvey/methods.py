@@ -1,33 +1,408 @@
 import numpy as np
-from scipy.spatial import cKDTree
+from scipy.spatial import Delaunay, QhullError, cKDTree
 
 
-def idw(coords, values, query_points, nnear=16, power=2):
+def sector_mask(coords, query_points, indices, found, nnear, sectors):
+    """
+    Select up to nnear // sectors of the nearest candidate neighbors in each
+    of `sectors` equal angular sectors around every query point (quadrant
+    search for sectors=4), so that the neighbors are not all taken from one
+    side of a dense survey line.
+
+    Parameters:
+        coords (np.ndarray): coordinates of the known data points (shape: N, 2)
+        query_points (np.ndarray): coordinates of the query points (shape: M, 2)
+        indices (np.ndarray): candidate neighbors sorted by distance (shape: M, K)
+        found (np.ndarray): mask of valid candidates (shape: M, K)
+        nnear (int): total number of neighbors
+        sectors (int): number of sectors
+
+    Returns:
+        np.ndarray: mask of the selected candidates (shape: M, K)
+    """
+    offset = coords[indices] - query_points[:, np.newaxis, :]
+    angle = np.arctan2(offset[..., 1], offset[..., 0]) + np.pi
+    sector = np.floor(angle * sectors / (2 * np.pi)).astype(np.int64) % sectors
+
+    # candidates are sorted by distance, so the running count of candidates in
+    # a sector is each candidate's rank within its sector
+    per_sector = max(1, nnear // sectors)
+    selected = np.zeros_like(found)
+    for s in range(sectors):
+        in_sector = found & (sector == s)
+        selected |= in_sector & (np.cumsum(in_sector, axis=1) <= per_sector)
+    return selected
+
+
+def sector_neighbors(
+    tree, query_points, nnear, sectors, max_distance=None, workers=1, exclude=None
+):
+    """
+    Find up to nnear // sectors nearest neighbors in each of `sectors` angular
+    sectors around every query point (see sector_mask). The search starts
+    from the nnear * sectors nearest candidates and doubles the number of
+    candidates of the query points with a sector that is not full, up to
+    nnear * sectors * 8 candidates, so that a sector can pick points of a
+    distant survey line behind many points of a nearer one. Query points
+    that still have an empty sector at that point, e.g. on the shore side
+    of a survey, keep the sectors they have.
+
+    Parameters:
+        tree (cKDTree): KD-tree of the known data points (2D)
+        query_points (np.ndarray): coordinates of the query points (shape: M, 2)
+        nnear (int): total number of neighbors
+        sectors (int): number of sectors
+        max_distance (float): only use neighbors within this distance
+        workers (int): number of threads used by the KD-tree query
+        exclude (np.ndarray): index of a data point that is not a neighbor
+            of each query point, e.g. itself (shape: M, default: None)
+
+    Returns:
+        tuple: distances, indices and mask of the selected neighbors, nearest
+            first (shape: M, nnear // sectors * sectors)
+    """
+    n = tree.n
+    width = max(1, nnear // sectors) * sectors
+    upper_bound = np.inf if max_distance is None else max_distance
+    m = query_points.shape[0]
+    distances = np.full((m, width), np.inf)
+    indices = np.zeros((m, width), dtype=np.intp)
+    found = np.zeros((m, width), dtype=bool)
+
+    k = min(nnear * sectors + (exclude is not None), n)
+    max_k = min(k * 8, n)
+    # bound the size of each query by that of the first one
+    size = max(m, 1) * k
+    rows = np.arange(m)
+    while len(rows):
+        unfilled = []
+        for start in range(0, len(rows), max(1, size // k)):
+            chunk = rows[start : start + max(1, size // k)]
+            d, i = tree.query(
+                query_points[chunk],
+                k=k,
+                distance_upper_bound=upper_bound,
+                workers=workers,
+            )
+            if k == 1:
+                d, i = d[:, np.newaxis], i[:, np.newaxis]
+
+            # neighbors beyond max_distance are returned with index n
+            candidates = i < n
+            more = candidates[:, -1] & (k < max_k)
+            if exclude is not None:
+                candidates &= i != exclude[chunk, np.newaxis]
+            i = np.where(candidates, i, 0)
+            selected = sector_mask(
+                tree.data, query_points[chunk], i, candidates, nnear, sectors
+            )
+
+            # keep the selected neighbors, nearest first
+            order = np.argsort(~selected, axis=1, kind="stable")[:, :width]
+            columns = slice(0, order.shape[1])
+            distances[chunk, columns] = np.take_along_axis(d, order, axis=1)
+            indices[chunk, columns] = np.take_along_axis(i, order, axis=1)
+            found[chunk, columns] = np.take_along_axis(selected, order, axis=1)
+            unfilled.append(chunk[more & (found[chunk].sum(axis=1) < width)])
+        rows = np.concatenate(unfilled)
+        k = min(2 * k, max_k)
+    return distances, indices, found
+
+
+def _idw(
+    tree, values, query_points, nnear, power, chunk_size, workers, max_distance, sectors
+):
+    """
+    Chunked IDW query against a KD-tree. NaN values are left out of the
+    weighted mean of their column, a column is NaN where all neighbors are
+    NaN. Returns the interpolated values and a mask of the query points with
+    no neighbors within max_distance.
+    """
+    n = tree.n
+    nnear = min(nnear, n)
+    upper_bound = np.inf if max_distance is None else max_distance
+    has_nan = np.isnan(values).any()
+
+    interpolated_values = np.empty((query_points.shape[0], values.shape[1]))
+    empty = np.zeros(query_points.shape[0], dtype=bool)
+    for start in range(0, query_points.shape[0], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        if sectors:
+            distances, indices, found = sector_neighbors(
+                tree, query_points[chunk], nnear, sectors, max_distance, workers
+            )
+        else:
+            distances, indices = tree.query(
+                query_points[chunk],
+                k=nnear,
+                distance_upper_bound=upper_bound,
+                workers=workers,
+            )
+            if nnear == 1:
+                distances = distances[:, np.newaxis]
+                indices = indices[:, np.newaxis]
+
+            # neighbors beyond max_distance are returned with index n
+            found = indices < n
+            indices = np.where(found, indices, 0)
+
+        # Calculate weights
+        weights = np.zeros_like(distances)
+        weights[found] = 1.0 / (distances[found] + 1e-10) ** power
+        empty[chunk] = ~found.any(axis=1)
+
+        # Weighted sum of all columns at once, normalized by the total weight
+        # of the non NaN values in each column
+        neighbor_values = np.take(values, indices, axis=0)
+        if has_nan:
+            valid = ~np.isnan(neighbor_values)
+            neighbor_values = np.where(valid, neighbor_values, 0.0)
+            total = np.einsum("mk,mkc->mc", weights, valid)
+        else:
+            total = weights.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            interpolated_values[chunk] = (
+                np.einsum("mk,mkc->mc", weights, neighbor_values) / total
+            )
+
+    return interpolated_values, empty
+
+
+def _fill_nan_columns(
+    coords, values, query_points, interpolated_values, rows=None, **kwargs
+):
+    """
+    For each value column with NaNs, re-interpolate the query points (in the
+    `rows` mask, default all) whose neighbors were all NaN from the nearest
+    points with a valid value in that column. A KD-tree of the valid points
+    is only built for columns with affected query points. Updates
+    interpolated_values in place.
+    """
+    for col in np.flatnonzero(np.isnan(values).any(axis=0)):
+        affected = np.isnan(interpolated_values[:, col])
+        if rows is not None:
+            affected &= rows
+        valid = ~np.isnan(values[:, col])
+        if not affected.any() or not valid.any():
+            continue
+        column_values, _ = _idw(
+            cKDTree(coords[valid]),
+            values[valid][:, [col]],
+            query_points[affected],
+            **kwargs,
+        )
+        interpolated_values[affected, col] = column_values[:, 0]
+
+
+def idw(
+    coords,
+    values,
+    query_points,
+    nnear=16,
+    power=2,
+    chunk_size=100_000,
+    workers=1,
+    max_distance=None,
+    fill="nan",
+    sectors=None,
+    nan_fallback=False,
+    tree=None,
+):
     """
     Perform Inverse Distance Weighting interpolation.
 
+    Query points are processed in chunks of `chunk_size` so that memory use is
+    bounded by chunk_size * nnear regardless of the number of query points.
+    NaN values are ignored: each column is the weighted mean of the neighbors
+    with a valid value in that column, or NaN if there are none.
+
     Parameters:
         coords (np.ndarray): Array of coordinates for known data points (shape: N, D)
         values (np.ndarray): Array of values at known data points (shape: N, C)
         query_points (np.ndarray): Array of coordinates for query points (shape: M, D)
+        nnear (int): Number of nearest neighbors used (default: 16, at most N)
         power (float): Exponent for the inverse distance weighting (default: 2)
+        chunk_size (int): Number of query points processed at a time
+        workers (int): Number of threads used by the KD-tree query (-1 for all cpus)
+        max_distance (float): Only use neighbors within this distance (default: None)
+        fill (str or float): Value of query points with no neighbors within
+            max_distance, "nan", "nearest" (use the nearest neighbors at any
+            distance) or a constant (default: "nan")
+        sectors (int): Select nnear // sectors neighbors from each of this many
+            angular sectors around the query point, e.g. 4 for a quadrant search,
+            searching further out for sectors without enough nearby points.
+            Only for 2D coordinates (default: None)
+        nan_fallback (bool): Interpolate query points whose neighbors are all
+            NaN in a column from the nearest points with a valid value in that
+            column instead of returning NaN (default: False)
+        tree (cKDTree): KD-tree of coords, e.g. to reuse it for several sets of
+            query points (default: built from coords)
 
     Returns:
         np.ndarray: Array of interpolated values at query points (shape: M, C)
     """
+    if sectors and coords.shape[1] != 2:
+        raise ValueError("Sector neighbor search requires 2D coordinates")
+    if isinstance(fill, str) and fill not in ("nan", "nearest"):
+        raise ValueError(f"Fill strategy {fill} not recognized")
+
+    options = {
+        "nnear": nnear,
+        "power": power,
+        "chunk_size": chunk_size,
+        "workers": workers,
+        "sectors": sectors,
+    }
+    tree = cKDTree(coords) if tree is None else tree
+    interpolated_values, empty = _idw(
+        tree, values, query_points, max_distance=max_distance, **options
+    )
+    if nan_fallback:
+        _fill_nan_columns(
+            coords,
+            values,
+            query_points,
+            interpolated_values,
+            ~empty,
+            max_distance=max_distance,
+            **options,
+        )
+
+    if empty.any() and fill != "nan":
+        if fill == "nearest":
+            nearest_values, _ = _idw(
+                tree, values, query_points[empty], max_distance=None, **options
+            )
+            if nan_fallback:
+                _fill_nan_columns(
+                    coords,
+                    values,
+                    query_points[empty],
+                    nearest_values,
+                    max_distance=None,
+                    **options,
+                )
+            interpolated_values[empty] = nearest_values
+        else:
+            interpolated_values[empty] = float(fill)
+
+    return interpolated_values
+
+
+def _barycentric(coords, values, query_points, chunk_size):
+    """
+    Linear interpolation on the Delaunay triangulation of coords. Query
+    points outside the convex hull are NaN.
+    """
+    tri = Delaunay(coords)
+    ndim = coords.shape[1]
+
+    # find_simplex walks the triangulation from the triangle of the previous
+    # query point, so query points are located in rows about one data point
+    # spacing high, which keeps the walks short
+    spacing = np.sqrt(np.prod(np.ptp(coords, axis=0)) / len(coords)) or 1.0
+    order = np.lexsort((query_points[:, 0], np.floor(query_points[:, 1] / spacing)))
+
+    interpolated_values = np.full((query_points.shape[0], values.shape[1]), np.nan)
+    for start in range(0, query_points.shape[0], chunk_size):
+        rows = order[start : start + chunk_size]
+        simplex = tri.find_simplex(query_points[rows])
+        inside = simplex >= 0
+        simplex = simplex[inside]
+
+        # barycentric coordinates from the affine transform of each triangle
+        transform = tri.transform[simplex]
+        b = np.einsum(
+            "mij,mj->mi",
+            transform[:, :ndim],
+            query_points[rows[inside]] - transform[:, ndim],
+        )
+        weights = np.column_stack([b, 1 - b.sum(axis=1)])
+        interpolated_values[rows[inside]] = np.einsum(
+            "mk,mkc->mc", weights, values[tri.simplices[simplex]]
+        )
+    return interpolated_values
+
+
+def linear(
+    coords,
+    values,
+    query_points,
+    chunk_size=100_000,
+    fill="nearest",
+    max_distance_fill="nan",
+    **idw_options,
+):
+    """
+    Perform linear (TIN) interpolation: the values at each query point are
+    the barycentric weighted mean of the values at the corners of the
+    Delaunay triangle that contains it. All query points are located in the
+    triangulation at once, so for densely surveyed areas this is much faster
+    than IDW with many neighbors and has no bull's-eye artifacts around
+    isolated points.
+
+    NaN values are left out: columns with NaNs are interpolated on a separate
+    triangulation of their valid points.
 
-    tree = cKDTree(coords)
-    distances, indices = tree.query(query_points, k=nnear)
+    Parameters:
+        coords (np.ndarray): Array of coordinates for known data points (shape: N, D)
+        values (np.ndarray): Array of values at known data points (shape: N, C)
+        query_points (np.ndarray): Array of coordinates for query points (shape: M, D)
+        chunk_size (int): Number of query points processed at a time
+        fill (str or float): Value of query points outside the convex hull of
+            the data points (or all query points if there are too few data
+            points to triangulate), "nearest" to use idw of the nearest data
+            points (default), "nan" or a constant
+        max_distance_fill (str or float): fill of idw for fill="nearest",
+            used with a max_distance idw option
+        idw_options: options passed to idw for fill="nearest", e.g. nnear,
+            power, max_distance or sectors
 
-    # Calculate weights
-    weights = 1.0 / (distances + 1e-10) ** power
+    Returns:
+        np.ndarray: Array of interpolated values at query points (shape: M, C)
+    """
+    if isinstance(fill, str) and fill not in ("nan", "nearest"):
+        raise ValueError(f"Fill strategy {fill} not recognized")
 
-    # Normalize weights
-    weights /= weights.sum(axis=1, keepdims=True)
+    interpolated_values = np.full((query_points.shape[0], values.shape[1]), np.nan)
+    nan_columns = np.isnan(values).any(axis=0)
+    groups = [(np.ones(len(coords), dtype=bool), np.flatnonzero(~nan_columns))]
+    groups += [
+        (~np.isnan(values[:, col]), [col]) for col in np.flatnonzero(nan_columns)
+    ]
+    for valid, columns in groups:
+        if len(columns) == 0:
+            continue
+        try:
+            interpolated_values[:, columns] = _barycentric(
+                coords[valid], values[valid][:, columns], query_points, chunk_size
+            )
+        except (QhullError, ValueError):
+            # too few or collinear points to triangulate
+            continue
 
-    # Interpolate each column separately
-    interpolated_values = np.zeros((query_points.shape[0], values.shape[1]))
-    for i in range(values.shape[1]):
-        interpolated_values[:, i] = np.sum(weights * values[indices, i], axis=1)
+    outside = np.isnan(interpolated_values).any(axis=1)
+    if outside.any() and fill != "nan":
+        if fill == "nearest":
+            nearest_values = idw(
+                coords,
+                values,
+                query_points[outside],
+                chunk_size=chunk_size,
+                fill=max_distance_fill,
+                nan_fallback=True,
+                **idw_options,
+            )
+            interpolated_values[outside] = np.where(
+                np.isnan(interpolated_values[outside]),
+                nearest_values,
+                interpolated_values[outside],
+            )
+        else:
+            interpolated_values[outside] = np.where(
+                np.isnan(interpolated_values[outside]),
+                float(fill),
+                interpolated_values[outside],
+            )
 
     return interpolated_values
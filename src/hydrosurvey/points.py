@@ -0,0 +1,178 @@
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+
+class PointSet(object):
+    """
+    Columnar store of points used by the interpolation pipeline: coordinate
+    arrays plus a dict of attribute arrays of the same length (string
+    attributes are stored as pandas Categoricals). This avoids the overhead
+    of a shapely Point per point; GeoDataFrames are only built on export with
+    `to_geodataframe`.
+
+    With dtype=np.float32 the coordinates are stored as float32 offsets from
+    a local `origin` (by default the lower left corner of the points rounded
+    down to a whole unit), which halves their memory at a precision of about
+    1e-7 times the extent of the points. The `x` and `y` properties always
+    return float64 coordinates.
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        crs=None,
+        attributes: Optional[dict] = None,
+        dtype=np.float64,
+        origin: Optional[tuple] = None,
+    ):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.dtype = np.dtype(dtype)
+        if self.dtype == np.float64:
+            origin = (0.0, 0.0)
+        elif origin is None:
+            origin = (
+                (float(np.floor(x.min())), float(np.floor(y.min())))
+                if len(x)
+                else (0.0, 0.0)
+            )
+        self.origin = origin
+        self._x = (x - origin[0]).astype(self.dtype)
+        self._y = (y - origin[1]).astype(self.dtype)
+        self.crs = crs
+        self.attributes = {}
+        for name, values in (attributes or {}).items():
+            self[name] = values
+
+    @property
+    def x(self):
+        if self.dtype == np.float64:
+            return self._x
+        return self._x.astype(np.float64) + self.origin[0]
+
+    @property
+    def y(self):
+        if self.dtype == np.float64:
+            return self._y
+        return self._y.astype(np.float64) + self.origin[1]
+
+    def __len__(self):
+        return len(self._x)
+
+    def __contains__(self, name):
+        return name in self.attributes
+
+    def __getitem__(self, name):
+        return self.attributes[name]
+
+    def __setitem__(self, name, values):
+        """
+        Set an attribute from an array, or from a scalar that is repeated for
+        every point. Strings are stored as Categoricals.
+        """
+        if np.ndim(values) == 0:
+            if isinstance(values, str):
+                values = pd.Categorical.from_codes(
+                    np.zeros(len(self), dtype=np.int8), [values]
+                )
+            else:
+                values = np.full(len(self), values)
+        elif not isinstance(values, pd.Categorical):
+            values = np.asarray(values)
+            if values.dtype == object:
+                values = pd.Categorical(values)
+        if len(values) != len(self):
+            raise ValueError(
+                f"Attribute {name} has {len(values)} values for {len(self)} points"
+            )
+        self.attributes[name] = values
+
+    @property
+    def nbytes(self):
+        """Memory used by the coordinates and numeric attributes."""
+        return (
+            self._x.nbytes
+            + self._y.nbytes
+            + sum(values.nbytes for values in self.attributes.values())
+        )
+
+    def take(self, index):
+        """
+        Returns a new PointSet of the points selected by a boolean mask or an
+        array of positions.
+        """
+        subset = PointSet.__new__(PointSet)
+        subset.dtype = self.dtype
+        subset.origin = self.origin
+        subset._x = self._x[index]
+        subset._y = self._y[index]
+        subset.crs = self.crs
+        subset.attributes = {
+            name: values[index] for name, values in self.attributes.items()
+        }
+        return subset
+
+    def astype(self, dtype):
+        """
+        Returns a PointSet with the coordinates stored as `dtype`.
+        """
+        if np.dtype(dtype) == self.dtype:
+            return self
+        return PointSet(
+            self.x, self.y, crs=self.crs, attributes=self.attributes, dtype=dtype
+        )
+
+    @classmethod
+    def concat(cls, point_sets: list):
+        """
+        Concatenate point sets. Attributes missing from some of them are
+        filled with NaN, Categoricals are combined with union_categoricals.
+        """
+        x = np.concatenate([p.x for p in point_sets])
+        y = np.concatenate([p.y for p in point_sets])
+        names = list(dict.fromkeys(name for p in point_sets for name in p.attributes))
+        attributes = {}
+        for name in names:
+            categorical = any(
+                isinstance(p.attributes.get(name), pd.Categorical) for p in point_sets
+            )
+            parts = []
+            for p in point_sets:
+                if name in p.attributes:
+                    parts.append(p.attributes[name])
+                elif categorical:
+                    parts.append(pd.Categorical([np.nan] * len(p)))
+                else:
+                    parts.append(np.full(len(p), np.nan))
+            if categorical:
+                attributes[name] = pd.api.types.union_categoricals(
+                    [pd.Categorical(part) for part in parts]
+                )
+            else:
+                attributes[name] = np.concatenate(parts)
+        return cls(
+            x,
+            y,
+            crs=point_sets[0].crs,
+            attributes=attributes,
+            dtype=point_sets[0].dtype,
+        )
+
+    def to_geodataframe(self, columns: Optional[list] = None):
+        """
+        Build a GeoDataFrame of the points, with the attributes and a
+        "geometry" column in the order of `columns` (default: the attributes
+        followed by the geometry).
+        """
+        gdf = gpd.GeoDataFrame(
+            self.attributes,
+            geometry=gpd.points_from_xy(self.x, self.y),
+            crs=self.crs,
+        )
+        if columns is not None:
+            gdf = gdf[columns]
+        return gdf
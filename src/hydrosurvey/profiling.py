@@ -0,0 +1,223 @@
+import cProfile
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# profiler that records the spans, set while a Profiler is active
+_profiler = None
+
+
+def max_rss():
+    """
+    Returns the peak resident set size of the process in bytes so far, or None
+    where it is not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Span(object):
+    """
+    A timed stage of a command. Set `items` to the number of points, files or
+    polygons the stage processed.
+    """
+
+    def __init__(self, name: str, items: Optional[int] = None):
+        self.name = name
+        self.items = items
+
+
+@contextmanager
+def span(name: str, items: Optional[int] = None):
+    """
+    Record the wall time, cpu time, memory and item count of the code in the
+    `with` block as a span of the active Profiler. Spans nest, and spans with
+    the same name under the same parent are added up. Without an active
+    Profiler this does nothing, so stages can be instrumented unconditionally.
+
+    Spans only record in the process that runs the Profiler, stages that run
+    in worker processes are covered by the span around the parallel map.
+    """
+    record = Span(name, items)
+    profiler = _profiler
+    if profiler is None:
+        yield record
+        return
+    frame = profiler._enter(name)
+    try:
+        yield record
+    finally:
+        profiler._exit(frame, record.items)
+
+
+class Profiler(object):
+    """
+    Collects the spans of a command into a report of the wall time, cpu time,
+    peak RSS, growth of the peak RSS, and (with trace_memory=True) peak
+    memory traced by tracemalloc of each stage. Optionally the whole command
+    is also profiled with cProfile.
+
+    Use as a context manager or with start/stop, then `write` the report to a
+    JSON file and `dump_stats` the cProfile statistics.
+    """
+
+    def __init__(
+        self, command: str = "total", trace_memory: bool = False, cprofile=False
+    ):
+        self.command = command
+        self.trace_memory = trace_memory
+        self.stats = {}
+        self._stack = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._started_tracing = False
+        self._previous = None
+        self._root = None
+
+    def start(self):
+        global _profiler
+        self._previous = _profiler
+        _profiler = self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._root = self._enter(self.command)
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def stop(self):
+        global _profiler
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self._exit(self._root, None)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        _profiler = self._previous
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _enter(self, name: str):
+        path = "/".join([frame["path"] for frame in self._stack[-1:]] + [name])
+        # register the span on entry so the report lists spans in start order
+        self.stats.setdefault(
+            path,
+            {
+                "name": path,
+                "calls": 0,
+                "wall_time": 0.0,
+                "cpu_time": 0.0,
+                "peak_rss": None,
+                "rss_increase": None,
+                "peak_traced_memory": None,
+                "items": None,
+            },
+        )
+        frame = {"path": path, "rss": max_rss(), "traced_peak": None}
+        if tracemalloc.is_tracing():
+            # the parent's peak so far is kept before the peak is reset
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent["traced_peak"] = max(parent["traced_peak"] or 0, peak)
+            tracemalloc.reset_peak()
+            frame["traced_peak"] = current
+        self._stack.append(frame)
+        frame["wall"] = time.perf_counter()
+        frame["cpu"] = time.process_time()
+        return frame
+
+    def _exit(self, frame: dict, items: Optional[int]):
+        wall = time.perf_counter() - frame["wall"]
+        cpu = time.process_time() - frame["cpu"]
+        self._stack.pop()
+
+        stats = self.stats[frame["path"]]
+        stats["calls"] += 1
+        stats["wall_time"] += wall
+        stats["cpu_time"] += cpu
+        rss = max_rss()
+        if rss is not None:
+            stats["peak_rss"] = max(stats["peak_rss"] or 0, rss)
+            stats["rss_increase"] = (stats["rss_increase"] or 0) + rss - frame["rss"]
+        if frame["traced_peak"] is not None and tracemalloc.is_tracing():
+            peak = max(frame["traced_peak"], tracemalloc.get_traced_memory()[1])
+            stats["peak_traced_memory"] = max(stats["peak_traced_memory"] or 0, peak)
+            if self._stack:
+                parent = self._stack[-1]
+                parent["traced_peak"] = max(parent["traced_peak"] or 0, peak)
+        if items is not None:
+            stats["items"] = (stats["items"] or 0) + int(items)
+
+    def report(self):
+        """
+        Returns the report as a dict with one entry per span in "spans".
+        """
+        return {
+            "command": self.command,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "trace_memory": self.trace_memory,
+            "spans": [dict(stats) for stats in self.stats.values()],
+        }
+
+    def write(self, path):
+        """Write the report to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def dump_stats(self, path):
+        """Write the cProfile statistics, readable with pstats or snakeviz."""
+        if self._cprofile is None:
+            raise ValueError("Profiler was created with cprofile=False")
+        self._cprofile.dump_stats(path)
+
+
+def profile_table(report: dict):
+    """
+    Returns the spans of a profile report as a DataFrame, with times in
+    seconds and memory in MB.
+    """
+    table = pd.DataFrame(
+        report["spans"],
+        columns=[
+            "name",
+            "calls",
+            "wall_time",
+            "cpu_time",
+            "peak_rss",
+            "rss_increase",
+            "peak_traced_memory",
+            "items",
+        ],
+    ).set_index("name")
+    table["items"] = table["items"].astype("Int64")
+    for col in ["peak_rss", "rss_increase", "peak_traced_memory"]:
+        table[col] = table[col].astype(float) / 2**20
+    return table.rename(
+        columns={
+            "wall_time": "wall (s)",
+            "cpu_time": "cpu (s)",
+            "peak_rss": "peak rss (MB)",
+            "rss_increase": "rss increase (MB)",
+            "peak_traced_memory": "peak traced (MB)",
+        }
+    )
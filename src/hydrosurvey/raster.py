@@ -0,0 +1,329 @@
+import math
+import tempfile
+import warnings
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+from scipy.spatial import cKDTree
+
+from .interpolate import points_in_polygon
+from .profiling import span
+
+SURFACES = ["current_surface_elevation", "preimpoundment_elevation"]
+
+
+class LakeRaster(object):
+    """
+    Regular raster of the interpolated lake surfaces. The interpolated target
+    points are added with `add`, in one go or one tile at a time, and each
+    pixel takes the value of the target point nearest to its center within
+    `max_distance`. Pixels with no target point in range, or with centers
+    outside the optional `boundary` polygon, are nodata. The current surface,
+    pre-impoundment surface and sediment thickness (their difference) are
+    written as Cloud-Optimized GeoTIFFs with `write`.
+
+    The distance to the nearest point and the surface values of each pixel
+    are kept in a sparse, tiled scratch GeoTIFF in a temporary directory
+    (inside `directory` if given) rather than in memory, and all pixels are
+    processed in blocks of `band_rows` by `band_rows` pixels, so memory use
+    does not depend on the size of the raster. GDAL caches blocks of the
+    files in up to GDAL_CACHEMAX of memory (by default 5% of the RAM).
+    """
+
+    def __init__(
+        self,
+        bounds,
+        resolution: float,
+        crs,
+        max_distance: Optional[float] = None,
+        boundary=None,
+        band_rows: int = 1024,
+        directory: Optional[str] = None,
+    ):
+        minx, miny, maxx, maxy = bounds
+        self.resolution = resolution
+        self.crs = crs
+        self.max_distance = max_distance or resolution
+        self.boundary = boundary
+        self.band_rows = band_rows
+
+        # snap the raster origin to a multiple of the resolution
+        self.left = math.floor(minx / resolution) * resolution
+        self.top = math.ceil(maxy / resolution) * resolution
+        self.width = max(1, math.ceil((maxx - self.left) / resolution))
+        self.height = max(1, math.ceil((self.top - miny) / resolution))
+
+        # surfaces that have been added, in the order of SURFACES
+        self.columns = []
+        self._directory = tempfile.TemporaryDirectory(
+            prefix="hydrosurvey-raster-", dir=directory, ignore_cleanup_errors=True
+        )
+        self._scratch = None
+
+    @property
+    def transform(self):
+        return from_origin(self.left, self.top, self.resolution, self.resolution)
+
+    def _window(self, minx, miny, maxx, maxy):
+        """Rows and columns of the pixels with centers within the bounds."""
+        res = self.resolution
+        col0 = max(0, math.ceil((minx - self.left) / res - 0.5))
+        col1 = min(self.width, math.floor((maxx - self.left) / res - 0.5) + 1)
+        row0 = max(0, math.ceil((self.top - maxy) / res - 0.5))
+        row1 = min(self.height, math.floor((self.top - miny) / res - 0.5) + 1)
+        return row0, row1, col0, col1
+
+    def _blocks(self, row0, row1, col0, col1):
+        """Split the rows and columns into windows of up to band_rows pixels."""
+        for start in range(row0, row1, self.band_rows):
+            height = min(self.band_rows, row1 - start)
+            for col in range(col0, col1, self.band_rows):
+                yield Window(col, start, min(self.band_rows, col1 - col), height)
+
+    def _centers(self, window: Window):
+        """Coordinates of the pixel centers in the window."""
+        center_x = self.left + (
+            np.arange(window.col_off, window.col_off + window.width) + 0.5
+        ) * (self.resolution)
+        center_y = self.top - (
+            np.arange(window.row_off, window.row_off + window.height) + 0.5
+        ) * (self.resolution)
+        return np.meshgrid(center_x, center_y)
+
+    def _open_scratch(self):
+        """
+        Open the scratch GeoTIFF, band 1 holds the distance of each pixel to
+        its nearest point and the next bands the values of SURFACES. Blocks
+        that have not been written are read as NaN.
+        """
+        if self._scratch is None:
+            # the scratch file is indexed by pixel and not georeferenced
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", NotGeoreferencedWarning)
+                self._scratch = rasterio.open(
+                    Path(self._directory.name) / "scratch.tif",
+                    "w+",
+                    driver="GTiff",
+                    width=self.width,
+                    height=self.height,
+                    count=1 + len(SURFACES),
+                    dtype="float32",
+                    nodata=np.nan,
+                    tiled=True,
+                    blockxsize=256,
+                    blockysize=256,
+                    sparse_ok=True,
+                    bigtiff="IF_SAFER",
+                )
+        return self._scratch
+
+    def add(self, points: gpd.GeoDataFrame):
+        """
+        Add the interpolated target points in `points`. A pixel already set
+        by an earlier call keeps its value unless a new point is closer to
+        its center, so tiles can be added in any order.
+        """
+        targets = points[points["type"] == "interpolated"]
+        columns = [col for col in SURFACES if col in targets.columns]
+        if len(targets) == 0 or len(columns) == 0:
+            return
+        self.columns = [col for col in SURFACES if col in self.columns + columns]
+        with span("rasterize", items=len(targets)):
+            self._add(targets, columns)
+
+    def _add(self, targets: gpd.GeoDataFrame, columns: list):
+        scratch = self._open_scratch()
+        indexes = [1] + [2 + SURFACES.index(col) for col in columns]
+
+        x = targets.geometry.x.to_numpy()
+        y = targets.geometry.y.to_numpy()
+        values = targets[columns].to_numpy(dtype=np.float32)
+        tree = cKDTree(np.column_stack([x, y]))
+
+        d = self.max_distance
+        bounds = self._window(x.min() - d, y.min() - d, x.max() + d, y.max() + d)
+        for window in self._blocks(*bounds):
+            cx, cy = self._centers(window)
+            distance, nearest = tree.query(
+                np.column_stack([cx.ravel(), cy.ravel()]), distance_upper_bound=d
+            )
+            distance = distance.reshape(cx.shape)
+            nearest = nearest.reshape(cx.shape)
+
+            # read, update and write back the pixels that have a closer point
+            block = scratch.read(indexes, window=window)
+            closer = (distance < block[0]) | (
+                np.isnan(block[0]) & np.isfinite(distance)
+            )
+            if not closer.any():
+                continue
+            block[0][closer] = distance[closer]
+            for i in range(len(columns)):
+                block[1 + i][closer] = values[nearest[closer], i]
+            scratch.write(block, indexes, window=window)
+
+    def band_blocks(self):
+        """
+        Yields each block of the raster surfaces as a tuple of its window and
+        a dict of the surfaces in it, with the sediment thickness (current
+        surface minus pre-impoundment surface) if both are present. Pixels
+        without a point in range or outside the boundary are NaN.
+        """
+        scratch = self._open_scratch()
+        indexes = [2 + SURFACES.index(col) for col in self.columns]
+        for window in self._blocks(0, self.height, 0, self.width):
+            block = scratch.read([1] + indexes, window=window)
+            nodata = np.isnan(block[0])
+            if self.boundary is not None:
+                cx, cy = self._centers(window)
+                inside = points_in_polygon(cx.ravel(), cy.ravel(), self.boundary)
+                nodata |= ~inside.reshape(cx.shape)
+            bands = {}
+            for col, band in zip(self.columns, block[1:]):
+                band[nodata] = np.nan
+                bands[col] = band
+            if len(bands) == len(SURFACES):
+                bands["sediment_thickness"] = (
+                    bands["current_surface_elevation"]
+                    - bands["preimpoundment_elevation"]
+                )
+            yield window, bands
+
+    def bands(self):
+        """
+        Returns a dict of the full raster surfaces as arrays, see band_blocks.
+        Only meant for small rasters, `write` never holds a whole surface in
+        memory.
+        """
+        bands = {}
+        for window, blocks in self.band_blocks():
+            for name, block in blocks.items():
+                band = bands.setdefault(
+                    name, np.empty((self.height, self.width), dtype=np.float32)
+                )
+                band[window.toslices()] = block
+        return bands
+
+    def write(
+        self,
+        output_file,
+        nodata: float = -9999.0,
+        blocksize: int = 512,
+        compress: str = "DEFLATE",
+    ):
+        """
+        Write each surface to a tiled, compressed Cloud-Optimized GeoTIFF
+        with overviews, named <output_file>_<surface>.tif. The surfaces are
+        first written block by block to temporary GeoTIFFs, which the COG
+        driver then tiles, compresses and adds the overviews to.
+
+        Returns:
+            list: paths of the files written
+        """
+        output_file = Path(output_file)
+        names = self.columns + (
+            ["sediment_thickness"] if len(self.columns) == len(SURFACES) else []
+        )
+        profile = {
+            "driver": "GTiff",
+            "width": self.width,
+            "height": self.height,
+            "count": 1,
+            "dtype": "float32",
+            "crs": self.crs,
+            "transform": self.transform,
+            "nodata": nodata,
+            "tiled": True,
+            "blockxsize": blocksize,
+            "blockysize": blocksize,
+            "bigtiff": "IF_SAFER",
+        }
+        sources = {name: Path(self._directory.name) / f"{name}.tif" for name in names}
+        with ExitStack() as stack:
+            datasets = {
+                name: stack.enter_context(rasterio.open(source, "w", **profile))
+                for name, source in sources.items()
+            }
+            with span("write_raster", items=self.width * self.height):
+                for window, bands in self.band_blocks():
+                    for name, band in bands.items():
+                        band[np.isnan(band)] = nodata
+                        datasets[name].write(band, 1, window=window)
+            for name, dataset in datasets.items():
+                dataset.set_band_description(1, name)
+
+        paths = []
+        for name, source in sources.items():
+            path = output_file.with_name(f"{output_file.stem}_{name}.tif")
+            with span("write_cog", items=self.width * self.height):
+                copy_cog(source, path, blocksize=blocksize, compress=compress)
+            source.unlink()
+            paths.append(path)
+        return paths
+
+    def close(self):
+        """Close and delete the scratch files."""
+        if self._scratch is not None:
+            self._scratch.close()
+            self._scratch = None
+        self._directory.cleanup()
+
+
+def copy_cog(source, path, blocksize: int = 512, compress: str = "DEFLATE"):
+    """
+    Copy a raster file to a Cloud-Optimized GeoTIFF with the COG driver,
+    which tiles and compresses it and adds the overviews, reading the source
+    from disk block by block.
+
+    Parameters:
+        source (str): raster file to copy
+        path (str): output file
+        blocksize (int): tile size in pixels
+        compress (str): compression method
+    """
+    with rasterio.open(source) as dataset:
+        floating = np.issubdtype(np.dtype(dataset.dtypes[0]), np.floating)
+        rasterio.shutil.copy(
+            dataset,
+            path,
+            driver="COG",
+            blocksize=blocksize,
+            compress=compress,
+            predictor=3 if floating else 2,
+            overviews="AUTO",
+            overview_resampling="AVERAGE",
+        )
+
+
+def lake_raster(config: dict, resolution: float):
+    """
+    Create an empty LakeRaster covering the lake boundary in the
+    configuration, masked to the boundary polygon. Pixels are filled from
+    target points up to half a pixel or half a grid cell diagonal away,
+    whichever is larger, so that a raster finer than the target grid has no
+    gaps. With adaptive target grids the coarsest cell size is used. The
+    scratch files of the raster are kept next to the output files.
+    """
+    boundary = gpd.read_file(config["boundary"]["filepath"])
+    polygons = gpd.read_file(config["interpolation_polygons"]["filepath"])
+    gridspace = polygons[config["interpolation_polygons"]["grid_spacing_column"]]
+    gridspace = gridspace * 2 ** config["interpolation_polygons"].get(
+        "adaptive_levels", 0
+    )
+    max_distance = max(resolution, float(gridspace.max())) * math.sqrt(0.5)
+    return LakeRaster(
+        boundary.total_bounds,
+        resolution,
+        boundary.crs,
+        max_distance=max_distance,
+        boundary=boundary.geometry.union_all(),
+        directory=Path(config["output"]["filepath"]).parent,
+    )
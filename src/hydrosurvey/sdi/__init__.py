@@ -1,3 +1,5 @@
 from . import binary
 from . import corestick
 from . import pickfile
+from . import qc
+from . import watch
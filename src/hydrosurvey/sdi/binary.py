@@ -1,4 +1,3 @@
-import itertools
 import struct
 import warnings
 from datetime import date, datetime
@@ -8,45 +7,60 @@ import numpy as np
 import pandas as pd
 
 
-def read(filepath, as_dataframe=False, separate=True, file_format="bin"):
+def read(
+    filepath, as_dataframe=False, separate=True, file_format="bin", metadata_only=False
+):
     dataset = Dataset(filepath)
 
     if as_dataframe:
+        # intensities are not included in the dataframe so skip decoding them
+        dataset.parse(file_format=file_format, metadata_only=True)
         d = dataset.as_dict(separate=False, file_format=file_format)
-        df = (
-            pd.DataFrame(
-                {
-                    key: d[key]
-                    for key in d
-                    if key
-                    not in [
-                        "date",
-                        "filepath",
-                        "file_version",
-                        "survey_line_number",
-                        "intensity",
-                    ]
-                }
-            )
-            .rename(columns={"trace_num": "trace"})
-            .set_index("trace")
-            .assign(survey_line_number=d["survey_line_number"])
-            .assign(date=d["date"])
-        )
-        df["datetime"] = pd.to_datetime(
-            df["date"].astype(str)
-            + " "
-            + df["hour"].astype(str)
-            + ":"
-            + df["minute"].astype(str)
-            + ":"
-            + (df["second"] + df["microsecond"] * 1e-6).astype(str)
-        )
-        return df
+        return _to_dataframe(d)
+
+    if metadata_only:
+        dataset.parse(file_format=file_format, metadata_only=True)
 
     return dataset.as_dict(separate=separate, file_format=file_format)
 
 
+def _to_dataframe(d):
+    """Convert a dict of interleaved trace metadata (as returned by
+    Dataset.as_dict(separate=False)) into a DataFrame indexed by trace number
+    with a datetime column.
+    """
+    df = (
+        pd.DataFrame(
+            {
+                key: d[key]
+                for key in d
+                if key
+                not in [
+                    "date",
+                    "filepath",
+                    "file_version",
+                    "survey_line_number",
+                    "intensity",
+                ]
+            }
+        )
+        .rename(columns={"trace_num": "trace"})
+        .set_index("trace")
+        .assign(survey_line_number=d["survey_line_number"])
+        .assign(date=d["date"])
+    )
+    df["datetime"] = pd.to_datetime(
+        df["date"].astype(str)
+        + " "
+        + df["hour"].astype(str)
+        + ":"
+        + df["minute"].astype(str)
+        + ":"
+        + (df["second"] + df["microsecond"] * 1e-6).astype(str)
+    )
+    return df
+
+
 class Dataset(object):
     def __init__(self, filepath):
         self.filepath = filepath
@@ -303,7 +317,8 @@ class Dataset(object):
             for key, array in self.trace_metadata.items():
                 freq_dict[key] = array[freq_mask]
 
-            freq_dict["intensity"] = self.intensity_image[freq_mask]
+            if self.intensity_image is not None:
+                freq_dict["intensity"] = self.intensity_image[freq_mask]
             freq_dict["kHz"] = khz
             frequencies.append(freq_dict)
 
@@ -383,8 +398,11 @@ class Dataset(object):
 
         return good_x, good_y
 
-    def parse(self, file_format="bin"):
-        """Parse the entire file and initialize attributes"""
+    def parse(self, file_format="bin", metadata_only=False):
+        """Parse the entire file and initialize attributes. If `metadata_only`
+        is True, the trace intensities of 'bin' files are skipped over rather
+        than decoded and `intensity_image` is set to None.
+        """
         with open(self.filepath, "rb") as f:
             data = f.read()
 
@@ -398,7 +416,7 @@ class Dataset(object):
             # header = self.parse_file_header(fid)
             self.resolution_cm = header["resolution_cm"]
             self.date = datetime.strptime(self.survey_line_number[:6], "%y%m%d").date()
-            self.parse_records(fid, data_length)
+            self.parse_records(fid, data_length, metadata_only=metadata_only)
         elif file_format == "bss":
             header = self.parse_bss_file_header(fid)
             self.file_header = header
@@ -480,7 +498,11 @@ class Dataset(object):
             "date": date.today(),
         }
 
-    def parse_records(self, fid, data_length):
+    def record_structs(self):
+        """Returns the (name, struct format, dtype) lists describing the
+        fields of a 'bin' record that come before the event string, the event
+        string itself and the fields after it, for the file version.
+        """
         pre_structs = [
             ("offset", "H", np.uint16),
             ("trace_num", "l", np.int32),
@@ -535,54 +557,99 @@ class Dataset(object):
             post_structs.append(("gps_mode", "b", np.int16))
             post_structs.append(("hdop", "f", np.float32))
 
+        return pre_structs, event_struct, post_structs
+
+    def parse_records(self, fid, data_length, metadata_only=False):
+        pre_structs, event_struct, post_structs = self.record_structs()
         all_structs = pre_structs + event_struct + post_structs
 
-        # intitialize dict of trace elements
-        raw_trace = dict([[name, []] for name, fmt, dtype in all_structs])
+        raw_trace, trace_intensities, _ = self.unpack_records(
+            fid.getvalue(), 12, data_length, metadata_only=metadata_only
+        )
 
-        trace_intensities = []
+        self.raw_trace = raw_trace
+        self.trace_metadata = self.process_raw_trace(raw_trace, all_structs)
+        if metadata_only:
+            self.intensities = None
+            self.intensity_image = None
+        else:
+            self.intensities = trace_intensities
+            self.intensity_image = self._normalize_scale(_fill_nans(trace_intensities))
+
+    def unpack_records(
+        self, data, npos, data_length, metadata_only=False, complete_only=False
+    ):
+        """Unpack the 'bin' records in data[npos:data_length]. Returns a tuple
+        of (raw_trace, trace_intensities, npos) where raw_trace is a dict of
+        lists of field values, trace_intensities a list of intensity tuples
+        (empty if `metadata_only`) and npos the position after the last
+        record unpacked. If `complete_only` is True, unpacking stops at the
+        first record that extends past data_length (e.g. a record that is
+        still being written) instead of raising struct.error.
+        """
+        pre_structs, event_struct, post_structs = self.record_structs()
+        all_structs = pre_structs + event_struct + post_structs
 
-        # pre-compute format, names and size for unpacking
+        # pre-compute structs, names and size for unpacking
         pre_fmt, pre_names, pre_size = self._split_struct_list(pre_structs)
         post_fmt, post_names, post_size = self._split_struct_list(post_structs)
-
-        npos = 12
-        fid.seek(npos)
+        pre_struct = struct.Struct(pre_fmt)
+        post_struct = struct.Struct(post_fmt)
+        offset_idx = pre_names.index("offset")
+        event_len_idx = pre_names.index("event_len")
+        num_pnts_idx = pre_names.index("num_pnts")
+
+        pre_records = []
+        events = []
+        post_records = []
+        trace_intensities = []
 
         # loop through data extract traces. the length of the event string
         # changes between traces and is defined just before it (event_len), so
         # parsing a line is split into three stages: pre-event, event, and
-        # post-event
+        # post-event. When only metadata is requested the intensity samples
+        # are skipped over rather than unpacked.
         while npos < data_length:
-            pre_record = struct.unpack(pre_fmt, fid.read(pre_size))
-            pre_dict = dict(list(zip(pre_names, pre_record)))
+            if complete_only and npos + pre_size > data_length:
+                break
+            pre_record = pre_struct.unpack_from(data, npos)
+            pos = npos + pre_size
 
-            size = pre_dict["event_len"]
+            size = pre_record[event_len_idx]
             if size > 0:
-                event = struct.unpack("<" + str(size) + "s", fid.read(size))[0]
+                event = data[pos : pos + size]
+                pos += size
             else:
                 event = ""
-            raw_trace["event"].append(event)
-
-            post_record = struct.unpack(post_fmt, fid.read(post_size))
-            post_dict = dict(list(zip(post_names, post_record)))
 
-            for key, value in itertools.chain(
-                iter(pre_dict.items()), iter(post_dict.items())
-            ):
-                raw_trace[key].append(value)
+            data_pos = npos + pre_record[offset_idx] + 2
+            num_pnts = pre_record[num_pnts_idx]
+            record_end = max(data_pos + num_pnts * 2, pos + post_size)
+            if record_end > data_length:
+                if complete_only:
+                    break
+                if metadata_only:
+                    raise struct.error("truncated data in final record")
+
+            post_record = post_struct.unpack_from(data, pos)
+            if not metadata_only:
+                trace_intensities.append(
+                    struct.unpack_from("<" + str(num_pnts) + "H", data, data_pos)
+                )
 
-            fid.seek(npos + pre_dict["offset"] + 2)
+            pre_records.append(pre_record)
+            events.append(event)
+            post_records.append(post_record)
+            npos = data_pos + num_pnts * 2
 
-            size = pre_dict["num_pnts"]
-            intensity = struct.unpack("<" + str(size) + "H", fid.read(size * 2))
-            trace_intensities.append(intensity)
-            npos = int(fid.tell())
+        # transpose records into a dict of trace elements
+        raw_trace = dict([[name, []] for name, fmt, dtype in all_structs])
+        for names, records in [(pre_names, pre_records), (post_names, post_records)]:
+            for name, column in zip(names, zip(*records)):
+                raw_trace[name] = list(column)
+        raw_trace["event"] = events
 
-        self.raw_trace = raw_trace
-        self.intensities = trace_intensities
-        self.trace_metadata = self.process_raw_trace(raw_trace, all_structs)
-        self.intensity_image = self._normalize_scale(_fill_nans(trace_intensities))
+        return raw_trace, trace_intensities, npos
 
     def parse_bss_records(self):
         with open(self.filepath, "rb") as f:
@@ -0,0 +1,158 @@
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .binary import Dataset
+
+# current (pic) and preimpoundment (pre) pick surfaces
+PICK_EXTENSIONS = ("pic", "pre")
+
+
+def time_steps(seconds):
+    """
+    Time steps between consecutive traces from their time since midnight in
+    seconds. A step back of more than half a day is a line spanning midnight
+    and has a day added; any other step back is a clock reversal and counts
+    as a zero step.
+
+    Returns:
+        tuple: (steps, reversals) array of steps in seconds and the number of
+            time reversals
+    """
+    steps = np.diff(np.asarray(seconds, dtype=np.float64))
+    steps[steps < -43200.0] += 86400.0
+    reversed_steps = steps < 0
+    steps[reversed_steps] = 0.0
+    return steps, int(np.count_nonzero(reversed_steps))
+
+
+def summarize_line(filepath, gap_threshold=5.0):
+    """
+    Computes QC statistics for a single SDI binary file using a metadata-only
+    decode (trace intensities are skipped). Returns a dict with one entry per
+    statistic:
+
+        'line': survey line name (file stem)
+        'version': SDI binary file format version
+        'traces': total number of traces in the file
+        'traces_<kHz>khz': number of traces recorded at each frequency
+        'duration_s': time between the first and last trace in seconds
+        'max_gap_s': largest time step between consecutive traces in seconds
+        'gaps': number of time steps larger than `gap_threshold` seconds
+        'time_reversals': number of times the trace time steps backwards,
+            other than past midnight
+        'gps_repeat_rate': fraction of traces where the raw position was
+            repeated from the previous trace (i.e. no GPS update)
+        'gps_outlier_rate': fraction of traces whose raw position was
+            replaced by the track filter as a GPS glitch
+        'hdop_median', 'hdop_max': HDOP statistics, -1 (invalid) values are
+            ignored. Only available in versions >= '4.3'
+        'gps_modes': counts of each gps_mode as a 'mode:count' string. Only
+            available in versions >= '4.3'
+        'depth_min', 'depth_max': range of depth_r1 in meters
+        'missing_picks': pick surfaces (pic/pre) with no pick file alongside
+            the binary file
+    """
+    filepath = Path(filepath)
+    dataset = Dataset(filepath)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        dataset.parse(metadata_only=True)
+    meta = dataset.trace_metadata
+    raw = dataset.raw_trace
+
+    summary = {
+        "line": filepath.stem,
+        "version": dataset.version,
+        "traces": len(meta["trace_num"]),
+    }
+
+    khz, counts = np.unique(np.round(meta["kHz"]), return_counts=True)
+    for k, count in zip(khz, counts):
+        summary[f"traces_{k:g}khz"] = int(count)
+
+    # time since midnight in seconds, allowing for lines that span midnight
+    seconds = (
+        meta["hour"] * 3600.0
+        + meta["minute"] * 60.0
+        + meta["second"]
+        + meta["microsecond"] * 1e-6
+    )
+    steps, summary["time_reversals"] = time_steps(seconds)
+    summary["duration_s"] = steps.sum()
+    summary["max_gap_s"] = steps.max() if len(steps) else 0.0
+    summary["gaps"] = int(np.count_nonzero(steps > gap_threshold))
+
+    raw_x = np.array(raw["easting"], dtype=np.float64)
+    raw_y = np.array(raw["northing"], dtype=np.float64)
+    repeated = (np.diff(raw_x) == 0) & (np.diff(raw_y) == 0)
+    summary["gps_repeat_rate"] = repeated.sum() / max(len(raw_x), 1)
+    replaced = (raw_x != meta["easting"]) | (raw_y != meta["northing"])
+    summary["gps_outlier_rate"] = replaced.sum() / max(len(raw_x), 1)
+
+    if "hdop" in meta:
+        hdop = meta["hdop"][meta["hdop"] >= 0]
+        summary["hdop_median"] = np.median(hdop) if len(hdop) else np.nan
+        summary["hdop_max"] = hdop.max() if len(hdop) else np.nan
+        modes, counts = np.unique(meta["gps_mode"], return_counts=True)
+        summary["gps_modes"] = ", ".join(f"{m}:{c}" for m, c in zip(modes, counts))
+
+    summary["depth_min"] = np.nanmin(meta["depth_r1"])
+    summary["depth_max"] = np.nanmax(meta["depth_r1"])
+
+    summary["missing_picks"] = ",".join(
+        ext
+        for ext in PICK_EXTENSIONS
+        if not any(filepath.parent.glob(f"{filepath.stem}*.{ext}"))
+    )
+
+    return summary
+
+
+def summarize_survey(path, gap_threshold=5.0):
+    """
+    Streams over every SDI binary file below `path` and computes per-line and
+    survey-wide QC statistics in a single pass. Returns a tuple of
+    (lines, survey) where `lines` is a DataFrame with one row per survey line
+    (see `summarize_line`) and `survey` is a Series of survey-wide totals.
+    Files that cannot be read are reported in the 'error' column.
+    """
+    rows = []
+    for sdi_file in sorted(Path(path).rglob("*.bin")):
+        try:
+            rows.append(summarize_line(sdi_file, gap_threshold=gap_threshold))
+        except Exception as e:
+            rows.append({"line": sdi_file.stem, "error": str(e)})
+
+    lines = pd.DataFrame(rows)
+    if lines.empty:
+        return lines, pd.Series(dtype=object)
+    lines = lines.set_index("line")
+
+    read_ok = lines.get("traces", pd.Series(np.nan, index=lines.index)).notna()
+    good = lines[read_ok]
+    traces = good["traces"].sum()
+    survey = {
+        "lines": len(lines),
+        "unreadable_lines": int((~read_ok).sum()),
+        "traces": int(traces),
+    }
+    for col in [c for c in lines.columns if c.startswith("traces_")]:
+        survey[col] = int(good[col].sum())
+    if len(good):
+        survey["duration_s"] = good["duration_s"].sum()
+        survey["max_gap_s"] = good["max_gap_s"].max()
+        survey["gaps"] = int(good["gaps"].sum())
+        survey["time_reversals"] = int(good["time_reversals"].sum())
+        # rates are weighted by the number of traces in each line
+        for col in ["gps_repeat_rate", "gps_outlier_rate"]:
+            survey[col] = (good[col] * good["traces"]).sum() / traces
+        if "hdop_max" in good:
+            survey["hdop_max"] = good["hdop_max"].max()
+        survey["depth_min"] = good["depth_min"].min()
+        survey["depth_max"] = good["depth_max"].max()
+        survey["lines_missing_picks"] = int((good["missing_picks"] != "").sum())
+
+    return lines, pd.Series(survey, dtype=object)
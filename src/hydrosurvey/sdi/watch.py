@@ -0,0 +1,148 @@
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+from .binary import Dataset, _to_dataframe
+
+HEADER_SIZE = 12
+
+
+class TailReader(object):
+    """
+    Incrementally decodes an SDI 'bin' file that is still being written.
+    Each call to `read_new` decodes only the complete records appended since
+    the last call (starting from the last known byte offset) and returns them
+    as a cleaned DataFrame in the same format as `binary.read(...,
+    as_dataframe=True)`. Trace intensities are skipped.
+
+    The GPS track filter and repeat interpolation are applied to each batch
+    of new records together with the last `overlap` records of the previous
+    batch, so that the start of a batch is cleaned with the track leading up
+    to it. Positions at the very end of a batch are still extrapolated until
+    the next batch arrives. If the file shrinks (e.g. it was truncated or
+    replaced) it is decoded again from the start.
+    """
+
+    def __init__(self, filepath, overlap=100):
+        self.filepath = Path(filepath)
+        self.dataset = Dataset(self.filepath)
+        self.overlap = overlap
+        self.reset()
+
+    def reset(self):
+        """Start decoding the file again from its beginning."""
+        self.offset = 0
+        self.tail = {}
+
+    def read_header(self, f):
+        header = self.dataset.parse_file_header(f)
+        self.dataset.version = header["version"]
+        self.dataset.survey_line_number = header["filename"]
+        self.dataset.date = datetime.strptime(header["filename"][:6], "%y%m%d").date()
+        self.offset = HEADER_SIZE
+
+    def read_new(self):
+        """Returns a DataFrame of the newly appended complete records, or None
+        if no complete record has been appended since the last call."""
+        with open(self.filepath, "rb") as f:
+            size = f.seek(0, 2)
+            if size < self.offset:
+                self.reset()
+            if self.offset == 0:
+                if size < HEADER_SIZE:
+                    return None
+                self.read_header(f)
+            f.seek(self.offset)
+            data = f.read()
+
+        raw_trace, _, consumed = self.dataset.unpack_records(
+            data, 0, len(data), metadata_only=True, complete_only=True
+        )
+        if consumed == 0:
+            return None
+        self.offset += consumed
+
+        # clean the new records together with the end of the previous batch
+        n_overlap = len(self.tail.get("trace_num", []))
+        if n_overlap:
+            raw_trace = {key: self.tail[key] + raw_trace[key] for key in raw_trace}
+        if self.overlap:
+            self.tail = {key: raw_trace[key][-self.overlap :] for key in raw_trace}
+
+        pre_structs, event_struct, post_structs = self.dataset.record_structs()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            processed = self.dataset.process_raw_trace(
+                raw_trace, pre_structs + event_struct + post_structs
+            )
+
+        d = {
+            "date": self.dataset.date,
+            "survey_line_number": self.dataset.survey_line_number,
+        }
+        d.update(processed)
+        return _to_dataframe(d).iloc[n_overlap:]
+
+
+class FolderWatcher(object):
+    """
+    Watches a folder for new or growing SDI 'bin' files and decodes the
+    records appended to each of them. Call `poll` to check the folder once or
+    `watch` to keep polling until interrupted.
+    """
+
+    def __init__(self, path, pattern="*.bin"):
+        self.path = Path(path)
+        self.pattern = pattern
+        self.readers = {}
+
+    def poll(self):
+        """Returns a list of (filepath, start_offset, DataFrame) tuples with
+        the records appended to each file since the previous poll."""
+        batches = []
+        for filepath in sorted(self.path.rglob(self.pattern)):
+            if filepath not in self.readers:
+                self.readers[filepath] = TailReader(filepath)
+            reader = self.readers[filepath]
+            size = filepath.stat().st_size
+            if size < reader.offset:
+                # the file was truncated or replaced, decode it from the start
+                reader.reset()
+            if size <= reader.offset:
+                continue
+            start = reader.offset
+            df = reader.read_new()
+            if df is not None:
+                batches.append((filepath, start, df))
+        return batches
+
+    def watch(self, callback, interval=5.0):
+        """Poll the folder every `interval` seconds and call
+        callback(filepath, start_offset, df) for every new batch of records."""
+        while True:
+            for batch in self.poll():
+                callback(*batch)
+            time.sleep(interval)
+
+
+def write_parquet_batch(output_dir, filepath, start_offset, df):
+    """
+    Write a batch of traces to a Parquet dataset partitioned by survey line,
+    i.e. <output_dir>/survey_line_number=<line>/part-<start_offset>.parquet.
+    Naming parts by their byte offset makes re-running a watch idempotent.
+    A batch starting right after the file header replaces any existing parts
+    of the line, e.g. those written before the file was truncated.
+    """
+    part_dir = Path(output_dir) / f"survey_line_number={Path(filepath).stem}"
+    if start_offset <= HEADER_SIZE:
+        for part in part_dir.glob("part-*.parquet"):
+            part.unlink()
+    part_dir.mkdir(parents=True, exist_ok=True)
+    part_file = part_dir / f"part-{start_offset:012d}.parquet"
+    # fix the timestamp resolution so every part has the same schema
+    df = df.drop(columns=["survey_line_number", "event"]).astype(
+        {"datetime": "datetime64[ns]"}
+    )
+    df.to_parquet(part_file)
+    return part_file
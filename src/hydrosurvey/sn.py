@@ -1,6 +1,7 @@
 import geopandas as gpd
 import numpy as np
-from shapely.geometry import LineString, Point
+import shapely
+from scipy.spatial import cKDTree
 
 
 class Coord_SN:
@@ -8,44 +9,143 @@ class Coord_SN:
         self, centerline: gpd.GeoDataFrame, max_segment_length=10, slope_dx=0.01
     ):
         """
-        Transform the centerline and points to the SN coordinate system.
-        """
+        Transform points to the SN coordinate system of a centerline, where s
+        is the distance along the centerline and n is the signed perpendicular
+        distance from it (negative to the left of the centerline direction).
 
+        max_segment_length and slope_dx are the spacing and the slope step
+        of the points in the `centerline` attribute, the transform itself is
+        exact.
+        """
+        self.crs = centerline.crs
+        self.max_segment_length = max_segment_length
+        self.slope_dx = slope_dx
         cline = centerline.iloc[0]["geometry"]
-        geometry = []
-        data = []
-        for s_coord in np.arange(0, cline.length, max_segment_length):
-            point = cline.interpolate(s_coord)
-            s1 = cline.interpolate(s_coord - slope_dx)
-            s2 = cline.interpolate(s_coord + slope_dx)
-            slope = [s2.x - s1.x, s2.y - s1.y]
-            geometry.append(point)
-            data.append({"s_coord": s_coord, "slope": slope})
-
-        self.centerline = gpd.GeoDataFrame(
-            data=data, geometry=geometry, crs=centerline.crs
-        )
 
-    def find_sign(self, row):
-        pt = row["geometry"]
-        pt_s = row["centerline_point"]
-        slope = row["slope"]
-        return -np.sign((slope[0] * (pt.y - pt_s.y) - slope[1] * (pt.x - pt_s.x)))
+        # segments of the centerline and the s coordinate where each starts,
+        # parts of a multilinestring follow each other as in line_locate_point
+        starts = []
+        ends = []
+        for part in shapely.get_parts(cline):
+            coords = shapely.get_coordinates(part)
+            starts.append(coords[:-1])
+            ends.append(coords[1:])
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        lengths = np.hypot(*(ends - starts).T)
+        s_start = np.cumsum(lengths) - lengths
 
-    def transform_xy_to_sn(self, points: gpd.GeoDataFrame):
-        nearest_points = gpd.sjoin_nearest(
-            points, self.centerline, distance_col="n_coord"
-        ).rename(columns={"index_right": "centerline_index"})
-
-        nearest_points["centerline_point"] = (
-            self.centerline["geometry"]
-            .loc[nearest_points["centerline_index"]]
-            .to_list()
+        # zero length segments have no direction
+        keep = lengths > 0
+        self.segment_start = starts[keep]
+        self.segment_direction = (ends - starts)[keep]
+        self.segment_length = lengths[keep]
+        self.segment_s = s_start[keep]
+
+        # KD-tree of the midpoints of pieces of each segment no longer than
+        # the median segment, a point is at most half a piece closer to a
+        # piece than to its midpoint
+        piece_length = np.median(self.segment_length)
+        pieces = np.ceil(self.segment_length / piece_length).astype(np.intp)
+        pieces = np.maximum(pieces, 1)
+        self.piece_segment = np.repeat(np.arange(len(pieces)), pieces)
+        offset = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        fraction = ((offset + 0.5) / pieces[self.piece_segment])[:, np.newaxis]
+        self.pieces = cKDTree(
+            self.segment_start[self.piece_segment]
+            + fraction * self.segment_direction[self.piece_segment]
+        )
+        self.piece_radius = (self.segment_length / pieces).max() / 2
+
+    @property
+    def centerline(self):
+        """
+        Points every max_segment_length along the centerline with their
+        s_coord and the slope of the centerline over 2 * slope_dx.
+        """
+        s = np.arange(
+            0, self.segment_s[-1] + self.segment_length[-1], self.max_segment_length
+        )
+        segment = np.searchsorted(self.segment_s, s, side="right") - 1
+        t = (s - self.segment_s[segment]) / self.segment_length[segment]
+        direction = self.segment_direction[segment]
+        xy = self.segment_start[segment] + t[:, np.newaxis] * direction
+        slope = direction / self.segment_length[segment, np.newaxis] * 2 * self.slope_dx
+        return gpd.GeoDataFrame(
+            {"s_coord": s, "slope": list(slope)},
+            geometry=gpd.points_from_xy(xy[:, 0], xy[:, 1]),
+            crs=self.crs,
         )
 
-        nearest_points["n_coord"] = (
-            nearest_points.apply(lambda x: self.find_sign(x), axis=1)
-            * nearest_points["n_coord"]
+    def _project(self, x, y, segment):
+        """
+        Clamped position t along each segment of the projection of the
+        points, and the offset of the points from it.
+        """
+        start = self.segment_start[segment]
+        direction = self.segment_direction[segment]
+        dx = x - start[..., 0]
+        dy = y - start[..., 1]
+        t = (dx * direction[..., 0] + dy * direction[..., 1]) / (
+            self.segment_length[segment] ** 2
         )
+        t = np.clip(t, 0.0, 1.0)
+        return t, dx - t * direction[..., 0], dy - t * direction[..., 1]
 
-        return nearest_points
+    def nearest_segment(self, x: np.ndarray, y: np.ndarray):
+        """
+        Index of the nearest centerline segment of each point. The segments
+        of the k nearest piece midpoints are compared, with k doubled for the
+        points where a segment outside them could still be nearer.
+        """
+        n = self.pieces.n
+        segment = np.zeros(len(x), dtype=np.intp)
+        rows = np.arange(len(x))
+        k = min(4, n)
+        while len(rows):
+            distance, piece = self.pieces.query(np.c_[x[rows], y[rows]], k=k)
+            distance = distance.reshape(len(rows), k)
+            candidates = self.piece_segment[np.minimum(piece, n - 1)].reshape(
+                len(rows), k
+            )
+            _, ox, oy = self._project(
+                x[rows, np.newaxis], y[rows, np.newaxis], candidates
+            )
+            offset = np.hypot(ox, oy)
+            best = np.argmin(offset, axis=1)
+            segment[rows] = candidates[np.arange(len(rows)), best]
+            if k == n:
+                break
+            nearest = offset[np.arange(len(rows)), best]
+            rows = rows[nearest > distance[:, -1] - self.piece_radius]
+            k = min(2 * k, n)
+        return segment
+
+    def xy_to_sn(self, x: np.ndarray, y: np.ndarray):
+        """
+        Transform coordinate arrays to SN coordinates. Each point is projected
+        onto the nearest centerline segment (see nearest_segment).
+
+        Parameters:
+            x, y (np.ndarray): point coordinates
+
+        Returns:
+            tuple: (s, n) arrays of SN coordinates
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        segment = self.nearest_segment(x, y)
+
+        # position of the projection along the segment, clamped to its ends
+        t, ox, oy = self._project(x, y, segment)
+        s = self.segment_s[segment] + t * self.segment_length[segment]
+        direction = self.segment_direction[segment]
+        cross = direction[:, 0] * oy - direction[:, 1] * ox
+        return s, -np.sign(cross) * np.hypot(ox, oy)
+
+    def transform_xy_to_sn(self, points: gpd.GeoDataFrame):
+        """
+        Add s_coord and n_coord columns with the SN coordinates of points.
+        """
+        s, n = self.xy_to_sn(points.geometry.x.to_numpy(), points.geometry.y.to_numpy())
+        return points.assign(s_coord=s, n_coord=n)
@@ -0,0 +1,314 @@
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import LineString, Point, Polygon
+
+
+class SyntheticLake(object):
+    """
+    Synthetic reservoir with a known analytic bathymetry, for testing and
+    benchmarking the lake interpolation.
+
+    The lake is a sinuous channel of constant width running along the x axis,
+    with its centerline at y = amplitude * sin(2 pi x / wavelength), and with
+    round islands on alternating sides of the centerline. The current surface
+    is a parabolic cross section that is `depth[0]` deep at the upstream end
+    (x = 0) and `depth[1]` deep at the downstream end, and meets the normal
+    pool elevation `top` at the shoreline. It also shoals to `top` within
+    half a channel width of both ends of the lake and within an island
+    radius of each island shore, as the interpolation sets every boundary
+    vertex to the pool elevation. The pre-impoundment surface lies a further
+    `sediment` below the current surface at the centerline, with the same
+    shape.
+
+    The lake is split into `n_polygons` overlapping reaches along x, each an
+    interpolation polygon (with `method` AEIDW by default) with its own
+    centerline. Priorities alternate between 1 and 2 so that every overlap
+    has to be resolved. The survey points lie on cross-channel transects
+    `transect_spacing` apart, one point every `point_spacing`, with optional
+    gaussian noise of standard deviation `noise` added to the surfaces.
+
+    All distances are in map units of the projected `crs`.
+    """
+
+    def __init__(
+        self,
+        length: float = 2000.0,
+        width: float = 200.0,
+        amplitude: float = 150.0,
+        wavelength: float = 1000.0,
+        depth: tuple = (5.0, 20.0),
+        top: float = 100.0,
+        sediment: float = 1.5,
+        n_islands: int = 2,
+        n_polygons: int = 4,
+        gridspace: float = 10.0,
+        method: str = "AEIDW",
+        ellipsivity: float = 10.0,
+        transect_spacing: float = 50.0,
+        point_spacing: float = 2.0,
+        noise: float = 0.0,
+        seed: int = 0,
+        crs: str = "EPSG:26914",
+    ):
+        self.length = length
+        self.width = width
+        self.amplitude = amplitude
+        self.wavelength = wavelength
+        self.depth = depth
+        self.top = top
+        self.sediment = sediment
+        self.n_islands = n_islands
+        self.n_polygons = n_polygons
+        self.gridspace = gridspace
+        self.method = method
+        self.ellipsivity = ellipsivity
+        self.transect_spacing = transect_spacing
+        self.point_spacing = point_spacing
+        self.noise = noise
+        self.seed = seed
+        self.crs = crs
+
+    def centerline_y(self, x: np.ndarray):
+        """y coordinate of the channel centerline at x."""
+        return self.amplitude * np.sin(2 * np.pi * np.asarray(x) / self.wavelength)
+
+    def _band(self, x0: float, x1: float, half_width: float):
+        """Polygon of the points within half_width (in y) of the centerline."""
+        n = max(2, int(np.ceil((x1 - x0) / (self.width / 10))) + 1)
+        x = np.linspace(x0, x1, n)
+        y = self.centerline_y(x)
+        return np.column_stack(
+            [
+                np.concatenate([x, x[::-1]]),
+                np.concatenate([y - half_width, (y + half_width)[::-1]]),
+            ]
+        )
+
+    def surfaces(self, x: np.ndarray, y: np.ndarray):
+        """
+        Analytic current and pre-impoundment surface elevations at (x, y).
+        Outside the channel both surfaces are at the normal pool elevation.
+
+        Returns:
+            tuple: (current, preimpoundment) elevation arrays
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        half = self.width / 2
+        offset = (y - self.centerline_y(x)) / half
+        shape = 1 - np.clip(offset**2, 0, 1)
+
+        # shoal towards the ends of the lake and the island shores
+        ends = np.clip(np.minimum(x, self.length - x) / half, 0, 1)
+        shape *= 1 - (1 - ends) ** 2
+        for cx, cy in self._island_centers():
+            distance = np.hypot(x - cx, y - cy) / self.island_radius
+            shape *= 1 - (1 - np.clip(distance - 1, 0, 1)) ** 2
+
+        fraction = np.clip(x / self.length, 0, 1)
+        depth = self.depth[0] + (self.depth[1] - self.depth[0]) * fraction
+        current = self.top - depth * shape
+        return current, current - self.sediment * shape
+
+    @property
+    def island_radius(self):
+        return self.width / 8
+
+    def _island_centers(self):
+        """Centers of the islands, on alternating sides of the centerline."""
+        x = self.length * np.arange(1, self.n_islands + 1) / (self.n_islands + 1)
+        side = np.where(np.arange(self.n_islands) % 2 == 0, 1, -1)
+        return list(zip(x, self.centerline_y(x) + side * self.width / 6))
+
+    def islands(self):
+        """
+        Returns:
+            list: island polygons
+        """
+        return [
+            Point(x, y).buffer(self.island_radius, quad_segs=8)
+            for x, y in self._island_centers()
+        ]
+
+    def boundary(self):
+        """
+        Returns:
+            gpd.GeoDataFrame: lake boundary, with the islands as holes and
+                the normal pool elevation in an "elevation" column
+        """
+        geometry = Polygon(
+            self._band(0, self.length, self.width / 2),
+            holes=[island.exterior.coords for island in self.islands()],
+        )
+        return gpd.GeoDataFrame(
+            {"elevation": [self.top]}, geometry=[geometry], crs=self.crs
+        )
+
+    def _reaches(self):
+        """x extent of each interpolation polygon, overlapping its neighbors."""
+        edges = np.linspace(0, self.length, self.n_polygons + 1)
+        overlap = 2 * self.gridspace
+        return [
+            (max(0.0, x0 - overlap), min(self.length, x1 + overlap))
+            for x0, x1 in zip(edges[:-1], edges[1:])
+        ]
+
+    def polygons(self):
+        """
+        Returns:
+            gpd.GeoDataFrame: interpolation polygons with "id", "gridspace",
+                "priority", "method" and "params" columns. Each polygon is
+                a little wider than the lake so that it covers the shoreline.
+        """
+        reaches = self._reaches()
+        return gpd.GeoDataFrame(
+            {
+                "id": np.arange(1, len(reaches) + 1),
+                "gridspace": self.gridspace,
+                "priority": [1 + i % 2 for i in range(len(reaches))],
+                "method": self.method,
+                "params": self.ellipsivity,
+            },
+            geometry=[
+                Polygon(self._band(x0, x1, 0.55 * self.width)) for x0, x1 in reaches
+            ],
+            crs=self.crs,
+        )
+
+    def centerlines(self):
+        """
+        Returns:
+            gpd.GeoDataFrame: centerline of each interpolation polygon, with
+                the polygon "id", extended a channel width past both ends
+        """
+        lines = []
+        for x0, x1 in self._reaches():
+            n = max(2, int(np.ceil((x1 - x0 + 2 * self.width) / 10)) + 1)
+            x = np.linspace(x0 - self.width, x1 + self.width, n)
+            lines.append(LineString(np.column_stack([x, self.centerline_y(x)])))
+        return gpd.GeoDataFrame(
+            {"id": np.arange(1, len(lines) + 1)}, geometry=lines, crs=self.crs
+        )
+
+    def survey_points(self):
+        """
+        Returns:
+            pd.DataFrame: survey points on cross-channel transects, with
+                "easting", "northing", "current_surface" and
+                "pre_impoundment_surface" columns
+        """
+        half = self.width / 2
+        transects = np.arange(
+            self.transect_spacing / 2, self.length, self.transect_spacing
+        )
+        offsets = np.arange(-half, half + self.point_spacing / 2, self.point_spacing)
+        x = np.repeat(transects, len(offsets))
+        y = self.centerline_y(x) + np.tile(offsets, len(transects))
+
+        # drop the points on islands or outside the shoreline
+        inside = shapely.intersects_xy(self.boundary().geometry.iloc[0], x, y)
+        x, y = x[inside], y[inside]
+
+        current, preimpoundment = self.surfaces(x, y)
+        if self.noise:
+            rng = np.random.default_rng(self.seed)
+            current = current + rng.normal(0, self.noise, len(x))
+            preimpoundment = preimpoundment + rng.normal(0, self.noise, len(x))
+        return pd.DataFrame(
+            {
+                "easting": x,
+                "northing": y,
+                "current_surface": current,
+                "pre_impoundment_surface": preimpoundment,
+            }
+        )
+
+    def write(self, directory, survey_format: str = "csv"):
+        """
+        Write the boundary, centerlines and polygons as shapefiles and the
+        survey points as a csv or parquet file to `directory`.
+
+        Returns:
+            dict: lake configuration for aeidw, with the output file set to
+                <directory>/output.csv
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.boundary().to_file(directory / "boundary.shp")
+        self.centerlines().to_file(directory / "centerlines.shp")
+        self.polygons().to_file(directory / "polygons.shp")
+
+        survey_file = directory / f"survey.{survey_format}"
+        if survey_format == "csv":
+            self.survey_points().to_csv(survey_file, index=False)
+        elif survey_format == "parquet":
+            self.survey_points().to_parquet(survey_file, index=False)
+        else:
+            raise ValueError(f"Survey format {survey_format} not recognized")
+
+        return {
+            "lake": {"name": "synthetic", "survey_year": 2024},
+            "boundary": {
+                "filepath": str(directory / "boundary.shp"),
+                "elevation_column": "elevation",
+                "max_segment_length": self.gridspace,
+            },
+            "survey_points": {
+                "filepath": str(survey_file),
+                "x_coord_column": "easting",
+                "y_coord_column": "northing",
+                "current_surface_elevation_column": "current_surface",
+                "preimpoundment_elevation_column": "pre_impoundment_surface",
+                "crs": self.crs,
+            },
+            "interpolation_centerlines": {
+                "filepath": str(directory / "centerlines.shp"),
+                "polygon_id_column": "id",
+                "max_segment_length": self.gridspace,
+            },
+            "interpolation_polygons": {
+                "filepath": str(directory / "polygons.shp"),
+                "polygon_id_column": "id",
+                "grid_spacing_column": "gridspace",
+                "priority_column": "priority",
+                "interpolation_method_column": "method",
+                "interpolation_params_column": "params",
+                "buffer": 2 * self.transect_spacing,
+                "nearest_neighbors": 16,
+            },
+            "output": {"filepath": str(directory / "output.csv")},
+        }
+
+    def errors(self, points: gpd.GeoDataFrame):
+        """
+        Compare the interpolated target points returned by aeidw with the
+        analytic surfaces.
+
+        Returns:
+            pd.DataFrame: count of interpolated values, bias, RMSE and
+                maximum absolute error of each surface
+        """
+        targets = points[points["type"] == "interpolated"]
+        expected = dict(
+            zip(
+                ["current_surface_elevation", "preimpoundment_elevation"],
+                self.surfaces(targets.geometry.x, targets.geometry.y),
+            )
+        )
+        rows = {}
+        for col, values in expected.items():
+            if col not in targets.columns:
+                continue
+            error = targets[col].to_numpy() - values
+            error = error[np.isfinite(error)]
+            rows[col] = {
+                "count": len(error),
+                "bias": error.mean() if len(error) else np.nan,
+                "rmse": np.sqrt((error**2).mean()) if len(error) else np.nan,
+                "max_error": np.abs(error).max() if len(error) else np.nan,
+            }
+        return pd.DataFrame.from_dict(rows, orient="index")
@@ -0,0 +1,136 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _reduce_bins(
+    df: pd.DataFrame, keys: np.ndarray, distance: np.ndarray, method: str
+):
+    """
+    Reduce the rows of df to one row per unique key. With method "nearest" the
+    row with the smallest `distance` (to the bin center) is kept, with method
+    "median" numeric and datetime columns are replaced by their median in each
+    bin and all other columns take the first value. The median of each column
+    is taken separately, so the result is a synthetic point that need not be
+    any of the soundings in the bin.
+    """
+    if method == "nearest":
+        order = np.lexsort((distance, keys))
+        _, first = np.unique(keys[order], return_index=True)
+        return df.iloc[np.sort(order[first])]
+    elif method == "median":
+        aggs = {
+            col: (
+                "median"
+                if pd.api.types.is_numeric_dtype(df[col])
+                or pd.api.types.is_datetime64_any_dtype(df[col])
+                else "first"
+            )
+            for col in df.columns
+        }
+        return df.groupby(keys, sort=True).agg(aggs).reset_index(drop=True)
+    else:
+        raise ValueError(f"Thinning method {method} not recognized")
+
+
+def _finite_coordinates(df: pd.DataFrame, x_col: str, y_col: str):
+    """
+    Drop the rows of df with NaN or infinite coordinates, which cannot be
+    binned. Returns the remaining rows and their x and y arrays.
+    """
+    x = df[x_col].to_numpy(dtype=np.float64)
+    y = df[y_col].to_numpy(dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        df, x, y = df[finite], x[finite], y[finite]
+    return df, x, y
+
+
+def thin_points(
+    df: pd.DataFrame,
+    cell_size: float,
+    x_col: str = "x_coord",
+    y_col: str = "y_coord",
+    method: str = "median",
+):
+    """
+    Thin survey points by binning them into square grid cells of `cell_size`
+    and keeping one point per occupied cell. Points without finite
+    coordinates are dropped.
+
+    Parameters:
+        df (pd.DataFrame): survey points
+        cell_size (float): width of the grid cells in coordinate units
+        x_col, y_col (str): names of the coordinate columns
+        method (str): "median" for a synthetic point with the per-cell median
+            of each column or "nearest" to keep the sounding closest to the
+            cell center
+
+    Returns:
+        pd.DataFrame: thinned survey points
+    """
+    df, x, y = _finite_coordinates(df, x_col, y_col)
+    if len(df) == 0:
+        return df
+    ix = np.floor((x - np.nanmin(x)) / cell_size).astype(np.int64)
+    iy = np.floor((y - np.nanmin(y)) / cell_size).astype(np.int64)
+    keys = ix * (iy.max() + 1) + iy
+    distance = np.hypot(
+        x - (ix + 0.5) * cell_size - np.nanmin(x),
+        y - (iy + 0.5) * cell_size - np.nanmin(y),
+    )
+    return _reduce_bins(df, keys, distance, method)
+
+
+def thin_along_track(
+    df: pd.DataFrame,
+    spacing: float,
+    x_col: str = "x_coord",
+    y_col: str = "y_coord",
+    line_col: Optional[str] = None,
+    method: str = "median",
+):
+    """
+    Thin survey points along each survey track so that there is at most one
+    point per `spacing` of distance travelled. Points must be in acquisition
+    order. If `line_col` is given, distances are accumulated separately for
+    each survey line, otherwise all points are treated as a single track.
+    Points without finite coordinates are dropped.
+
+    Parameters:
+        df (pd.DataFrame): survey points in acquisition order
+        spacing (float): along-track bin length in coordinate units
+        x_col, y_col (str): names of the coordinate columns
+        line_col (str): optional name of the survey line column
+        method (str): "median" for a synthetic point with the per-bin median
+            of each column or "nearest" to keep the sounding closest to the
+            bin center
+
+    Returns:
+        pd.DataFrame: thinned survey points
+    """
+    df, x, y = _finite_coordinates(df, x_col, y_col)
+    if len(df) == 0:
+        return df
+    if line_col is None:
+        line = np.zeros(len(df), dtype=np.int64)
+    else:
+        line = pd.factorize(df[line_col])[0].astype(np.int64)
+
+    step = np.hypot(np.diff(x, prepend=x[:1]), np.diff(y, prepend=y[:1]))
+    step[np.r_[True, line[1:] != line[:-1]]] = 0.0
+    track_distance = pd.Series(step).groupby(line).cumsum().to_numpy()
+
+    bins = np.floor(track_distance / spacing).astype(np.int64)
+    keys = line * (bins.max() + 1) + bins
+    distance = np.abs(track_distance - (bins + 0.5) * spacing)
+    return _reduce_bins(df, keys, distance, method)
+
+
+def thinning_report(n_before: int, n_after: int):
+    """
+    Summarize the effect of thinning as a string.
+    """
+    ratio = n_before / max(n_after, 1)
+    return f"thinned {n_before} points to {n_after} ({ratio:.1f}x reduction)"
@@ -0,0 +1,332 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from tqdm import tqdm
+
+from .cache import SNCache
+from .interpolate import (
+    add_boundary_points,
+    points_in_polygon,
+    read_lake_points,
+    value_columns,
+)
+from .methods import sector_neighbors
+from .profiling import span
+
+
+def cross_validate(
+    coords: np.ndarray,
+    values: np.ndarray,
+    nnear: list,
+    power: list,
+    evaluate: Optional[np.ndarray] = None,
+    holdout: Optional[float] = None,
+    seed: int = 0,
+    sectors: Optional[int] = None,
+    columns: Optional[list] = None,
+    chunk_size: int = 100_000,
+    workers: int = 1,
+):
+    """
+    Leave-one-out (or holdout) cross-validation errors of IDW for every
+    combination of the given numbers of nearest neighbors and powers.
+
+    All combinations are computed from a single KD-tree query of the largest
+    number of neighbors plus one: each point is left out of its own
+    prediction by dropping it from its neighbors, the neighbors of a smaller
+    nnear are the nearest of the remaining ones, and the power only changes
+    the weights. A sector search is run once for each number of neighbors.
+    NaN values are left out of the weighted means as in idw and points with
+    a NaN value are not scored in that column.
+
+    Parameters:
+        coords (np.ndarray): coordinates of the data points (shape: N, 2)
+        values (np.ndarray): values at the data points (shape: N, C)
+        nnear (list): numbers of nearest neighbors
+        power (list): exponents of the inverse distance weights
+        evaluate (np.ndarray): mask of the data points that are predicted,
+            the others are only used as neighbors (default: all)
+        holdout (float): instead of leaving out each point in turn, predict
+            this random fraction of the evaluated points from all the others
+        seed (int): seed of the random holdout selection
+        sectors (int): sector neighbor search, see idw
+        columns (list): names of the value columns
+        chunk_size (int): number of points predicted at a time
+        workers (int): number of threads used by the KD-tree query
+
+    Returns:
+        pd.DataFrame: count, bias, rmse and max_error of the predictions for
+            each combination of nearest_neighbors, power and value column
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    columns = list(range(values.shape[1])) if columns is None else columns
+    evaluate = np.ones(len(coords), dtype=bool) if evaluate is None else evaluate
+    targets = np.flatnonzero(evaluate)
+
+    # with a holdout set the targets are not neighbors of any prediction,
+    # otherwise the query returns one more neighbor to drop the point itself
+    sources = np.arange(len(coords))
+    if holdout:
+        rng = np.random.default_rng(seed)
+        size = min(len(targets), max(1, round(holdout * len(targets))))
+        targets = np.sort(rng.choice(targets, size=size, replace=False))
+        sources = np.setdiff1d(sources, targets)
+    tree = cKDTree(coords[sources])
+    source_values = values[sources]
+    k = min(max(nnear) + (not holdout), tree.n)
+
+    combinations = [(n, p) for n in sorted(set(nnear)) for p in sorted(set(power))]
+    shape = (len(combinations), values.shape[1])
+    count, total, squared = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    max_error = np.zeros(shape)
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start : start + chunk_size]
+        exclude = None if holdout else chunk
+        if not sectors:
+            distances, indices = tree.query(coords[chunk], k=k, workers=workers)
+            if k == 1:
+                distances, indices = distances[:, np.newaxis], indices[:, np.newaxis]
+            candidates = indices < tree.n
+            if not holdout:
+                candidates &= indices != chunk[:, np.newaxis]
+            indices = np.where(candidates, indices, 0)
+            rank = np.cumsum(candidates, axis=1)
+
+        for i, (n, p) in enumerate(combinations):
+            # the neighbors change with the number of nearest neighbors only
+            if i == 0 or n != combinations[i - 1][0]:
+                if sectors:
+                    distances, indices, selected = sector_neighbors(
+                        tree,
+                        coords[chunk],
+                        n,
+                        sectors,
+                        workers=workers,
+                        exclude=exclude,
+                    )
+                else:
+                    selected = candidates & (rank <= n)
+                neighbor_values = np.take(source_values, indices, axis=0)
+                valid = ~np.isnan(neighbor_values)
+                neighbor_values = np.where(valid, neighbor_values, 0.0)
+                inverse_distances = 1.0 / (distances + 1e-10)
+            weights = np.where(selected, inverse_distances**p, 0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                predicted = np.einsum(
+                    "mk,mkc->mc", weights, neighbor_values
+                ) / np.einsum("mk,mkc->mc", weights, valid)
+            error = predicted - values[chunk]
+            scored = np.isfinite(error)
+            error = np.where(scored, error, 0.0)
+            count[i] += scored.sum(axis=0)
+            total[i] += error.sum(axis=0)
+            squared[i] += (error**2).sum(axis=0)
+            max_error[i] = np.maximum(max_error[i], np.abs(error).max(axis=0))
+
+    rows = []
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i, (n, p) in enumerate(combinations):
+            for c, column in enumerate(columns):
+                rows.append(
+                    {
+                        "nearest_neighbors": n,
+                        "power": p,
+                        "column": column,
+                        "count": int(count[i, c]),
+                        "bias": total[i, c] / count[i, c],
+                        "rmse": np.sqrt(squared[i, c] / count[i, c]),
+                        "max_error": max_error[i, c] if count[i, c] else np.nan,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def _cross_validate_task(task: dict):
+    task = dict(task)
+    s, n, ellipsivity = task.pop("s"), task.pop("n"), task.pop("ellipsivity")
+    coords = np.column_stack([s, n * ellipsivity])
+    return cross_validate(coords, **task).assign(ellipsivity=ellipsivity)
+
+
+def _map_tasks(tasks, workers: int = 1):
+    """
+    Run the cross-validation tasks, in a pool of worker processes if
+    workers > 1, and yield the results in the same order.
+    """
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_cross_validate_task, tasks)
+    else:
+        yield from map(_cross_validate_task, tasks)
+
+
+def tune_polygons(
+    config: dict,
+    polygon_ids: Optional[list] = None,
+    ellipsivity: Optional[list] = None,
+    nearest_neighbors: Optional[list] = None,
+    power: Optional[list] = None,
+    holdout: Optional[float] = None,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    progress: bool = True,
+):
+    """
+    Cross-validate the AEIDW parameters of the interpolation polygons.
+
+    In each AEIDW polygon the survey points inside the polygon are predicted
+    from the survey and boundary points in its buffer, as in aeidw, for every
+    combination of the ellipsivities, numbers of nearest neighbors and IDW
+    powers (see cross_validate). The SN coordinates of each polygon are
+    computed once (and cached like in aeidw) and the ellipsivities of all
+    polygons are evaluated in `workers` parallel processes. The current
+    parameters of each polygon, its ellipsivity and the `nearest_neighbors`
+    and `power` settings of the configuration, are always included.
+
+    Parameters:
+        config (dict): lake configuration
+        polygon_ids (list): ids of the polygons to tune (default: all AEIDW
+            polygons)
+        ellipsivity, nearest_neighbors, power (list): parameter values
+        holdout (float): fraction of the survey points held out instead of
+            leave-one-out cross-validation
+        seed (int): seed of the random holdout selection
+        workers (int): number of processes (default: the `workers` setting
+            of the configuration, or 1)
+        progress (bool): show a progress bar
+
+    Returns:
+        pd.DataFrame: count, bias, rmse and max_error of each elevation column
+            for each polygon and parameter combination, with a boolean
+            "current" column marking the current parameters
+    """
+    settings = config["interpolation_polygons"]
+    boundary, lines, polygons, survey_points = read_lake_points(config)
+    survey_points = add_boundary_points(
+        survey_points, boundary, config["boundary"]["max_segment_length"]
+    )
+    columns = value_columns(survey_points)
+    survey_x = survey_points.x
+    survey_y = survey_points.y
+    survey_values = np.column_stack([survey_points[col] for col in columns])
+    is_survey = np.asarray(survey_points["type"] == "survey")
+
+    selected = polygons[polygons["method"].str.lower() == "aeidw"]
+    if polygon_ids is not None:
+        polygon_ids = [str(idx) for idx in polygon_ids]
+        missing = set(polygon_ids) - set(selected.index.astype(str))
+        if missing:
+            raise ValueError(f"AEIDW polygon ids {sorted(missing)} not found")
+        selected = selected[selected.index.astype(str).isin(polygon_ids)]
+
+    current_nnear = settings.get("nearest_neighbors", 16)
+    current_power = settings.get("power", 2)
+    nearest_neighbors = sorted(set(nearest_neighbors or []) | {current_nnear})
+    power = sorted(set(power or []) | {current_power})
+    workers = settings.get("workers", 1) if workers is None else workers
+
+    # transform the points of each polygon to SN coordinates once, the
+    # ellipsivities are then separate tasks
+    sn_cache = SNCache(config.get("cache", {}).get("directory"))
+    tasks = []
+    task_ids = []
+    current_ellipsivity = {}
+    for idx in selected.index:
+        buffered = polygons.loc[[idx]].buffer(settings["buffer"])
+        inside = points_in_polygon(survey_x, survey_y, buffered.union_all())
+        evaluate = is_survey[inside] & points_in_polygon(
+            survey_x[inside], survey_y[inside], polygons.geometry.loc[idx]
+        )
+        with span("sn_transform", items=int(inside.sum())):
+            s, n = sn_cache.xy_to_sn(
+                lines.loc[[idx]], survey_x[inside], survey_y[inside]
+            )
+
+        current_ellipsivity[idx] = float(selected["params"].loc[idx])
+        for e in sorted(set(ellipsivity or []) | {current_ellipsivity[idx]}):
+            tasks.append(
+                {
+                    "s": s,
+                    "n": n,
+                    "ellipsivity": e,
+                    "values": survey_values[inside],
+                    "nnear": nearest_neighbors,
+                    "power": power,
+                    "evaluate": evaluate,
+                    "holdout": holdout,
+                    "seed": seed,
+                    "sectors": settings.get("sectors"),
+                    "columns": columns,
+                    "workers": -1 if workers <= 1 else 1,
+                }
+            )
+            task_ids.append(idx)
+
+    with span("cross_validation", items=len(tasks) * len(nearest_neighbors)):
+        results = [
+            result.assign(polygon_id=idx)
+            for idx, result in tqdm(
+                zip(task_ids, _map_tasks(tasks, workers)),
+                total=len(tasks),
+                desc="Cross-validating each polygon",
+                disable=not progress,
+            )
+        ]
+
+    keys = ["polygon_id", "ellipsivity", "nearest_neighbors", "power", "column"]
+    if not results:
+        return pd.DataFrame(
+            columns=keys + ["count", "bias", "rmse", "max_error", "current"]
+        )
+    results = pd.concat(results, ignore_index=True)
+    results = results[keys + ["count", "bias", "rmse", "max_error"]]
+    results["current"] = (
+        (results["ellipsivity"] == results["polygon_id"].map(current_ellipsivity))
+        & (results["nearest_neighbors"] == current_nnear)
+        & (results["power"] == current_power)
+    )
+    return results
+
+
+def best_parameters(results: pd.DataFrame, column: str = "current_surface_elevation"):
+    """
+    The parameters with the lowest RMSE of `column` in the tune_polygons
+    results. nearest_neighbors and power are settings of the whole lake, so
+    the pair of them with the lowest RMSE over all polygons is chosen, with
+    the best ellipsivity of each polygon for that pair.
+
+    Returns:
+        pd.DataFrame: ellipsivity, nearest_neighbors, power, count and rmse of
+            each polygon, with the rmse of its current parameters (empty if
+            there are no results for `column`)
+    """
+    errors = results[(results["column"] == column) & results["rmse"].notna()]
+    keys = ["nearest_neighbors", "power"]
+    if errors.empty:
+        return pd.DataFrame(
+            columns=["ellipsivity"] + keys + ["count", "rmse", "current_rmse"],
+            index=pd.Index([], name="polygon_id"),
+        )
+
+    # best ellipsivity of each polygon for each pair, then the pair with the
+    # lowest RMSE of all polygons together
+    per_polygon = errors.loc[errors.groupby(["polygon_id"] + keys)["rmse"].idxmin()]
+    totals = (
+        per_polygon.assign(squared=per_polygon["rmse"] ** 2 * per_polygon["count"])
+        .groupby(keys)[["squared", "count"]]
+        .sum()
+    )
+    nnear, power = (totals["squared"] / totals["count"]).idxmin()
+    best = per_polygon[
+        (per_polygon["nearest_neighbors"] == nnear) & (per_polygon["power"] == power)
+    ]
+
+    current = errors[errors["current"]].set_index("polygon_id")["rmse"]
+    return best.set_index("polygon_id")[
+        ["ellipsivity", "nearest_neighbors", "power", "count", "rmse"]
+    ].assign(current_rmse=current)
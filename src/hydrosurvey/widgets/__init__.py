@@ -2,4 +2,5 @@ from .command_runner import CommandRunner
 from .eac import EACViewer
 from .file_picker import FileFolderPicker
 from .interpolate_lake import InterpolateLakeViewer
+from .profile_report import ProfileReport
 from .sdi2csv import SDI2CSVViewer
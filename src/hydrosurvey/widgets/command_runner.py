@@ -20,10 +20,11 @@ class CommandRunner(Viewer):
         self.process = None  # Store the subprocess
         super().__init__(**params)
 
-    def run_command(self, command):
+    def run_command(self, command, on_finish=None):
         """
         Runs the given command in a subprocess, ensuring only one
-        process runs at a time.
+        process runs at a time. on_finish, if given, is called with the
+        return code once the command has finished.
         """
         if self.process and self.process.poll() is None:
             self.terminal.write(
@@ -43,6 +44,8 @@ class CommandRunner(Viewer):
             self.process.stdout.close()
             self.process.wait()
             self.terminal.write("Command finished.\n")
+            if on_finish is not None:
+                on_finish(self.process.returncode)
 
         threading.Thread(target=process_output, daemon=True).start()
 
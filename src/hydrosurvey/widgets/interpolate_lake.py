@@ -7,6 +7,7 @@ import panel as pn
 import tomli_w
 
 from . import CommandRunner, FileFolderPicker
+from .profile_report import ProfileReport
 
 # Configure logging
 logging.basicConfig(
@@ -52,6 +53,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
                 "interpolation_params_column": "Interpolation Parameters",
                 "buffer": "Polygon Buffer",
                 "nearest_neighbors": "Nearest Neighbors",
+                "workers": "Parallel Workers",
             },
             "output": {
                 "filepath": "Output File",
@@ -115,6 +117,11 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
             name=self.config_mapper["interpolation_polygons"]["nearest_neighbors"],
             value=100,
         )
+        self.workers = pn.widgets.IntInput(
+            name=self.config_mapper["interpolation_polygons"]["workers"],
+            value=1,
+            start=1,
+        )
 
         # output directory
         self.output_file_dir = FileFolderPicker(
@@ -126,6 +133,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
         )
 
         self.terminal = CommandRunner()
+        self.profile = ProfileReport()
         self.cli_command = pn.widgets.StaticText(
             name="CLI Command: ",
             value="hstools interpolate-lake /path/to/config.toml",
@@ -197,6 +205,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
                     self.interpolation_polygons_file,
                     self.buffer,
                     self.nearest_neighbors,
+                    self.workers,
                     pn.layout.Divider(),
                     # "## Output Information",
                     self.output_file_dir,
@@ -208,6 +217,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
                     self.save_and_run,
                     self.cli_command,
                     self.terminal,
+                    self.profile,
                 ),
             ),
         )
@@ -247,6 +257,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
         config["interpolation_polygons"][
             "nearest_neighbors"
         ] = self.nearest_neighbors.value
+        config["interpolation_polygons"]["workers"] = self.workers.value
 
         config["output"] = {}
         output_filepath = (
@@ -277,13 +288,17 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
         with open(config_filepath, "wb") as f:
             tomli_w.dump(replace_none(config), f)
 
+        profile_file = output_filepath.with_suffix(".profile.json")
         command = [
             "hstools",
+            *self.profile.options(profile_file),
             "interpolate-lake",
             str(config_filepath),
         ]
         self.cli_command.value = " ".join(command)
-        self.terminal.run_command(command)
+        self.terminal.run_command(
+            command, on_finish=lambda returncode: self.profile.load(profile_file)
+        )
 
     def parse_config(self, cols):
         return {k: v for k, v in cols.items() if "_column" in k or "filepath" in k}
@@ -321,6 +336,7 @@ class InterpolateLakeViewer(pn.viewable.Viewer):
         self.nearest_neighbors.value = config["interpolation_polygons"][
             "nearest_neighbors"
         ]
+        self.workers.value = config["interpolation_polygons"].get("workers", 1)
 
         self.output_file_dir.selected_path.value = str(
             Path(config["output"]["filepath"]).parent
@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+import panel as pn
+from panel.viewable import Viewer
+
+from ..profiling import profile_table
+
+pn.extension("tabulator")
+
+
+class ProfileReport(Viewer):
+    """
+    Checkbox to run a command with `hstools --profile` and a table of the
+    time and memory used by each stage, shown once the command has finished.
+    """
+
+    def __init__(self, **params):
+        self.enabled = pn.widgets.Checkbox(name="Profile run", value=False)
+        self.table = pn.widgets.Tabulator(
+            disabled=True, show_index=True, visible=False, sizing_mode="stretch_width"
+        )
+        super().__init__(**params)
+
+    def options(self, report_file):
+        """
+        Returns the hstools options that write the profile to report_file, or
+        an empty list if profiling is not enabled.
+        """
+        if not self.enabled.value:
+            return []
+        return ["--profile", str(report_file)]
+
+    def load(self, report_file):
+        """Show the profile report in report_file, if it exists."""
+        report_file = Path(report_file)
+        if not self.enabled.value or not report_file.exists():
+            return
+        with open(report_file) as f:
+            table = profile_table(json.load(f))
+        self.table.value = table.round(3)
+        self.table.visible = True
+
+    def __panel__(self):
+        return pn.Column(self.enabled, self.table)
@@ -5,11 +5,13 @@ from panel.viewable import Viewer
 
 from .command_runner import CommandRunner
 from .file_picker import FileFolderPicker
+from .profile_report import ProfileReport
 
 
 class SDI2CSVViewer(Viewer):
     def __init__(self, **params):
         self.command_runner = CommandRunner()
+        self.profile = ProfileReport()
         self.sdi_folder = FileFolderPicker(
             name="SDI Files Folder",
             only_folders=True,
@@ -28,6 +30,12 @@ class SDI2CSVViewer(Viewer):
             placeholder="Enter USGS parameter code",
         )
 
+        self.thin_cell_size = pn.widgets.FloatInput(
+            name="Thinning Cell Size (0 = no thinning)",
+            value=0.0,
+            start=0.0,
+        )
+
         # Create a column for tide-related widgets
         self.tide_widgets = pn.Column(
             self.tide_file,
@@ -65,6 +73,7 @@ class SDI2CSVViewer(Viewer):
                     self.sdi_folder,
                     self.apply_tide_corrections,
                     self.tide_widgets,
+                    self.thin_cell_size,
                     self.output_file_dir,
                     self.output_file_name,
                 ),
@@ -72,6 +81,7 @@ class SDI2CSVViewer(Viewer):
                     self.cli_command,
                     self.run_button,
                     self.command_runner,
+                    self.profile,
                 ),
             ),
         )
@@ -81,15 +91,18 @@ class SDI2CSVViewer(Viewer):
         self.tide_widgets.visible = event.new
 
     def run_sdi2csv(self, event):
+        output_file = (
+            Path(self.output_file_dir.get_selected()["filepath"])
+            .joinpath(self.output_file_name.value)
+            .with_suffix(".csv")
+        )
+        profile_file = output_file.with_suffix(".profile.json")
         command = [
             "hstools",
+            *self.profile.options(profile_file),
             "sdi2csv",
             self.sdi_folder.get_selected()["filepath"],
-            str(
-                Path(self.output_file_dir.get_selected()["filepath"])
-                .joinpath(self.output_file_name.value)
-                .with_suffix(".csv")
-            ),
+            str(output_file),
         ]
 
         # Add tide correction parameters if checkbox is checked
@@ -101,8 +114,13 @@ class SDI2CSVViewer(Viewer):
                 self.usgs_parameter.value,
             ])
 
+        if self.thin_cell_size.value:
+            command.extend(["--thin-cell-size", str(self.thin_cell_size.value)])
+
         self.cli_command.value = " ".join(command)
-        self.command_runner.run_command(command)
+        self.command_runner.run_command(
+            command, on_finish=lambda returncode: self.profile.load(profile_file)
+        )
 
     def __panel__(self):
         return self.layout
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CURRENT_COLUMNS = ["x_coord", "y_coord", "current_surface_z"]
+PREIMPOUNDMENT_COLUMNS = ["x_coord", "y_coord", "preimpoundment_z"]
+
+
+def read_xyz(filepath, names):
+    """
+    Read a whitespace delimited x, y, z file. Uses the C tokenizer's
+    whitespace mode (sep=r"\\s+" is special-cased by pandas and does not
+    go through the python regex engine) and parses all columns as float64.
+    """
+    return pd.read_csv(
+        filepath, names=names, sep=r"\s+", engine="c", dtype=np.float64, header=None
+    )
+
+
+def pair_xyz_files(files):
+    """
+    Pair current (*_1.xyz) and preimpoundment (*_2.xyz) surface files of the
+    same survey line, matched by file name so that the surfaces can be in
+    sibling folders (e.g. Srf1/ and Srf2/). If several folders hold a line
+    with the same name, a preimpoundment file in the current file's folder is
+    preferred. Returns a sorted list of (current, preimpoundment) tuples,
+    where preimpoundment is None if the line has no *_2.xyz file, and a list
+    of *_2.xyz files with no matching current surface.
+    """
+    current = []
+    preimpoundment = {}
+    for f in sorted(Path(f) for f in files):
+        if f.stem.endswith("_1"):
+            current.append(f)
+        elif f.stem.endswith("_2"):
+            preimpoundment.setdefault(f.stem[:-2], []).append(f)
+
+    pairs = []
+    for f in current:
+        candidates = preimpoundment.get(f.stem[:-2], [])
+        same_folder = [c for c in candidates if c.parent == f.parent]
+        match = (same_folder or candidates or [None])[0]
+        if match is not None:
+            candidates.remove(match)
+        pairs.append((f, match))
+    orphans = sorted(f for candidates in preimpoundment.values() for f in candidates)
+    return pairs, orphans
+
+
+def merge_surfaces(current: pd.DataFrame, preimpoundment: pd.DataFrame, decimals=2):
+    """
+    Join preimpoundment elevations onto current surface points using a hash
+    join on coordinates rounded to `decimals` places. Current surface points
+    with no preimpoundment point at the same location get NaN.
+    """
+    keys = ["_x_key", "_y_key"]
+    current = current.assign(
+        _x_key=current["x_coord"].round(decimals),
+        _y_key=current["y_coord"].round(decimals),
+    )
+    preimpoundment = preimpoundment.assign(
+        _x_key=preimpoundment["x_coord"].round(decimals),
+        _y_key=preimpoundment["y_coord"].round(decimals),
+    ).drop_duplicates(subset=keys)[keys + ["preimpoundment_z"]]
+    merged = current.merge(preimpoundment, on=keys, how="left", sort=False)
+    return merged.drop(columns=keys)
+
+
+def _merge_pair(pair, decimals):
+    current_file, preimpoundment_file = pair
+    current = read_xyz(current_file, CURRENT_COLUMNS)
+    if preimpoundment_file is None:
+        return current.assign(preimpoundment_z=np.nan)
+    preimpoundment = read_xyz(preimpoundment_file, PREIMPOUNDMENT_COLUMNS)
+    return merge_surfaces(current, preimpoundment, decimals=decimals)
+
+
+def merge_xyz_files(files, output_file, decimals=2, workers=None):
+    """
+    Merge current and preimpoundment surface xyz files into a single csv file.
+    Line pairs are read and joined in parallel threads and appended to the
+    output in a deterministic (sorted) order as they complete, so memory use
+    is bounded by a few lines at a time. Returns the number of merged points
+    and the list of preimpoundment files with no current surface.
+    """
+    pairs, orphans = pair_xyz_files(files)
+    workers = workers or min(8, os.cpu_count() or 1)
+
+    n_points = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(pairs), workers):
+            batch = pairs[start : start + workers]
+            for merged in executor.map(lambda p: _merge_pair(p, decimals), batch):
+                first = start == 0 and n_points == 0
+                merged.to_csv(
+                    output_file, mode="w" if first else "a", header=first, index=False
+                )
+                n_points += len(merged)
+
+    return n_points, orphans
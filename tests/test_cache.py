@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import LineString
+
+from hydrosurvey.cache import ResultCache, SNCache
+from hydrosurvey.sn import Coord_SN
+
+
+def test_sn_cache(tmp_path):
+    """Test that SN transforms are written to and read back from the cache."""
+    centerline = gpd.GeoDataFrame(geometry=[LineString([(0, 0), (100, 0)])])
+    x = np.array([5.0, 50.0])
+    y = np.array([3.0, -2.0])
+    cache = SNCache(tmp_path / "cache")
+
+    s, n = cache.xy_to_sn(centerline, x, y)
+    expected_s, expected_n = Coord_SN(centerline).xy_to_sn(x, y)
+    np.testing.assert_array_equal(s, expected_s)
+    np.testing.assert_array_equal(n, expected_n)
+    files = list((tmp_path / "cache").glob("*.npy"))
+    assert len(files) == 1
+
+    # a cache hit returns the stored result
+    np.save(files[0], np.vstack([s + 1, n]))
+    s_cached, _ = cache.xy_to_sn(centerline, x, y)
+    np.testing.assert_array_equal(s_cached, s + 1)
+
+    # different points or a different centerline are new entries
+    cache.xy_to_sn(centerline, x + 1, y)
+    moved = gpd.GeoDataFrame(geometry=[LineString([(0, 1), (100, 1)])])
+    cache.xy_to_sn(moved, x, y)
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 3
+
+    # entries of another package version are not reused
+    with patch("hydrosurvey.cache.__version__", "other"):
+        s_other, _ = cache.xy_to_sn(centerline, x, y)
+    np.testing.assert_array_equal(s_other, s)
+
+
+def test_sn_cache_disabled(tmp_path):
+    """Test that nothing is cached without a cache directory."""
+    centerline = gpd.GeoDataFrame(geometry=[LineString([(0, 0), (100, 0)])])
+    s, n = SNCache().xy_to_sn(centerline, np.array([5.0]), np.array([3.0]))
+    np.testing.assert_allclose([s[0], n[0]], [5.0, -3.0])
+
+
+def test_result_cache(tmp_path):
+    """Test that polygon results are keyed by the interpolation inputs."""
+    task = {
+        "centerline": gpd.GeoDataFrame(geometry=[LineString([(0, 0), (100, 0)])]),
+        "source_x": np.array([5.0, 50.0]),
+        "source_y": np.array([3.0, -2.0]),
+        "source_values": np.array([[1.0], [2.0]]),
+        "target_x": np.array([10.0]),
+        "target_y": np.array([0.0]),
+        "ellipsivity": 10.0,
+        "cache_dir": str(tmp_path / "cache"),
+        "query_workers": 1,
+    }
+    cache = ResultCache(tmp_path / "cache")
+    key = cache.key(task)
+    assert cache.load(key) is None
+
+    cache.save(key, np.array([[1.5]]))
+    np.testing.assert_array_equal(cache.load(key), [[1.5]])
+
+    # settings that do not change the result share the entry
+    assert cache.key({**task, "cache_dir": None, "query_workers": -1}) == key
+    # any change to the inputs is a new entry
+    assert cache.key({**task, "ellipsivity": 12.0}) != key
+    assert cache.key({**task, "source_values": np.array([[1.0], [2.5]])}) != key
+    moved = gpd.GeoDataFrame(geometry=[LineString([(0, 1), (100, 1)])])
+    assert cache.key({**task, "centerline": moved}) != key
+
+    assert ResultCache().load(key) is None
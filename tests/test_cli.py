@@ -1,13 +1,15 @@
 import csv
+import json
 import tempfile
 from pathlib import Path
 from unittest.mock import patch
 
+import geopandas as gpd
 import pandas as pd
 import pytest
 from typer.testing import CliRunner
 
-from hydrosurvey.cli import app, new_config, points_to_file
+from hydrosurvey.cli import app, new_config, point_set_to_file, points_to_file
 
 
 @pytest.fixture
@@ -130,6 +132,49 @@ def test_sdi2csv_with_tide_corrections(runner, test_dirs, temp_output_dir, mock_
     assert "No such command" not in result.stdout
 
 
+def test_sdi2csv_thinning_with_tide_corrections(runner, test_dirs, temp_output_dir):
+    """Test that thinning combines tide corrected elevations, not raw depths."""
+    if not (test_dirs["sdi"] / "09112303.bin").exists():
+        pytest.skip("SDI test data not available")
+    from hydrosurvey.thin import thin_points
+
+    # copy one line, surveyed while the lake rises a foot per minute
+    sdi_dir = temp_output_dir / "sdi"
+    sdi_dir.mkdir()
+    for f in test_dirs["sdi"].glob("09112303.*"):
+        (sdi_dir / f.name).write_bytes(f.read_bytes())
+    tide_file = temp_output_dir / "tide.rdb"
+    rows = "".join(
+        f"USGS\t08057000\t2009-11-23 09:{minute}\t{100.0 + minute - 40}\tA\n"
+        for minute in range(40, 50)
+    )
+    tide_file.write_text(
+        "agency_cd\tsite_no\tdatetime\t04_62614_00003\t04_62614_00003_cd\n"
+        "5s\t15s\t20d\t14n\t10s\n" + rows
+    )
+    options = ["--tide-file", str(tide_file), "--usgs-parameter", "04_62614_00003"]
+
+    result = runner.invoke(
+        app, ["sdi2csv", str(sdi_dir), str(temp_output_dir / "all.csv")] + options
+    )
+    assert result.exit_code == 0
+    result = runner.invoke(
+        app,
+        ["sdi2csv", str(sdi_dir), str(temp_output_dir / "thin.csv")]
+        + options
+        + ["--thin-cell-size", "50"],
+    )
+    assert result.exit_code == 0
+
+    corrected = pd.read_csv(temp_output_dir / "all.csv", parse_dates=["datetime"])
+    thinned = pd.read_csv(temp_output_dir / "thin.csv", index_col=0)
+    expected = thin_points(corrected, 50, "easting", "northing")
+    assert 0 < len(thinned) < len(corrected)
+    assert sorted(thinned["current_surface"]) == pytest.approx(
+        sorted(expected["current_surface"])
+    )
+
+
 def test_merge_xyz_help(runner):
     """Test merge-xyz command help."""
     result = runner.invoke(app, ["merge-xyz", "--help"])
@@ -202,6 +247,77 @@ def test_points_to_file(mock_gdf, temp_output_dir):
     assert 'current_surface_elevation' in df.columns
 
 
+def test_points_to_file_parts(mock_gdf, temp_output_dir):
+    """Test writing points_to_file output in parts."""
+    output_file = temp_output_dir / "test_points"
+
+    points_to_file(mock_gdf.iloc[:2], str(output_file), part=0)
+    points_to_file(mock_gdf.iloc[2:], str(output_file), part=1)
+
+    df = pd.read_csv(temp_output_dir / "test_points.csv")
+    assert len(df) == 3
+    assert list(df["type"]) == ["survey", "survey", "interpolated"]
+    assert len(gpd.read_file(temp_output_dir / "test_points.gpkg")) == 3
+    parts = sorted((temp_output_dir / "test_points.parquet").glob("part-*.parquet"))
+    assert [p.name for p in parts] == ["part-00000.parquet", "part-00001.parquet"]
+    assert len(gpd.read_parquet(temp_output_dir / "test_points.parquet")) == 3
+
+
+def test_point_set_to_file(temp_output_dir):
+    """Test writing a PointSet in chunks gives the same files as a GeoDataFrame."""
+    import json
+
+    import numpy as np
+    import pyarrow.parquet as pq
+    from hydrosurvey.interpolate import export_points
+    from hydrosurvey.points import PointSet
+
+    rng = np.random.default_rng(0)
+    points = PointSet(
+        rng.uniform(0, 100, 25),
+        rng.uniform(0, 100, 25),
+        crs="EPSG:3857",
+        attributes={
+            "current_surface_elevation": rng.uniform(90, 100, 25),
+            "preimpoundment_elevation": rng.uniform(80, 90, 25),
+            "source": np.array(["survey", "polygon: 1"] * 12 + ["survey"], dtype=object),
+            "type": np.array(["survey", "interpolated"] * 12 + ["survey"], dtype=object),
+        },
+    )
+    columns = ["current_surface_elevation", "preimpoundment_elevation"]
+    points_to_file(export_points(points, columns), str(temp_output_dir / "whole.csv"))
+    point_set_to_file(
+        points, columns, str(temp_output_dir / "chunks.csv"), chunk_size=10
+    )
+
+    for suffix in [".csv", ".gpkg", ".parquet"]:
+        whole = temp_output_dir / f"whole{suffix}"
+        chunks = temp_output_dir / f"chunks{suffix}"
+        if suffix == ".csv":
+            assert chunks.read_text() == whole.read_text()
+        else:
+            read = gpd.read_parquet if suffix == ".parquet" else gpd.read_file
+            pd.testing.assert_frame_equal(read(chunks), read(whole))
+    metadata = json.loads(
+        pq.read_schema(temp_output_dir / "chunks.parquet").metadata[b"geo"]
+    )
+    assert metadata["columns"]["geometry"]["bbox"] == list(
+        export_points(points, columns).total_bounds
+    )
+
+    # without preimpoundment elevations
+    point_set_to_file(
+        points, columns[:1], str(temp_output_dir / "current.csv"), chunk_size=10
+    )
+    points_to_file(
+        export_points(points, columns[:1]), str(temp_output_dir / "whole.csv")
+    )
+    current = temp_output_dir / "current.csv"
+    assert current.read_text() == (temp_output_dir / "whole.csv").read_text()
+    assert "preimpoundment_elevation" not in pd.read_csv(current)
+    assert len(gpd.read_parquet(temp_output_dir / "current.parquet")) == 25
+
+
 def test_merge_xyz_with_sample_data(runner, temp_output_dir):
     """Test merge-xyz command with sample XYZ files."""
     # Create sample XYZ files
@@ -240,9 +356,13 @@ def test_merge_xyz_with_sample_data(runner, temp_output_dir):
 
 @pytest.mark.parametrize("command", [
     "sdi2csv",
+    "sdi-qc",
+    "sdi-watch",
+    "line-crossings",
     "merge-xyz", 
     "new-config",
     "interpolate-lake",
+    "tune-polygon",
     "compute-eac",
     "gui"
 ])
@@ -318,4 +438,117 @@ def test_integration_sdi2csv_real_data(runner, test_dirs, temp_output_dir):
     else:
         # Test might fail due to data format or missing dependencies
         # Just ensure it's not a command recognition error
-        assert "Usage:" in result.stdout or "Error" in result.stdout
\ No newline at end of file
+        assert "Usage:" in result.stdout or "Error" in result.stdout
+
+def test_merge_xyz_joins_on_coordinates(runner, temp_output_dir):
+    """Test that merge-xyz pairs surfaces by coordinate, not row order."""
+    xyz_dir = temp_output_dir / "Srf_data"
+    xyz_dir.mkdir()
+
+    with open(xyz_dir / "line01_1.xyz", "w") as f:
+        f.write("0.0 0.0 100.0\n1.0 0.0 101.0\n0.0 1.0 102.0\n")
+    # preimpoundment surface in a different order with a missing point
+    with open(xyz_dir / "line01_2.xyz", "w") as f:
+        f.write("  0.0   1.0   97.0\n0.001 0.0 95.0\n")
+    with open(xyz_dir / "line02_1.xyz", "w") as f:
+        f.write("5.0 5.0 110.0\n")
+
+    output_file = temp_output_dir / "merged.csv"
+    result = runner.invoke(app, ["merge-xyz", str(temp_output_dir), str(output_file)])
+
+    assert result.exit_code == 0
+    df = pd.read_csv(output_file)
+    assert list(df.columns) == [
+        "x_coord", "y_coord", "current_surface_z", "preimpoundment_z"
+    ]
+    assert len(df) == 4
+    merged = df.set_index("current_surface_z")["preimpoundment_z"]
+    assert merged[100.0] == 95.0
+    assert merged[102.0] == 97.0
+    assert pd.isna(merged[101.0])
+    assert pd.isna(merged[110.0])
+
+
+def test_merge_xyz_sibling_folders(runner, temp_output_dir):
+    """Test that merge-xyz pairs surfaces of a line in sibling folders."""
+    for folder, suffix, z in [("Srf1", "_1", 100.0), ("Srf2", "_2", 95.0)]:
+        (temp_output_dir / folder).mkdir()
+        (temp_output_dir / folder / f"line01{suffix}.xyz").write_text(
+            f"0.0 0.0 {z}\n"
+        )
+    (temp_output_dir / "Srf2" / "line02_2.xyz").write_text("1.0 1.0 90.0\n")
+
+    output_file = temp_output_dir / "merged.csv"
+    result = runner.invoke(app, ["merge-xyz", str(temp_output_dir), str(output_file)])
+
+    assert result.exit_code == 0
+    assert "line02_2.xyz" in result.stdout
+    df = pd.read_csv(output_file)
+    assert len(df) == 1
+    assert df["preimpoundment_z"].iloc[0] == 95.0
+
+
+def test_merge_xyz_no_pairs(runner, temp_output_dir):
+    """Test that merge-xyz fails when there is no current surface to merge."""
+    (temp_output_dir / "Srf_data").mkdir()
+    (temp_output_dir / "Srf_data" / "line01_2.xyz").write_text("1.0 1.0 90.0\n")
+
+    output_file = temp_output_dir / "merged.csv"
+    result = runner.invoke(app, ["merge-xyz", str(temp_output_dir), str(output_file)])
+
+    assert result.exit_code == 1
+    assert "No current surface xyz points found" in result.stdout
+    assert "file saved" not in result.stdout
+    assert not output_file.exists()
+
+
+def test_profile_option(runner, temp_output_dir):
+    """Test that --profile and --cprofile write reports of the command."""
+    xyz_dir = temp_output_dir / "Srf_data"
+    xyz_dir.mkdir()
+    (xyz_dir / "sample_1.xyz").write_text("0.0 0.0 100.0\n1.0 0.0 101.0\n")
+    (xyz_dir / "sample_2.xyz").write_text("0.0 0.0 95.0\n1.0 0.0 96.0\n")
+    report_file = temp_output_dir / "profile.json"
+    stats_file = temp_output_dir / "profile.prof"
+
+    result = runner.invoke(app, [
+        "--profile", str(report_file),
+        "--cprofile", str(stats_file),
+        "merge-xyz",
+        str(temp_output_dir),
+        str(temp_output_dir / "merged.csv"),
+    ])
+
+    assert result.exit_code == 0
+    report = json.loads(report_file.read_text())
+    assert report["command"] == "merge-xyz"
+    assert report["spans"][0]["name"] == "merge-xyz"
+    assert report["spans"][0]["calls"] == 1
+    assert stats_file.stat().st_size > 0
+
+
+def test_tune_polygon(runner, temp_output_dir):
+    """Test tune-polygon on a synthetic lake."""
+    import tomli_w
+
+    from hydrosurvey.synthetic import SyntheticLake
+
+    config = SyntheticLake(length=1000, n_polygons=3).write(temp_output_dir)
+    config_file = temp_output_dir / "config.toml"
+    config_file.write_bytes(tomli_w.dumps(config).encode())
+    output_file = temp_output_dir / "tuning.csv"
+
+    result = runner.invoke(app, [
+        "tune-polygon",
+        str(config_file),
+        "--polygons", "2",
+        "--ellipsivity", "1,5",
+        "--nearest-neighbors", "8",
+        "--output-file", str(output_file),
+    ])
+
+    assert result.exit_code == 0
+    results = pd.read_csv(output_file)
+    assert (results["polygon_id"] == 2).all()
+    assert sorted(results["ellipsivity"].unique()) == [1, 5, 10]
+    assert sorted(results["nearest_neighbors"].unique()) == [8, 16]
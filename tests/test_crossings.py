@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydrosurvey.crossings import line_crossings
+
+
+@pytest.fixture
+def crossing_lines():
+    """Fixture providing two perpendicular survey lines and a distant line."""
+    t = np.arange(0.0, 100.0, 0.25)
+    lines = [
+        ("A", t, np.full_like(t, 50.0), 0.0),
+        ("B", np.full_like(t, 50.0), t, 0.5),
+        ("C", t, np.full_like(t, 500.0), 0.0),
+    ]
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "easting": x,
+                    "northing": y,
+                    "survey_line_number": name,
+                    "current_surface": 100.0 + offset,
+                    "pre_impoundment_surface": 90.0,
+                }
+            )
+            for name, x, y, offset in lines
+        ],
+        ignore_index=True,
+    )
+
+
+def test_line_crossings(crossing_lines):
+    """Test that a crossing is found and its misfit is reported."""
+    matches, stats = line_crossings(
+        crossing_lines, ["current_surface", "pre_impoundment_surface"], radius=1.0
+    )
+
+    assert list(stats.index) == [("A", "B")]
+    assert stats.loc[("A", "B"), "count"] == len(matches)
+    assert (matches["distance"] <= 1.0).all()
+    assert stats.loc[("A", "B"), "current_surface_misfit_mean"] == pytest.approx(-0.5)
+    assert stats.loc[("A", "B"), "current_surface_misfit_rmse"] == pytest.approx(0.5)
+    assert stats.loc[("A", "B"), "pre_impoundment_surface_misfit_max_abs"] == 0.0
+
+
+def test_line_crossings_none(crossing_lines):
+    """Test that lines that never cross report no matches."""
+    parallel = crossing_lines[crossing_lines["survey_line_number"] != "B"]
+    matches, stats = line_crossings(parallel, ["current_surface"], radius=1.0)
+
+    assert len(matches) == 0
+    assert len(stats) == 0
@@ -2,6 +2,7 @@ import unittest
 
 import numpy as np
 import numpy.testing as npt
+from scipy.spatial import cKDTree
 
 from hydrosurvey.methods import idw
 
@@ -186,6 +187,159 @@ class TestIDW(unittest.TestCase):
         self.assertEqual(result_1col.shape, (5, 1))
         self.assertEqual(result_3col.shape, (5, 3))
 
+    def test_chunked_query(self):
+        """Test that chunked and multithreaded queries give the same result."""
+        rng = np.random.default_rng(0)
+        coords = rng.uniform(0, 10, (200, 2))
+        values = rng.normal(size=(200, 2))
+        query_points = rng.uniform(0, 10, (1000, 2))
+
+        result = idw(coords, values, query_points, nnear=8)
+        chunked = idw(coords, values, query_points, nnear=8, chunk_size=64, workers=2)
+        npt.assert_allclose(chunked, result, atol=1e-12)
+
+        # same as weighting each column separately
+        tree_distances = np.linalg.norm(
+            query_points[:, np.newaxis] - coords[np.newaxis], axis=2
+        )
+        nearest = np.argsort(tree_distances, axis=1)[:, :8]
+        distances = np.take_along_axis(tree_distances, nearest, axis=1)
+        weights = 1.0 / (distances + 1e-10) ** 2
+        expected = np.stack(
+            [(weights * values[nearest, i]).sum(1) / weights.sum(1) for i in range(2)],
+            axis=1,
+        )
+        npt.assert_allclose(result, expected, atol=1e-12)
+
+    def test_nnear_clamped(self):
+        """Test nnear larger than the number of points and nnear=1."""
+        query_points = np.array([[0.1, 0.1], [0.9, 0.8]])
+        result_all = idw(self.coords_2d, self.values_single, query_points, nnear=4)
+        result_more = idw(self.coords_2d, self.values_single, query_points, nnear=10)
+        npt.assert_allclose(result_more, result_all)
+
+        result_one = idw(self.coords_2d, self.values_multi, query_points, nnear=1)
+        npt.assert_allclose(result_one, [[0.0, 10.0], [3.0, 13.0]])
+
+    def test_max_distance(self):
+        """Test distance limited neighbors and fill strategies."""
+        query_points = np.array([[0.1, 0.0], [5.0, 5.0]])
+
+        result = idw(
+            self.coords_2d, self.values_single, query_points, nnear=4, max_distance=0.5
+        )
+        npt.assert_allclose(result[0], [0.0])
+        self.assertTrue(np.isnan(result[1, 0]))
+
+        nearest = idw(
+            self.coords_2d,
+            self.values_single,
+            query_points,
+            nnear=4,
+            max_distance=0.5,
+            fill="nearest",
+        )
+        unbounded = idw(self.coords_2d, self.values_single, query_points, nnear=4)
+        npt.assert_allclose(nearest[1], unbounded[1])
+
+        constant = idw(
+            self.coords_2d,
+            self.values_single,
+            query_points,
+            nnear=4,
+            max_distance=0.5,
+            fill=-1,
+        )
+        npt.assert_allclose(constant[:, 0], [0.0, -1.0])
+
+        with self.assertRaises(ValueError):
+            idw(self.coords_2d, self.values_single, query_points, fill="mean")
+
+    def test_sectors(self):
+        """Test that sector search takes neighbors from both sides of a query."""
+        x = np.arange(0.0, 100.0, 0.5)
+        # dense survey line close to the query and another further away
+        coords = np.r_[np.c_[x, np.full_like(x, 4.0)], np.c_[x, np.full_like(x, -6.0)]]
+        values = np.r_[np.ones_like(x), np.zeros_like(x)][:, np.newaxis]
+        query_points = np.array([[50.0, 0.0]])
+
+        nearest = idw(coords, values, query_points, nnear=8)
+        npt.assert_allclose(nearest, [[1.0]])
+
+        balanced = idw(coords, values, query_points, nnear=8, sectors=4)
+        self.assertTrue(0.5 < balanced[0, 0] < 0.9)
+
+        with self.assertRaises(ValueError):
+            idw(np.random.rand(10, 3), np.random.rand(10, 1), np.random.rand(2, 3), sectors=4)
+
+    def test_sectors_far_line(self):
+        """Test that sector search reaches a distant line behind a dense one."""
+        x = np.arange(0.0, 100.0)
+        # the 32 nearest points are all on the near line
+        coords = np.r_[np.c_[x, np.full_like(x, 1.0)], np.c_[x, np.full_like(x, -50.0)]]
+        values = np.r_[np.ones_like(x), np.zeros_like(x)][:, np.newaxis]
+        query_points = np.array([[50.5, 0.0], [150.0, -50.0]])
+
+        result = idw(coords, values, query_points, nnear=8, sectors=4)
+        # the far line fills the lower sectors, weighted by its distance, where
+        # only the near line was used before
+        distances = np.hypot(np.r_[0.5, 1.5], 1.0)
+        near = 2 * (1 / distances**2).sum()
+        far = 2 * (1 / np.hypot(np.r_[0.5, 1.5], 50.0) ** 2).sum()
+        npt.assert_allclose(result[0, 0], near / (near + far))
+
+        # no more points within max_distance
+        result = idw(coords, values, query_points, nnear=8, sectors=4, max_distance=10)
+        npt.assert_allclose(result[0, 0], 1.0)
+        self.assertTrue(np.isnan(result[1, 0]))
+
+    def test_sectors_one_sided(self):
+        """Test that sector search stops expanding where a sector stays empty."""
+        rng = np.random.default_rng(0)
+        coords = rng.uniform([-100.0, 0.0], [0.0, 100.0], (20000, 2))
+        values = coords[:, :1].copy()
+        query_points = np.c_[np.linspace(1.0, 10.0, 50), np.full(50, 50.0)]
+
+        tree = cKDTree(coords)
+        queried = []
+
+        class CountingTree:
+            n = tree.n
+            data = tree.data
+
+            def query(self, *args, k, **kwargs):
+                queried.append(k)
+                return tree.query(*args, k=k, **kwargs)
+
+        result = idw(
+            coords, values, query_points, nnear=8, sectors=4, tree=CountingTree()
+        )
+        # the eastern sectors are empty, at most 8 times the first query's
+        # candidates are searched and the western sectors are still used
+        self.assertEqual(max(queried), 8 * 4 * 8)
+        self.assertTrue((result[:, 0] < 0).all())
+
+    def test_nan_values(self):
+        """Test that NaN values are left out of their column only."""
+        values = self.values_multi.copy()
+        values[0, 1] = np.nan
+        query_points = np.array([[0.0, 0.0], [0.5, 0.5]])
+
+        result = idw(self.coords_2d, values, query_points, nnear=4)
+        npt.assert_allclose(result[:, 0], [0.0, 1.5], atol=1e-12)
+        # the exact match is NaN in column 1, the other neighbors are used
+        npt.assert_allclose(result[:, 1], [29.5 / 2.5, 12.0])
+
+        # column 1 is NaN where all neighbors are NaN unless a fallback is used
+        values[:3, 1] = np.nan
+        query_points = np.array([[0.0, 0.0], [0.2, 0.1]])
+        result = idw(self.coords_2d, values, query_points, nnear=2)
+        self.assertFalse(np.isnan(result[:, 0]).any())
+        self.assertTrue(np.isnan(result[:, 1]).all())
+
+        result = idw(self.coords_2d, values, query_points, nnear=2, nan_fallback=True)
+        npt.assert_allclose(result[:, 1], [13.0, 13.0])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
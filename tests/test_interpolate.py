@@ -6,17 +6,35 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import pytest
-from shapely.geometry import Point, Polygon
+from shapely.geometry import LineString, Point, Polygon
 
 from hydrosurvey.interpolate import (
+    _survey_batches,
+    aeidw,
+    aeidw_tiles,
     densify_geometry,
     generate_target_points,
-    mask_higher_priority_polygons,
+    grid_points,
+    interpolate_polygon,
+    map_polygons,
+    points_in_polygon,
     polygon_to_mesh,
     read_lake_data,
+    read_survey_points,
+    refine_grid,
+    tile_bounds,
 )
 
 
+def mask_higher_priority_polygons(
+    points: gpd.GeoDataFrame, higher_priority: gpd.GeoDataFrame
+):
+    """
+    Mask the higher priority polygon with the lower priority polygon.
+    """
+    return gpd.overlay(points, higher_priority, how="difference")
+
+
 @pytest.fixture
 def test_dirs():
     """Fixture providing test data directories."""
@@ -62,6 +80,69 @@ def test_polygon_to_mesh_resolution(simple_polygon):
     assert len(mesh_fine) > len(mesh_coarse)
 
 
+def test_polygon_to_mesh_matches_bounding_box_grid():
+    """Test that the mesh holds the bounding box grid points inside the polygon."""
+    # L-shaped polygon with a hole, mostly empty bounding box
+    shell = [(0, 0), (20, 0), (20, 2), (2, 2), (2, 20), (0, 20)]
+    hole = [(0.5, 0.5), (1.5, 0.5), (1.5, 1.5), (0.5, 1.5)]
+    polygon = gpd.GeoDataFrame(
+        {"geometry": [Polygon(shell, [hole])]}, crs="EPSG:4326"
+    )
+    resolution = 0.5
+    mesh = polygon_to_mesh(polygon, resolution)
+
+    x = np.arange(0, 20, resolution)
+    y = np.arange(0, 20, resolution)
+    xx, yy = np.meshgrid(x, y)
+    inside = polygon.geometry.iloc[0].intersects(
+        gpd.points_from_xy(xx.flatten(), yy.flatten())
+    )
+    np.testing.assert_array_equal(mesh.index, np.flatnonzero(inside))
+    np.testing.assert_array_equal(mesh.geometry.x, xx.flatten()[inside])
+    np.testing.assert_array_equal(mesh.geometry.y, yy.flatten()[inside])
+    assert (mesh["polygon_id"] == 0).all()
+
+
+def test_grid_points_chunks():
+    """Test that grid_points yields the mesh coordinates in row bands."""
+    polygon = Polygon([(0, 0), (10, 0), (0, 10)])
+    chunks = list(grid_points(polygon, 0.5, band_rows=4))
+    assert len(chunks) == 5
+
+    x = np.concatenate([cx for cx, _ in chunks])
+    y = np.concatenate([cy for _, cy in chunks])
+    mesh = polygon_to_mesh(gpd.GeoDataFrame(geometry=[polygon]), 0.5)
+    np.testing.assert_array_equal(x, mesh.geometry.x)
+    np.testing.assert_array_equal(y, mesh.geometry.y)
+
+    # only the points within bounds
+    bounds = (2.0, 1.0, 6.0, 4.0)
+    chunks = list(grid_points(polygon, 0.5, band_rows=4, bounds=bounds))
+    mesh = polygon_to_mesh(gpd.GeoDataFrame(geometry=[polygon]), 0.5, bounds)
+    np.testing.assert_array_equal(
+        np.concatenate([cx for cx, _ in chunks]), mesh.geometry.x
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([cy for _, cy in chunks]), mesh.geometry.y
+    )
+
+
+def test_polygon_to_mesh_tiles():
+    """Test that the meshes of tiles add up to the mesh of the polygon."""
+    polygon = gpd.GeoDataFrame(
+        geometry=[Polygon([(0, 0), (47, 3), (40, 41), (5, 30)])], crs="EPSG:3857"
+    )
+    mesh = polygon_to_mesh(polygon, 2.0)
+    tiles = list(tile_bounds(polygon.total_bounds, 10.0))
+    assert len(tiles) == 5 * 5
+    assert tiles[0] == (0.0, 0.0, 10.0, 10.0)
+
+    tiled = pd.concat([polygon_to_mesh(polygon, 2.0, bounds) for bounds in tiles])
+    assert tiled.index.is_unique
+    pd.testing.assert_index_equal(tiled.index.sort_values(), mesh.index)
+    assert tiled.geometry.sort_index().geom_equals(mesh.geometry).all()
+
+
 def test_mask_higher_priority_polygons():
     """Test masking of higher priority polygons."""
     # Create overlapping polygons
@@ -125,6 +206,382 @@ def test_generate_target_points():
 
 
 
+def test_generate_target_points_priorities():
+    """Test that overlaps go to the lowest priority value polygon."""
+    polygons = gpd.GeoDataFrame(
+        {
+            "priority": [2, 1, 2],
+            "gridspace": [1.0, 1.0, 0.5],
+            "geometry": [
+                Polygon([(0, 0), (6, 0), (6, 6), (0, 6)]),
+                Polygon([(3, 3), (9, 3), (9, 9), (3, 9)]),
+                Polygon([(4, 0), (10, 0), (10, 2), (4, 2)]),
+            ],
+        },
+        crs="EPSG:4326",
+    )
+    target_points = generate_target_points(polygons)
+
+    # same result as masking each grid with the overlay of higher priorities
+    expected = []
+    for idx in polygons.index:
+        grid = polygon_to_mesh(polygons.loc[[idx]], polygons["gridspace"].loc[idx])
+        higher = polygons[polygons["priority"] < polygons["priority"].loc[idx]]
+        expected.append(mask_higher_priority_polygons(grid, higher))
+    expected = pd.concat(expected, ignore_index=True)
+
+    assert target_points["geometry"].geom_equals(expected["geometry"]).all()
+    assert target_points["polygon_id"].tolist() == expected["polygon_id"].tolist()
+
+    # boundary points of the priority 1 polygon are removed from polygon 0
+    in_polygon_0 = target_points[target_points["polygon_id"] == 0]
+    corner = (in_polygon_0.geometry.x == 3) & (in_polygon_0.geometry.y == 3)
+    assert not corner.any()
+    # equal priority overlaps are kept in both polygons
+    x, y = target_points.geometry.x, target_points.geometry.y
+    assert sorted(target_points[(x == 5) & (y == 1)]["polygon_id"]) == [0, 2]
+
+
+def test_points_in_polygon():
+    """Test point in polygon filtering against GeoDataFrame.clip."""
+    shell = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    hole = [(4, 4), (6, 4), (6, 6), (4, 6)]
+    polygon = Polygon(shell, [hole])
+    rng = np.random.default_rng(0)
+    # random points plus points on the shell and hole boundaries
+    x = np.r_[rng.uniform(-2, 12, 5000), 0, 10, 5, 4, 5]
+    y = np.r_[rng.uniform(-2, 12, 5000), 5, 10, 0, 5, 5]
+
+    inside = points_in_polygon(x, y, polygon)
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(x, y))
+    clipped = points.clip(gpd.GeoDataFrame(geometry=[polygon]))
+    np.testing.assert_array_equal(np.flatnonzero(inside), np.sort(clipped.index))
+    np.testing.assert_array_equal(inside[-5:], [True, True, True, True, False])
+
+    # chunked parallel evaluation gives the same result
+    chunked = points_in_polygon(x, y, polygon, chunk_size=100, workers=4)
+    np.testing.assert_array_equal(chunked, inside)
+
+
+def test_map_polygons_parallel():
+    """Test that parallel polygon interpolation matches the serial result."""
+    rng = np.random.default_rng(0)
+    tasks = []
+    for offset in range(3):
+        centerline = gpd.GeoDataFrame(
+            geometry=[LineString([(0, offset), (100, offset + 10)])]
+        )
+        x = rng.uniform(0, 100, 200)
+        y = rng.uniform(-20, 30, 200)
+        tasks.append(
+            {
+                "centerline": centerline,
+                "source_x": x,
+                "source_y": y,
+                "source_values": np.column_stack([x + y, x - y]),
+                "target_x": rng.uniform(0, 100, 50),
+                "target_y": rng.uniform(-20, 30, 50),
+                "ellipsivity": 5.0,
+                "nnear": 8,
+            }
+        )
+
+    serial = list(map_polygons(tasks))
+    parallel = list(map_polygons(tasks, workers=2))
+    assert len(parallel) == 3
+
+    # a generator of tasks is only advanced a few tasks ahead of the results
+    built = []
+
+    def lazy_tasks():
+        for task in tasks * 3:
+            built.append(task)
+            yield task
+
+    results = map_polygons(lazy_tasks(), workers=2)
+    next(results)
+    assert len(built) == 4
+    assert len(list(results)) == 8
+    for task, a, b in zip(tasks, serial, parallel):
+        np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(a, interpolate_polygon(**task))
+        assert a.shape == (50, 2)
+
+
+@pytest.fixture
+def synthetic_lake(tmp_path):
+    """Fixture writing a small synthetic lake and returning its config."""
+    crs = "EPSG:3857"
+    gpd.GeoDataFrame(
+        {"elev": [10.0]},
+        geometry=[Polygon([(0, 0), (200, 0), (200, 100), (0, 100)])],
+        crs=crs,
+    ).to_file(tmp_path / "boundary.shp")
+    gpd.GeoDataFrame(
+        {
+            "pid": [1, 2],
+            "grid": [5.0, 10.0],
+            "prior": [1, 2],
+            "method": ["AEIDW", "CONSTANT"],
+            "params": [10.0, 3.0],
+        },
+        geometry=[
+            Polygon([(0, 0), (120, 0), (120, 100), (0, 100)]),
+            Polygon([(100, 0), (200, 0), (200, 100), (100, 100)]),
+        ],
+        crs=crs,
+    ).to_file(tmp_path / "polygons.shp")
+    gpd.GeoDataFrame(
+        {"pid": [1, 2]},
+        geometry=[LineString([(0, 50), (120, 50)]), LineString([(100, 50), (200, 50)])],
+        crs=crs,
+    ).to_file(tmp_path / "lines.shp")
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 120, 500)
+    y = rng.uniform(0, 100, 500)
+    pd.DataFrame({"x": x, "y": y, "z": 5 - np.abs(y - 50) / 10}).to_csv(
+        tmp_path / "survey.csv", index=False
+    )
+
+    return {
+        "boundary": {
+            "filepath": str(tmp_path / "boundary.shp"),
+            "elevation_column": "elev",
+            "max_segment_length": 10,
+        },
+        "survey_points": {
+            "filepath": str(tmp_path / "survey.csv"),
+            "x_coord_column": "x",
+            "y_coord_column": "y",
+            "current_surface_elevation_column": "z",
+        },
+        "interpolation_centerlines": {
+            "filepath": str(tmp_path / "lines.shp"),
+            "polygon_id_column": "pid",
+        },
+        "interpolation_polygons": {
+            "filepath": str(tmp_path / "polygons.shp"),
+            "polygon_id_column": "pid",
+            "grid_spacing_column": "grid",
+            "priority_column": "prior",
+            "interpolation_method_column": "method",
+            "interpolation_params_column": "params",
+            "buffer": 10,
+            "nearest_neighbors": 8,
+        },
+    }
+
+
+def test_aeidw_synthetic_lake(synthetic_lake):
+    """Test AEIDW interpolation of a small synthetic lake."""
+    points = aeidw(synthetic_lake)
+    targets = points[points["type"] == "interpolated"]
+
+    assert (points["type"] == "survey").sum() == 500
+    assert targets["current_surface_elevation"].notna().all()
+    assert points["source"].dtype == "category"
+
+    aeidw_targets = targets[targets["id"] == 1]
+    assert len(aeidw_targets) == 20 * 24
+    assert (aeidw_targets["source"] == "polygon: 1,: method AEIDW, params: 10.0").all()
+    assert aeidw_targets["current_surface_elevation"].between(0, 10).all()
+
+    # priority 1 polygon keeps the overlap, the rest is constant
+    constant_targets = targets[targets["id"] == 2]
+    assert (constant_targets.geometry.x > 120).all()
+    assert (constant_targets["current_surface_elevation"] == 3.0).all()
+
+
+def test_aeidw_result_cache(synthetic_lake, tmp_path):
+    """Test that unchanged polygons are read from the result cache."""
+    synthetic_lake["cache"] = {"directory": str(tmp_path / "cache")}
+    aeidw(synthetic_lake)
+    results = list((tmp_path / "cache").glob("result-*.npy"))
+    assert len(results) == 1
+
+    # a cache hit is used instead of interpolating the polygon again
+    np.save(results[0], np.full_like(np.load(results[0]), 7.0))
+    points = aeidw(synthetic_lake)
+    aeidw_targets = points[(points["type"] == "interpolated") & (points["id"] == 1)]
+    assert (aeidw_targets["current_surface_elevation"] == 7.0).all()
+
+    # changing the polygon parameters invalidates the cached result
+    synthetic_lake["interpolation_polygons"]["nearest_neighbors"] = 4
+    points = aeidw(synthetic_lake)
+    aeidw_targets = points[(points["type"] == "interpolated") & (points["id"] == 1)]
+    assert (aeidw_targets["current_surface_elevation"] != 7.0).all()
+    assert len(list((tmp_path / "cache").glob("result-*.npy"))) == 2
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_aeidw_tiles_synthetic_lake(synthetic_lake, workers):
+    """Test that tiled interpolation gives the same points as aeidw."""
+    expected = aeidw(synthetic_lake)
+    synthetic_lake["interpolation_polygons"]["workers"] = workers
+    chunks = list(aeidw_tiles(synthetic_lake, 30.0))
+
+    assert len(chunks) > 2
+    assert (chunks[0]["type"] != "interpolated").all()
+    points = pd.concat(chunks, ignore_index=True)
+    assert len(points) == len(expected)
+
+    def by_location(df):
+        df = pd.DataFrame(df).assign(x=df.geometry.x, y=df.geometry.y)
+        return df.sort_values(["type", "x", "y"]).reset_index(drop=True)
+
+    points, expected = by_location(points), by_location(expected)
+    np.testing.assert_array_equal(points[["x", "y"]], expected[["x", "y"]])
+    np.testing.assert_allclose(
+        points["current_surface_elevation"], expected["current_surface_elevation"]
+    )
+    assert (points["source"].astype(str) == expected["source"].astype(str)).all()
+
+
+def test_refine_grid():
+    """Test the point selection of the adaptive quadtree grid."""
+    from scipy.spatial import cKDTree
+
+    row, col = np.divmod(np.arange(17 * 17), 17)
+    coords = np.column_stack([col, row]).astype(float)
+    survey_tree = cKDTree(coords)
+    # flat except for a step across x = 3.5
+    survey_values = np.where(coords[:, :1] > 3.5, 10.0, 0.0)
+    args = ((0.0, 0.0), 1.0, 3, survey_tree, survey_values)
+
+    # no thresholds keeps the coarsest lattice only
+    keep = refine_grid(row, col, *args)
+    assert keep.sum() == 9
+    assert ((row[keep] % 8 == 0) & (col[keep] % 8 == 0)).all()
+
+    # a zero gradient threshold refines everywhere but the flat cells
+    keep = refine_grid(row, col, *args, max_gradient=0.0)
+    assert keep.sum() < len(row)
+    assert keep[(col >= 2) & (col <= 4)].all()
+    assert not keep[(row == 13) & (col == 13)].any()
+
+    # any survey point refines every cell
+    assert refine_grid(row, col, *args, max_points=0).all()
+
+    # a subset of the grid is refined like the whole grid
+    full = refine_grid(row, col, *args, max_gradient=1.0, max_points=20)
+    part = (row >= 5) & (col >= 3)
+    np.testing.assert_array_equal(
+        refine_grid(row[part], col[part], *args, max_gradient=1.0, max_points=20),
+        full[part],
+    )
+
+
+def test_aeidw_adaptive_grid(synthetic_lake):
+    """Test that adaptive grids drop target points, also in tiles."""
+    uniform = aeidw(synthetic_lake)
+    synthetic_lake["interpolation_polygons"].update(
+        {"adaptive_levels": 2, "adaptive_max_points": 8}
+    )
+    points = aeidw(synthetic_lake)
+    targets = points[(points["type"] == "interpolated") & (points["id"] == 1)]
+    uniform_targets = uniform[(uniform["type"] == "interpolated") & (uniform["id"] == 1)]
+
+    assert 0 < len(targets) < len(uniform_targets)
+    assert targets["current_surface_elevation"].between(0, 10).all()
+    tiled = pd.concat(list(aeidw_tiles(synthetic_lake, 30.0)), ignore_index=True)
+    assert len(tiled) == len(points)
+
+
+@pytest.fixture
+def survey_table():
+    """Fixture providing survey points in lon/lat."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "lon": rng.uniform(-96.6, -96.5, 100),
+            "lat": rng.uniform(28.9, 29.0, 100),
+            "z1": rng.uniform(30, 40, 100),
+            "z2": rng.uniform(20, 30, 100),
+            "other": "x",
+        }
+    )
+
+
+def test_read_survey_points_formats(survey_table, tmp_path):
+    """Test that CSV and Parquet survey points are read and reprojected."""
+    survey_table.to_csv(tmp_path / "survey.csv", index=False)
+    survey_table.to_parquet(tmp_path / "survey.parquet")
+    survey_config = {
+        "x_coord_column": "lon",
+        "y_coord_column": "lat",
+        "current_surface_elevation_column": "z1",
+        "preimpoundment_elevation_column": "z2",
+        "crs": "EPSG:4326",
+    }
+    expected = gpd.GeoSeries(
+        gpd.points_from_xy(survey_table["lon"], survey_table["lat"]), crs="EPSG:4326"
+    ).to_crs("EPSG:3857")
+
+    for name in ["survey.csv", "survey.parquet"]:
+        survey_config["filepath"] = str(tmp_path / name)
+        df = read_survey_points(survey_config, "EPSG:3857")
+        assert list(df.columns) == [
+            "x_coord",
+            "y_coord",
+            "current_surface_elevation",
+            "preimpoundment_elevation",
+        ]
+        np.testing.assert_allclose(df["x_coord"], expected.x)
+        np.testing.assert_allclose(df["y_coord"], expected.y)
+        np.testing.assert_allclose(df["current_surface_elevation"], survey_table["z1"])
+
+    # batches and float32 elevations
+    small = read_survey_points(
+        {**survey_config, "chunk_size": 7, "dtype": "float32"}, "EPSG:3857"
+    )
+    assert small["current_surface_elevation"].dtype == np.float32
+    np.testing.assert_allclose(small["x_coord"], expected.x)
+    np.testing.assert_allclose(
+        small["preimpoundment_elevation"], survey_table["z2"], rtol=1e-6
+    )
+
+
+def test_survey_batches_csv_column_types(tmp_path):
+    """Test that CSV columns are floats when later blocks have decimals."""
+    z = np.arange(2000, dtype=float)
+    z[-1] = 100.5
+    pd.DataFrame({"x": np.arange(2000), "y": 0, "z": z}).to_csv(
+        tmp_path / "survey.csv", index=False
+    )
+
+    batches = list(
+        _survey_batches(tmp_path / "survey.csv", ["x", "z"], 500, block_size=1024)
+    )
+    assert len(batches) > 4
+    df = pd.concat(batches, ignore_index=True)
+    assert list(df.columns) == ["x", "z"]
+    assert (df.dtypes == np.float64).all()
+    np.testing.assert_array_equal(df["z"], z)
+
+
+def test_read_survey_points_geoparquet(survey_table, tmp_path):
+    """Test reading survey points from a GeoParquet geometry column."""
+    gdf = gpd.GeoDataFrame(
+        survey_table[["z1"]],
+        geometry=gpd.points_from_xy(survey_table["lon"], survey_table["lat"]),
+        crs="EPSG:4326",
+    )
+    gdf.to_parquet(tmp_path / "survey.parquet")
+    survey_config = {
+        "filepath": str(tmp_path / "survey.parquet"),
+        "x_coord_column": "x",
+        "y_coord_column": "y",
+        "current_surface_elevation_column": "z1",
+        "crs": "",
+    }
+    df = read_survey_points(survey_config, "EPSG:3857")
+
+    expected = gdf.to_crs("EPSG:3857")
+    np.testing.assert_allclose(df["x_coord"], expected.geometry.x)
+    np.testing.assert_allclose(df["y_coord"], expected.geometry.y)
+    np.testing.assert_allclose(df["current_surface_elevation"], survey_table["z1"])
+
 
 def test_read_lake_data_survey_points_texana(test_dirs):
     """Test reading Texana survey points CSV."""
@@ -0,0 +1,97 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from hydrosurvey.methods import linear
+
+
+class TestLinear(unittest.TestCase):
+    """Test the linear (Delaunay/barycentric) interpolation function."""
+
+    def setUp(self):
+        """Set up scattered points on a plane."""
+        rng = np.random.default_rng(0)
+        self.coords = rng.uniform(0, 10, (300, 2))
+        self.values = np.column_stack(
+            [2 * self.coords[:, 0] - 3 * self.coords[:, 1] + 1, self.coords[:, 0]]
+        )
+
+    def plane(self, points):
+        return 2 * points[:, 0] - 3 * points[:, 1] + 1
+
+    def test_plane_is_exact(self):
+        """Test that a plane is reproduced exactly inside the hull."""
+        query_points = np.random.default_rng(1).uniform(1, 9, (1000, 2))
+        result = linear(self.coords, self.values, query_points)
+        npt.assert_allclose(result[:, 0], self.plane(query_points), atol=1e-10)
+        npt.assert_allclose(result[:, 1], query_points[:, 0], atol=1e-10)
+
+    def test_data_points(self):
+        """Test that the values at the data points are returned."""
+        result = linear(self.coords, self.values, self.coords)
+        npt.assert_allclose(result, self.values, atol=1e-10)
+
+    def test_chunked_query(self):
+        """Test that chunking does not change the results."""
+        query_points = np.random.default_rng(2).uniform(0, 10, (500, 2))
+        npt.assert_array_equal(
+            linear(self.coords, self.values, query_points, chunk_size=7),
+            linear(self.coords, self.values, query_points),
+        )
+
+    def test_outside_hull(self):
+        """Test the fill strategies outside the convex hull."""
+        query_points = np.array([[5.0, 5.0], [20.0, 20.0]])
+
+        result = linear(self.coords, self.values, query_points, fill="nan")
+        self.assertFalse(np.isnan(result[0]).any())
+        self.assertTrue(np.isnan(result[1]).all())
+
+        result = linear(self.coords, self.values, query_points, fill=-1.0)
+        npt.assert_allclose(result[1], [-1.0, -1.0])
+
+        # nearest falls back to idw of the nearest points
+        result = linear(self.coords, self.values, query_points, nnear=1)
+        nearest = np.argmin(np.hypot(*(self.coords - query_points[1]).T))
+        npt.assert_allclose(result[1], self.values[nearest])
+
+        with self.assertRaises(ValueError):
+            linear(self.coords, self.values, query_points, fill="bad")
+
+    def test_outside_hull_idw_options(self):
+        """Test that max_distance and its fill apply outside the hull."""
+        query_points = np.array([[5.0, 5.0], [10.5, 5.0], [20.0, 20.0]])
+        result = linear(self.coords, self.values, query_points, max_distance=2.0)
+        self.assertFalse(np.isnan(result[:2]).any())
+        self.assertTrue(np.isnan(result[2]).all())
+
+        result = linear(
+            self.coords,
+            self.values,
+            query_points,
+            max_distance=2.0,
+            max_distance_fill=-1.0,
+        )
+        npt.assert_allclose(result[2], [-1.0, -1.0])
+
+    def test_nan_values(self):
+        """Test that columns with NaNs use a triangulation of their valid points."""
+        values = self.values.copy()
+        values[::3, 1] = np.nan
+        query_points = np.random.default_rng(3).uniform(2, 8, (200, 2))
+
+        result = linear(self.coords, values, query_points)
+        npt.assert_allclose(result[:, 0], self.plane(query_points), atol=1e-10)
+        npt.assert_allclose(result[:, 1], query_points[:, 0], atol=1e-10)
+
+    def test_too_few_points(self):
+        """Test that collinear data points fall back to idw."""
+        coords = np.array([[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]])
+        values = np.array([[0.0], [1.0], [2.0]])
+        result = linear(coords, values, np.array([[1.0, 1.0]]), nnear=3)
+        npt.assert_allclose(result, [[1.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydrosurvey.points import PointSet
+
+
+@pytest.fixture
+def points():
+    """Fixture providing a PointSet with projected coordinates."""
+    x = np.array([2740007.25, 2740010.5, 2740020.75])
+    y = np.array([13514944.5, 13514950.25, 13514960.0])
+    return PointSet(
+        x, y, crs="EPSG:3857", attributes={"elevation": np.array([1.0, 2.0, 3.0])}
+    )
+
+
+def test_float32_coordinates(points):
+    """Test that float32 coordinates are stored relative to a local origin."""
+    compact = points.astype(np.float32)
+
+    assert compact._x.dtype == np.float32
+    assert compact.origin == (2740007.0, 13514944.0)
+    assert compact.x.dtype == np.float64
+    np.testing.assert_allclose(compact.x, points.x, atol=1e-3)
+    np.testing.assert_allclose(compact.y, points.y, atol=1e-3)
+    assert compact.nbytes < points.nbytes
+
+
+def test_attributes(points):
+    """Test scalar broadcasting, categorical strings and length checks."""
+    points["type"] = "survey"
+    points["source"] = np.array(["a.csv", "a.csv", "b.csv"], dtype=object)
+
+    assert isinstance(points["type"], pd.Categorical)
+    assert list(points["type"]) == ["survey"] * 3
+    assert list(points["source"].categories) == ["a.csv", "b.csv"]
+    assert "type" in points
+    with pytest.raises(ValueError):
+        points["elevation"] = np.zeros(2)
+
+
+def test_take_and_concat(points):
+    """Test subsetting and concatenating point sets with missing attributes."""
+    points["type"] = "survey"
+    subset = points.take(np.array([False, True, True]))
+    targets = PointSet([0.0, 1.0], [0.0, 1.0], crs="EPSG:3857")
+    targets["type"] = "interpolated"
+    targets["id"] = np.array([7, 7])
+
+    combined = PointSet.concat([subset, targets])
+
+    assert len(combined) == 4
+    np.testing.assert_array_equal(combined.x, [2740010.5, 2740020.75, 0.0, 1.0])
+    np.testing.assert_array_equal(combined["elevation"][2:], [np.nan, np.nan])
+    np.testing.assert_array_equal(combined["id"], [np.nan, np.nan, 7, 7])
+    assert list(combined["type"]) == ["survey"] * 2 + ["interpolated"] * 2
+
+
+def test_to_geodataframe(points):
+    """Test converting to a GeoDataFrame."""
+    points["type"] = "survey"
+    gdf = points.to_geodataframe(columns=["geometry", "elevation", "type"])
+
+    assert isinstance(gdf, gpd.GeoDataFrame)
+    assert list(gdf.columns) == ["geometry", "elevation", "type"]
+    assert gdf.crs == "EPSG:3857"
+
+    np.testing.assert_array_equal(gdf.geometry.x, points.x)
+    np.testing.assert_array_equal(gdf["elevation"], points["elevation"])
+    assert isinstance(gdf["type"].dtype, pd.CategoricalDtype)
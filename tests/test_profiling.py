@@ -0,0 +1,59 @@
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from hydrosurvey.profiling import Profiler, profile_table, span
+
+
+def test_span_without_profiler():
+    """Test that spans do nothing when no profiler is active."""
+    with span("stage", items=3) as record:
+        record.items = 4
+    assert record.items == 4
+
+
+def test_profiler_spans(tmp_path):
+    """Test that nested spans are recorded and repeated spans added up."""
+    with Profiler("command") as profiler:
+        with span("read", items=10):
+            time.sleep(0.01)
+        for _ in range(3):
+            with span("interpolate") as record:
+                with span("idw", items=5):
+                    pass
+                record.items = 2
+
+    spans = {s["name"]: s for s in profiler.report()["spans"]}
+    assert list(spans) == [
+        "command",
+        "command/read",
+        "command/interpolate",
+        "command/interpolate/idw",
+    ]
+    assert spans["command/read"]["wall_time"] >= 0.01
+    assert spans["command"]["wall_time"] >= spans["command/read"]["wall_time"]
+    assert spans["command/interpolate"]["calls"] == 3
+    assert spans["command/interpolate"]["items"] == 6
+    assert spans["command/interpolate/idw"]["items"] == 15
+    assert spans["command"]["items"] is None
+
+    profiler.write(tmp_path / "profile.json")
+    table = profile_table(json.loads((tmp_path / "profile.json").read_text()))
+    assert table.loc["command/interpolate/idw", "calls"] == 3
+
+
+def test_profiler_trace_memory():
+    """Test that the traced peak of a stage includes its nested stages."""
+    with Profiler("command", trace_memory=True) as profiler:
+        with span("outer"):
+            with span("allocate"):
+                data = np.ones(2_000_000)
+                del data
+
+    spans = {s["name"]: s for s in profiler.report()["spans"]}
+    assert spans["command/outer/allocate"]["peak_traced_memory"] >= 16e6
+    assert spans["command/outer"]["peak_traced_memory"] >= 16e6
+    assert spans["command"]["peak_traced_memory"] >= 16e6
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,129 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+from shapely.geometry import Polygon
+
+from hydrosurvey.raster import LakeRaster
+
+
+@pytest.fixture
+def grid_points():
+    """Fixture providing interpolated points at the centers of a 2 m grid."""
+    x, y = np.meshgrid(np.arange(1.0, 20.0, 2.0), np.arange(1.0, 10.0, 2.0))
+    x, y = x.ravel(), y.ravel()
+    return gpd.GeoDataFrame(
+        {
+            "current_surface_elevation": x + y,
+            "preimpoundment_elevation": x + y - 1.5,
+            "type": "interpolated",
+        },
+        geometry=gpd.points_from_xy(x, y),
+        crs="EPSG:3857",
+    )
+
+
+def test_lake_raster(grid_points):
+    """Test that each pixel takes the value of the point at its center."""
+    raster = LakeRaster((0, 0, 20, 10), 2.0, "EPSG:3857")
+    raster.add(grid_points)
+    bands = raster.bands()
+
+    assert (raster.height, raster.width) == (5, 10)
+    x, y = np.meshgrid(np.arange(1.0, 20.0, 2.0), np.arange(9.0, 0.0, -2.0))
+    np.testing.assert_allclose(bands["current_surface_elevation"], x + y)
+    np.testing.assert_allclose(bands["sediment_thickness"], 1.5)
+
+
+def test_lake_raster_tiles(grid_points):
+    """Test that adding points in tiles gives the same raster."""
+    raster = LakeRaster((0, 0, 20, 10), 1.0, "EPSG:3857", max_distance=1.5)
+    raster.add(grid_points)
+    tiled = LakeRaster((0, 0, 20, 10), 1.0, "EPSG:3857", max_distance=1.5, band_rows=4)
+    west = grid_points.geometry.x < 10
+    tiled.add(grid_points[~west])
+    tiled.add(grid_points[west])
+
+    np.testing.assert_array_equal(
+        tiled.bands()["current_surface_elevation"],
+        raster.bands()["current_surface_elevation"],
+    )
+
+
+def test_lake_raster_boundary(grid_points):
+    """Test that pixels outside the boundary and survey points are nodata."""
+    boundary = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)])
+    raster = LakeRaster((0, 0, 20, 10), 2.0, "EPSG:3857", boundary=boundary)
+    survey = grid_points.assign(type="survey", current_surface_elevation=-1.0)
+    raster.add(survey)
+    raster.add(grid_points)
+    band = raster.bands()["current_surface_elevation"]
+
+    assert not np.isnan(band[:, :5]).any()
+    assert np.isnan(band[:, 5:]).all()
+    assert (band[:, :5] > 0).all()
+
+
+def test_lake_raster_write(grid_points, tmp_path):
+    """Test writing the surfaces from blocks smaller than the raster."""
+    boundary = Polygon([(0, 0), (15, 0), (15, 10), (0, 10)])
+    raster = LakeRaster(
+        (0, 0, 20, 10),
+        1.0,
+        "EPSG:3857",
+        max_distance=1.5,
+        boundary=boundary,
+        band_rows=3,
+        directory=tmp_path,
+    )
+    raster.add(grid_points)
+    bands = raster.bands()
+    paths = raster.write(tmp_path / "lake.csv")
+
+    assert [path.name for path in paths] == [
+        "lake_current_surface_elevation.tif",
+        "lake_preimpoundment_elevation.tif",
+        "lake_sediment_thickness.tif",
+    ]
+    for path, (name, band) in zip(paths, bands.items()):
+        with rasterio.open(path) as src:
+            assert src.descriptions == (name,)
+            assert src.shape == (10, 20)
+            values = src.read(1, masked=True).filled(np.nan)
+        np.testing.assert_array_equal(values, band)
+    assert np.isnan(bands["current_surface_elevation"][:, 15:]).all()
+
+    # the scratch files are deleted
+    raster.close()
+    assert list(tmp_path.glob("hydrosurvey-raster-*")) == []
+
+
+def test_write_cog(tmp_path):
+    """Test writing tiled, compressed Cloud-Optimized GeoTIFFs."""
+    x, y = np.meshgrid(np.arange(0.5, 700.0), np.arange(599.5, 0.0, -1.0))
+    surface = np.random.default_rng(0).uniform(0, 10, x.shape)
+    points = gpd.GeoDataFrame(
+        {
+            "current_surface_elevation": surface.ravel(),
+            "preimpoundment_elevation": surface.ravel() - 1.0,
+            "type": "interpolated",
+        },
+        geometry=gpd.points_from_xy(x.ravel(), y.ravel()),
+        crs="EPSG:3857",
+    )
+    raster = LakeRaster((0, 0, 700, 600), 1.0, "EPSG:3857", directory=tmp_path)
+    raster.add(points[(x.ravel() >= 10) | (y.ravel() < 590)])
+    paths = raster.write(tmp_path / "lake.csv", blocksize=256)
+    raster.close()
+
+    with rasterio.open(paths[0]) as src:
+        assert src.profile["tiled"]
+        assert src.profile["blockxsize"] == 256
+        assert src.profile["compress"] == "deflate"
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        assert src.overviews(1) == [2, 4]
+        assert src.descriptions == ("current_surface_elevation",)
+        assert src.nodata == -9999.0
+        band = src.read(1)
+    np.testing.assert_array_equal(band[10:], surface[10:].astype(np.float32))
+    assert (band[:10, :10] == -9999.0).all()
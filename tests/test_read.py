@@ -62,5 +62,19 @@ class TestRead(unittest.TestCase):
         assert len(data['transducer']) == 3995
         assert len(np.unique(data['kHz'])) == 3
 
+    def test_metadata_only(self):
+        """ Test that a metadata only parse matches a full parse
+        """
+        filename = os.path.join(self.test_dir, 'data', 'sdi', '09112303.bin')
+        full = Dataset(filename)
+        full.parse()
+        meta = Dataset(filename)
+        meta.parse(metadata_only=True)
+
+        self.assertIsNone(meta.intensity_image)
+        self.assertEqual(full.trace_metadata.keys(), meta.trace_metadata.keys())
+        for key, array in full.trace_metadata.items():
+            np.testing.assert_array_equal(array, meta.trace_metadata[key])
+
 if __name__ == '__main__':
     unittest.main()
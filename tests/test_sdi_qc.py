@@ -0,0 +1,45 @@
+import os
+import unittest
+
+import numpy as np
+
+from hydrosurvey.sdi.qc import summarize_line, summarize_survey, time_steps
+
+
+class TestSDIQC(unittest.TestCase):
+    """ Test survey QC summaries of binary files
+    """
+
+    def setUp(self):
+        self.test_dir = os.path.join(os.path.dirname(__file__), 'data', 'sdi')
+
+    def test_summarize_line(self):
+        """ Test per-line statistics for a file with pick files """
+        summary = summarize_line(os.path.join(self.test_dir, '09112303.bin'))
+        self.assertEqual(summary['line'], '09112303')
+        self.assertEqual(summary['traces'], 686)
+        self.assertEqual(
+            sum(v for k, v in summary.items() if k.startswith('traces_')), 686
+        )
+        self.assertEqual(summary['missing_picks'], '')
+        self.assertGreaterEqual(summary['gps_repeat_rate'], 0)
+        self.assertLessEqual(summary['gps_repeat_rate'], 1)
+        self.assertLess(summary['depth_min'], summary['depth_max'])
+
+    def test_time_steps(self):
+        """ Test midnight rollover and clock reversals """
+        steps, reversals = time_steps([86399.0, 0.5, 1.0, 0.0, 2.0])
+        np.testing.assert_allclose(steps, [1.5, 0.5, 0.0, 2.0])
+        self.assertEqual(reversals, 1)
+
+    def test_summarize_survey(self):
+        """ Test survey-wide totals over the test data folder """
+        lines, survey = summarize_survey(self.test_dir)
+        self.assertEqual(survey['lines'], len(lines))
+        self.assertEqual(survey['traces'], lines['traces'].sum())
+        self.assertEqual(lines.loc['12041101', 'missing_picks'], 'pic,pre')
+        self.assertEqual(survey['lines_missing_picks'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
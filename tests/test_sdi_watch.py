@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from hydrosurvey.sdi.binary import read
+from hydrosurvey.sdi.watch import FolderWatcher, TailReader, write_parquet_batch
+
+
+class TestSDIWatch(unittest.TestCase):
+    """ Test incremental decoding of growing binary files
+    """
+
+    def setUp(self):
+        self.source = os.path.join(
+            os.path.dirname(__file__), 'data', 'sdi', '12041101.bin'
+        )
+        with open(self.source, 'rb') as f:
+            self.data = f.read()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmp_dir, '12041101.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, size):
+        with open(self.filepath, 'wb') as f:
+            f.write(self.data[:size])
+
+    def test_tail_reader(self):
+        """ Test that incremental reads decode every record exactly once """
+        reader = TailReader(self.filepath)
+        batches = []
+        for size in [6, 5000, 100000, 333333, len(self.data)]:
+            self.write(size)
+            df = reader.read_new()
+            if df is not None:
+                batches.append(df)
+        self.assertIsNone(reader.read_new())
+        self.assertEqual(reader.offset, len(self.data))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            full = read(self.source, as_dataframe=True)
+        incremental = pd.concat(batches)
+        np.testing.assert_array_equal(full.index, incremental.index)
+        np.testing.assert_array_equal(full['depth_r1'], incremental['depth_r1'])
+        np.testing.assert_array_equal(full['datetime'], incremental['datetime'])
+
+    def test_tail_reader_overlap(self):
+        """ Test that batches are cleaned with the end of the previous batch """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            full = read(self.source, as_dataframe=True)
+
+        def errors(overlap):
+            reader = TailReader(self.filepath, overlap=overlap)
+            batches = []
+            for size in np.linspace(5000, len(self.data), 20).astype(int):
+                self.write(size)
+                batches.append(reader.read_new())
+            incremental = pd.concat(batches)
+            self.assertEqual(len(batches[0]), 3)
+            return np.abs(
+                full['interpolated_easting'] - incremental['interpolated_easting']
+            )
+
+        # apart from the first batch of three records, which has no track
+        # before it, and the extrapolated ends of batches, positions match
+        self.assertGreater(errors(0).iloc[3:].max(), 1)
+        self.assertLess(errors(100).iloc[3:].max(), 1)
+
+    def test_tail_reader_truncated(self):
+        """ Test that a file that shrinks is decoded again from the start """
+        reader = TailReader(self.filepath)
+        self.write(len(self.data))
+        self.assertEqual(len(reader.read_new()), 2604)
+
+        self.write(100000)
+        df = reader.read_new()
+        self.assertEqual(df.index[0], 1)
+        self.assertLessEqual(reader.offset, 100000)
+
+    def test_folder_watcher_parquet(self):
+        """ Test polling a folder and writing batches to a parquet dataset """
+        output_dir = os.path.join(self.tmp_dir, 'output')
+        watcher = FolderWatcher(self.tmp_dir)
+        for size in [100000, len(self.data)]:
+            self.write(size)
+            for filepath, start, df in watcher.poll():
+                write_parquet_batch(output_dir, filepath, start, df)
+        self.assertEqual(watcher.poll(), [])
+
+        traces = pd.read_parquet(output_dir)
+        self.assertEqual(len(traces), 2604)
+
+        # rewriting the file replaces the parts written before
+        self.write(100000)
+        [(filepath, start, df)] = watcher.poll()
+        write_parquet_batch(output_dir, filepath, start, df)
+        traces = pd.read_parquet(output_dir)
+        self.assertEqual(len(traces), len(df))
+
+    def test_folder_watcher_readers(self):
+        """ Test that each file's reader is only created on its first poll """
+        watcher = FolderWatcher(self.tmp_dir)
+        with mock.patch(
+            'hydrosurvey.sdi.watch.TailReader', wraps=TailReader
+        ) as reader_class:
+            for size in [100000, len(self.data), len(self.data)]:
+                self.write(size)
+                watcher.poll()
+        self.assertEqual(reader_class.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+import pytest
+from shapely.geometry import LineString
+
+from hydrosurvey.sn import Coord_SN
+
+
+def centerline(coords):
+    return gpd.GeoDataFrame(geometry=[LineString(coords)], crs="EPSG:3857")
+
+
+def test_straight_centerline():
+    """Test SN coordinates of points beside a straight centerline."""
+    sn = Coord_SN(centerline([(0, 0), (100, 0)]))
+    s, n = sn.xy_to_sn(np.array([5.0, 50.0, 99.5]), np.array([3.0, -2.0, 0.0]))
+
+    np.testing.assert_allclose(s, [5.0, 50.0, 99.5])
+    # points to the left of the centerline direction are negative
+    np.testing.assert_allclose(n, [-3.0, 2.0, 0.0])
+
+
+@pytest.mark.parametrize(
+    "coords",
+    [
+        [(0, 0), (30, 10), (40, 50), (90, 40), (120, 80)],
+        # one long segment and many short ones
+        [(0, 0), (100, 0)] + [(100 + i, 3 * (i % 2)) for i in range(1, 30)],
+    ],
+)
+def test_matches_line_projection(coords):
+    """Test that s and |n| match shapely's projection onto the centerline."""
+    line = centerline(coords)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-200, 300, 2000)
+    y = rng.uniform(-200, 300, 2000)
+
+    s, n = Coord_SN(line).xy_to_sn(x, y)
+    points = shapely.points(x, y)
+    cline = line.geometry.iloc[0]
+    np.testing.assert_allclose(s, shapely.line_locate_point(cline, points))
+    np.testing.assert_allclose(np.abs(n), shapely.distance(cline, points))
+
+
+def test_transform_xy_to_sn():
+    """Test that transform_xy_to_sn adds SN coordinate columns."""
+    points = gpd.GeoDataFrame(
+        {"z": [1.0, 2.0]},
+        geometry=gpd.points_from_xy([10, 20], [5, -5]),
+        crs="EPSG:3857",
+    )
+    result = Coord_SN(centerline([(0, 0), (100, 0)])).transform_xy_to_sn(points)
+
+    assert list(result.columns) == ["z", "geometry", "s_coord", "n_coord"]
+    np.testing.assert_allclose(result["s_coord"], [10.0, 20.0])
+    np.testing.assert_allclose(result["n_coord"], [-5.0, 5.0])
+
+
+def test_centerline_samples():
+    """Test the points sampled every max_segment_length along the centerline."""
+    sn = Coord_SN(centerline([(0, 0), (50, 0), (50, 40)]), max_segment_length=25)
+    samples = sn.centerline
+
+    np.testing.assert_allclose(samples["s_coord"], [0, 25, 50, 75])
+    np.testing.assert_allclose(samples.geometry.x, [0, 25, 50, 50])
+    np.testing.assert_allclose(samples.geometry.y, [0, 0, 0, 25])
+    np.testing.assert_allclose(
+        np.stack(samples["slope"]), [[0.02, 0]] * 2 + [[0, 0.02]] * 2
+    )
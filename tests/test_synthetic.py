@@ -0,0 +1,75 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydrosurvey.interpolate import aeidw
+from hydrosurvey.synthetic import SyntheticLake
+
+
+@pytest.fixture
+def lake():
+    """Fixture providing a small synthetic lake."""
+    return SyntheticLake(length=1000, n_polygons=3)
+
+
+def test_synthetic_lake_geometry(lake):
+    """Test the boundary, islands, polygons and centerlines of the lake."""
+    boundary = lake.boundary()
+    polygons = lake.polygons()
+    centerlines = lake.centerlines()
+
+    assert boundary.is_valid.all()
+    assert len(boundary.geometry.iloc[0].interiors) == 2
+    assert polygons.union_all().contains(boundary.geometry.iloc[0])
+    assert list(polygons["priority"]) == [1, 2, 1]
+    assert list(polygons["method"]) == ["AEIDW"] * 3
+    assert list(centerlines["id"]) == list(polygons["id"])
+    # neighboring reaches overlap
+    assert polygons.geometry.iloc[0].intersects(polygons.geometry.iloc[1])
+
+
+def test_synthetic_lake_surfaces(lake):
+    """Test that the analytic surfaces meet the pool elevation at the shore."""
+    x = np.array([500.0, 500.0, 500.0, 0.0])
+    y = lake.centerline_y(x) + np.array([0.0, 100.0, -100.0, 0.0])
+    current, preimpoundment = lake.surfaces(x, y)
+
+    np.testing.assert_allclose(current[1:], lake.top)
+    np.testing.assert_allclose(preimpoundment[1:], lake.top)
+    assert current[0] == pytest.approx(lake.top - 12.5)
+    assert preimpoundment[0] == pytest.approx(current[0] - lake.sediment)
+
+
+def test_synthetic_lake_survey_points(lake):
+    """Test that the survey transects lie in the lake, off the islands."""
+    survey = lake.survey_points()
+    inside = gpd.GeoSeries.from_xy(survey["easting"], survey["northing"]).within(
+        lake.boundary().geometry.iloc[0].buffer(1e-6)
+    )
+
+    assert inside.all()
+    assert survey["easting"].nunique() == 20
+    np.testing.assert_allclose(
+        survey["current_surface"],
+        lake.surfaces(survey["easting"], survey["northing"])[0],
+    )
+
+
+@pytest.mark.parametrize("method", ["AEIDW", "LINEAR"])
+def test_synthetic_lake_aeidw(method, tmp_path):
+    """Test interpolation of the synthetic lake against the analytic surface."""
+    lake = SyntheticLake(length=1000, n_polygons=3, method=method)
+    config = lake.write(tmp_path, survey_format="parquet")
+    points = aeidw(config)
+    errors = lake.errors(points)
+
+    assert isinstance(errors, pd.DataFrame)
+    assert (
+        errors.loc["current_surface_elevation", "count"]
+        == (points["type"] == "interpolated").sum()
+    )
+    assert errors.loc["current_surface_elevation", "rmse"] < 1.0
+    assert errors.loc["preimpoundment_elevation", "rmse"] < 1.0
+    targets = points[points["type"] == "interpolated"]
+    assert targets["source"].str.contains(f"method {method}").all()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydrosurvey.thin import thin_along_track, thin_points, thinning_report
+
+
+@pytest.fixture
+def track():
+    """Fixture providing a dense survey track along two lines."""
+    x = np.arange(0, 100, 0.1)
+    return pd.DataFrame(
+        {
+            "x_coord": np.concatenate([x, x]),
+            "y_coord": np.concatenate([np.zeros_like(x), np.full_like(x, 50.0)]),
+            "current_surface_elevation": np.concatenate([x, -x]),
+            "line": ["a"] * len(x) + ["b"] * len(x),
+        }
+    )
+
+
+@pytest.mark.parametrize("method", ["median", "nearest"])
+def test_thin_points(track, method):
+    """Test that grid thinning keeps one point per occupied cell."""
+    thinned = thin_points(track, 10.0, method=method)
+
+    assert len(thinned) == 20
+    cells = np.floor(thinned[["x_coord", "y_coord"]].to_numpy() / 10.0)
+    assert len(np.unique(cells, axis=0)) == len(thinned)
+    assert list(thinned.columns) == list(track.columns)
+
+
+def test_thin_points_median_values(track):
+    """Test that median thinning averages values within each cell."""
+    thinned = thin_points(track, 10.0, method="median")
+    first = thinned.sort_values(["y_coord", "x_coord"]).iloc[0]
+    assert first["current_surface_elevation"] == pytest.approx(4.95)
+    assert first["line"] == "a"
+
+
+def test_thin_points_nearest_keeps_original_rows(track):
+    """Test that nearest thinning returns a subset of the original rows."""
+    thinned = thin_points(track, 10.0, method="nearest")
+    assert thinned.index.isin(track.index).all()
+
+
+@pytest.mark.parametrize("method", ["median", "nearest"])
+def test_thin_along_track(track, method):
+    """Test along-track thinning separates survey lines."""
+    thinned = thin_along_track(track, 5.0, line_col="line", method=method)
+
+    assert len(thinned) == 40
+    assert (thinned["line"] == "a").sum() == 20
+
+
+@pytest.mark.parametrize("method", ["median", "nearest"])
+def test_thin_nan_coordinates(track, method):
+    """Test that points without coordinates are dropped before binning."""
+    with_nan = track.copy()
+    with_nan.loc[[5, 1500], "x_coord"] = np.nan
+    with_nan.loc[700, "y_coord"] = np.inf
+    finite = with_nan.drop(index=[5, 700, 1500])
+
+    pd.testing.assert_frame_equal(
+        thin_points(with_nan, 10.0, method=method),
+        thin_points(finite, 10.0, method=method),
+    )
+    pd.testing.assert_frame_equal(
+        thin_along_track(with_nan, 5.0, line_col="line", method=method),
+        thin_along_track(finite, 5.0, line_col="line", method=method),
+    )
+    assert thin_points(with_nan.iloc[[5]], 10.0, method=method).empty
+
+
+def test_thin_invalid_method(track):
+    """Test that an unknown thinning method raises an error."""
+    with pytest.raises(ValueError):
+        thin_points(track, 10.0, method="mean")
+
+
+def test_thinning_report():
+    """Test the thinning report string."""
+    report = thinning_report(1000, 100)
+    assert "10.0x reduction" in report
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hydrosurvey.methods import idw
+from hydrosurvey.synthetic import SyntheticLake
+from hydrosurvey.tuning import best_parameters, cross_validate, tune_polygons
+
+
+@pytest.fixture
+def scattered():
+    """Fixture providing scattered points with a partly NaN second column."""
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(0, 10, (200, 2))
+    values = np.column_stack([np.sin(coords[:, 0]) + coords[:, 1], coords[:, 0]])
+    values[::7, 1] = np.nan
+    return coords, values
+
+
+def loo_rmse(coords, values, **options):
+    """RMSE of leaving out each point in turn with idw."""
+    errors = []
+    for i in range(len(coords)):
+        others = np.arange(len(coords)) != i
+        errors.append(
+            idw(coords[others], values[others], coords[[i]], **options)[0] - values[i]
+        )
+    return np.sqrt(np.nanmean(np.array(errors) ** 2, axis=0))
+
+
+@pytest.mark.parametrize("sectors", [None, 4])
+def test_cross_validate_leave_one_out(scattered, sectors):
+    """Test that all combinations match leaving out each point with idw."""
+    coords, values = scattered
+    results = cross_validate(
+        coords, values, [4, 8], [1, 2], sectors=sectors, columns=["a", "b"]
+    )
+
+    assert len(results) == 2 * 2 * 2
+    assert list(results.loc[results["column"] == "b", "count"].unique()) == [171]
+    for nnear, power in [(4, 1), (8, 2)]:
+        rows = results[
+            (results["nearest_neighbors"] == nnear) & (results["power"] == power)
+        ]
+        np.testing.assert_allclose(
+            rows["rmse"],
+            loo_rmse(coords, values, nnear=nnear, power=power, sectors=sectors),
+        )
+
+
+def test_cross_validate_holdout(scattered):
+    """Test that held out points are predicted from the other points only."""
+    coords, values = scattered
+    evaluate = coords[:, 0] < 5
+    results = cross_validate(
+        coords, values[:, :1], [8], [2], evaluate=evaluate, holdout=0.25, seed=1
+    )
+
+    holdout = np.sort(
+        np.random.default_rng(1).choice(
+            np.flatnonzero(evaluate), round(0.25 * evaluate.sum()), replace=False
+        )
+    )
+    others = np.setdiff1d(np.arange(len(coords)), holdout)
+    errors = (
+        idw(coords[others], values[others, :1], coords[holdout], nnear=8)
+        - values[holdout, :1]
+    )
+    assert results["count"].iloc[0] == len(holdout)
+    assert results["rmse"].iloc[0] == pytest.approx(np.sqrt((errors**2).mean()))
+
+
+def test_tune_polygons(tmp_path):
+    """Test tuning the AEIDW parameters of a synthetic lake."""
+    lake = SyntheticLake(length=1000, n_polygons=3)
+    config = lake.write(tmp_path)
+    results = tune_polygons(
+        config,
+        polygon_ids=[1, 3],
+        ellipsivity=[1, 30],
+        nearest_neighbors=[4, 8],
+        power=[1],
+    )
+
+    # the current parameters (ellipsivity 10, 16 neighbors, power 2) are added
+    assert sorted(results["polygon_id"].unique()) == [1, 3]
+    assert len(results) == 2 * 3 * 3 * 2 * 2
+    current = results[results["current"]]
+    assert len(current) == 2 * 2
+    assert (current["ellipsivity"] == 10).all()
+    assert (current["nearest_neighbors"] == 16).all()
+    assert (current["power"] == 2).all()
+    assert (results["count"] > 0).all()
+
+    # one lake-wide nearest_neighbors and power, the best ellipsivity of each
+    # polygon for them
+    best = best_parameters(results)
+    assert list(best.index) == [1, 3]
+    assert best["nearest_neighbors"].nunique() == 1
+    assert best["power"].nunique() == 1
+    errors = results[results["column"] == "current_surface_elevation"]
+    for idx, row in best.iterrows():
+        candidates = errors[
+            (errors["polygon_id"] == idx)
+            & (errors["nearest_neighbors"] == row["nearest_neighbors"])
+            & (errors["power"] == row["power"])
+        ]
+        assert row["rmse"] == candidates["rmse"].min()
+
+    def total_rmse(rows):
+        return np.sqrt((rows["rmse"] ** 2 * rows["count"]).sum() / rows["count"].sum())
+
+    assert total_rmse(best) <= total_rmse(errors[errors["current"]])
+
+    with pytest.raises(ValueError):
+        tune_polygons(config, polygon_ids=[7])
+
+
+def test_best_parameters_empty():
+    """Test that no results give no best parameters."""
+    results = pd.DataFrame(
+        {
+            "polygon_id": [1],
+            "ellipsivity": [10],
+            "nearest_neighbors": [16],
+            "power": [2],
+            "column": ["current_surface_elevation"],
+            "count": [0],
+            "bias": [np.nan],
+            "rmse": [np.nan],
+            "max_error": [np.nan],
+            "current": [True],
+        }
+    )
+    for frame in [results, results.iloc[:0]]:
+        best = best_parameters(frame)
+        assert best.empty
+        assert list(best.columns) == [
+            "ellipsivity",
+            "nearest_neighbors",
+            "power",
+            "count",
+            "rmse",
+            "current_rmse",
+        ]